@@ -1,9 +1,15 @@
+import hashlib
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+def _get_list(name: str, default: str = "") -> list:
+    """カンマ区切りの環境変数をリストで取得"""
+    return [v.strip() for v in os.getenv(name, default).split(",") if v.strip()]
+
+
 class Config:
     USER_ID = os.getenv("RAKUTEN_USER_ID")
     PASSWORD = os.getenv("RAKUTEN_PASSWORD")
@@ -13,6 +19,8 @@ class Config:
     DOWNLOAD_DIR = os.path.join(os.getcwd(), "downloads")
     RECEIPT_ADDRESSEE = os.getenv("RECEIPT_ADDRESSEE", "")
     PARALLEL_WORKERS = int(os.getenv("PARALLEL_WORKERS", "3"))
+    # ダウンロード保存（ディスク書き込み）の同時実行数
+    DOWNLOAD_WRITE_CONCURRENCY = int(os.getenv("DOWNLOAD_WRITE_CONCURRENCY", "2"))
 
     # 日付フィルター（オプション）
     # フォーマット: YYYY-MM（例: 2024-01）
@@ -20,6 +28,53 @@ class Config:
     DATE_FILTER_FROM = os.getenv("DATE_FILTER_FROM", "")  # 開始年月
     DATE_FILTER_TO = os.getenv("DATE_FILTER_TO", "")  # 終了年月
 
+    # インクリメンタルモード（処理済みの注文だけのページが続いたら巡回を打ち切る）
+    INCREMENTAL_MODE = os.getenv("INCREMENTAL_MODE", "false").lower() == "true"
+    INCREMENTAL_STOP_PAGES = int(os.getenv("INCREMENTAL_STOP_PAGES", "2"))
+
+    # RETRY 注文の次回試行（指数バックオフ: 基準 × 2^(リトライ回数-1)、上限あり）
+    RETRY_BACKOFF_BASE_HOURS = float(os.getenv("RETRY_BACKOFF_BASE_HOURS", "6"))
+    RETRY_BACKOFF_MAX_HOURS = float(os.getenv("RETRY_BACKOFF_MAX_HOURS", "72"))
+
+    # ショップ単位の領収書対応キャッシュ
+    # 確定的な NO_RECEIPT が指定回数続いたショップの注文は詳細を開かずに NO_RECEIPT とする
+    SHOP_NO_RECEIPT_THRESHOLD = int(os.getenv("SHOP_NO_RECEIPT_THRESHOLD", "2"))
+    SHOP_RECHECK_DAYS = int(os.getenv("SHOP_RECHECK_DAYS", "30"))  # 0 で無効
+
+    # ページ表示完了の判定で、対象要素が見つからない場合に networkidle を待つ上限（ミリ秒）
+    NETWORKIDLE_FALLBACK_MS = int(os.getenv("NETWORKIDLE_FALLBACK_MS", "5000"))
+
+    # タイムアウト学習（ステップごとの完了時間の p99 × 倍率、下限・上限あり）
+    TIMEOUT_P99_MULTIPLIER = float(os.getenv("TIMEOUT_P99_MULTIPLIER", "2.0"))
+    TIMEOUT_FLOOR_RATIO = float(os.getenv("TIMEOUT_FLOOR_RATIO", "0.25"))  # 既定値に対する下限
+    TIMEOUT_CEILING_FACTOR = float(os.getenv("TIMEOUT_CEILING_FACTOR", "2.0"))  # 既定値の倍数
+
+    # 1 注文の発行処理全体の期限（秒）。超過したら中断して RETRY にする（0 で無効）
+    ORDER_DEADLINE_SECONDS = int(os.getenv("ORDER_DEADLINE_SECONDS", "180"))
+
+    # セッション永続化（暗号化した storage state をアカウント単位で保存）
+    SESSION_PERSIST = os.getenv("SESSION_PERSIST", "true").lower() == "true"
+    SESSION_DIR = os.path.join(os.getcwd(), "sessions")
+    # 暗号鍵の元となるシークレット（未設定の場合は RAKUTEN_PASSWORD から導出）
+    SESSION_SECRET = os.getenv("SESSION_SECRET", "")
+
+    # ネットワークリソースブロック（画像・フォント・広告/解析ビーコン等を読み込まない）
+    BLOCK_RESOURCES = os.getenv("BLOCK_RESOURCES", "true").lower() == "true"
+    BLOCK_RESOURCE_TYPES = _get_list("BLOCK_RESOURCE_TYPES", "image,media,font")
+    BLOCK_HOSTS = _get_list(
+        "BLOCK_HOSTS",
+        "google-analytics.com,googletagmanager.com,doubleclick.net,"
+        "googlesyndication.com,googleadservices.com,facebook.net,criteo.com,"
+        "criteo.net,adnxs.com,rat.rakuten.co.jp",
+    )
+    # 指定した場合、これ以外のホストへのサブリソース要求をブロック（空 = 制限なし）
+    ALLOW_HOSTS = _get_list("ALLOW_HOSTS", "")
+
+    # DB書き込み（ライトビハインド: 専用スレッドでまとめてコミット）
+    DB_WRITE_BEHIND = os.getenv("DB_WRITE_BEHIND", "true").lower() == "true"
+    DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "50"))
+    DB_WRITE_FLUSH_INTERVAL = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", "0.5"))  # 秒
+
     # URLs
     LOGIN_URL = "https://www.rakuten.co.jp/"
     PURCHASE_HISTORY_URL = "https://order.my.rakuten.co.jp/"
@@ -33,6 +88,11 @@ class Config:
         if not os.path.exists(cls.DOWNLOAD_DIR):
             os.makedirs(cls.DOWNLOAD_DIR)
 
+    @classmethod
+    def get_account_key(cls) -> str:
+        """アカウント識別子（RAKUTEN_USER_ID のハッシュ）を返す"""
+        return hashlib.sha256((cls.USER_ID or "").encode("utf-8")).hexdigest()[:16]
+
     @classmethod
     def get_date_filter_info(cls) -> str:
         """日付フィルターの情報を返す"""
@@ -3,21 +3,33 @@
 責務: ログインプロセス全体の制御（戦略選択、リトライ、ポップアップ処理）
 """
 
-import asyncio
 from app.config import Config
 from app.core.retry_handler import RetryHandler
-from app.core.login_flows import LegacyLoginFlow, GlobalIdLoginFlow
+from app.core.login_flows import LegacyLoginFlow, GlobalIdLoginFlow, LOGIN_HOST
 from app.utils.logger import log_info, log_debug, log_warning, log_error
+from app.utils.page_utils import PageUtils
+from app.utils.readiness import Readiness, ReadyCondition, PageReady
+from app.handlers import StandardOrderHandler
+
+# ログインフォームの入力欄と対応するログインフロー
+LOGIN_FORMS = [
+    ('input[name="username"]', GlobalIdLoginFlow),
+    ('input[name="u"]', LegacyLoginFlow),
+    ('input[id="loginInner_u"]', LegacyLoginFlow),
+]
 
 
 class Authenticator:
     """ログイン処理を統括するクラス"""
 
+    SESSION_PROBE_TIMEOUT = 10000  # セッション確認のタイムアウト（ミリ秒）
+
     def __init__(self, page):
         self.page = page
         self.retry_handler = RetryHandler(max_attempts=3, delay_seconds=2.0)
+        self.logged_in = False  # 既存セッションが有効、またはログインに成功した
 
-    async def login(self):
+    async def login(self) -> bool:
         """ログイン処理のメインエントリーポイント"""
         log_info("ログイン中...")
 
@@ -35,12 +47,59 @@ class Authenticator:
             log_warning("ログインに失敗した可能性があります")
             log_debug(f"現在のURL: {self.page.url}")
 
+        return success
+
+    async def ensure_logged_in(self) -> bool:
+        """
+        セッションが有効ならログインを省略し、無効な場合のみログインする
+
+        Returns:
+            bool: 新たにログインして成功した場合True（セッション保存の要否）
+        """
+        if await self.is_session_valid():
+            log_info("既存セッションが有効です（ログイン省略）")
+            self.logged_in = True
+            return False
+
+        # 期限切れの Cookie が残っているとログインフローが乱れるため破棄
+        try:
+            await self.page.context.clear_cookies()
+        except Exception as e:
+            log_debug(f"Cookie破棄失敗: {e}")
+
+        self.logged_in = await self.login()
+        return self.logged_in
+
+    async def is_session_valid(self) -> bool:
+        """
+        セッションの有効性を軽量に確認
+
+        ページ遷移は行わず、コンテキストの APIRequestContext（Cookie 共有）で
+        購入履歴ページを取得し、ログインページへリダイレクトされないかを確認する
+        """
+        try:
+            response = await self.page.context.request.get(
+                Config.PURCHASE_HISTORY_URL, timeout=self.SESSION_PROBE_TIMEOUT
+            )
+            valid = response.ok and LOGIN_HOST not in response.url
+            log_debug(f"セッション確認: {response.status} {response.url} -> {valid}")
+            return valid
+        except Exception as e:
+            log_debug(f"セッション確認失敗: {e}")
+            return False
+
     async def _navigate_to_login(self):
         """ログインページへ遷移"""
         await self.page.goto(Config.LOGIN_URL)
         await self.page.goto(Config.PURCHASE_HISTORY_URL)
         await self.page.wait_for_load_state("domcontentloaded")
-        await self.page.wait_for_load_state("networkidle")
+        # ログインフォーム、またはログイン済みなら注文一覧の表示で準備完了
+        await PageReady.wait(
+            self.page,
+            "ログインページ表示",
+            [selector for selector, _ in LOGIN_FORMS]
+            + [StandardOrderHandler.LIST_LINK_SELECTOR],
+        )
 
     async def _execute_login_with_retry(self) -> bool:
         """リトライ付きでログインを実行"""
@@ -50,7 +109,7 @@ class Authenticator:
         if flow is None:
             log_info("ログインフォームが見つかりませんでした（既にログイン済み？）")
             log_debug(f"現在のURL: {self.page.url}")
-            return "login.account.rakuten.com" not in self.page.url
+            return LOGIN_HOST not in self.page.url
 
         # リトライ付きで実行
         return await self.retry_handler.execute(
@@ -59,30 +118,29 @@ class Authenticator:
 
     async def _detect_login_flow(self):
         """ログインフォームの種類を検出し、適切な戦略を返す"""
-        selectors_and_flows = [
-            ('input[name="username"]', GlobalIdLoginFlow),
-            ('input[name="u"]', LegacyLoginFlow),
-            ('input[id="loginInner_u"]', LegacyLoginFlow),
-        ]
-
-        for selector, flow_class in selectors_and_flows:
-            try:
-                if await self.page.is_visible(selector, timeout=2000):
-                    log_info(f"ログインフォーム検出: {selector}")
-                    return flow_class(self.page)
-            except:
-                continue
+        selectors = [selector for selector, _ in LOGIN_FORMS]
+        form, index = await PageUtils.find_first_visible(
+            self.page, selectors, timeout=2000, call_site="auth.login_form"
+        )
+        if not form:
+            return None
 
-        return None
+        selector, flow_class = LOGIN_FORMS[index]
+        log_info(f"ログインフォーム検出: {selector}")
+        return flow_class(self.page)
 
     async def _post_login_wait(self):
         """ログイン後の待機処理"""
         log_info("ページ読み込み待機中...")
-        await asyncio.sleep(3)
-        try:
-            await self.page.wait_for_load_state("networkidle", timeout=15000)
-        except:
-            log_warning("ページ読み込みタイムアウト、続行します")
+        await Readiness.wait(
+            "ログイン後遷移",
+            [ReadyCondition.url_matches(self.page, lambda url: LOGIN_HOST not in url)],
+            3,
+        )
+        # 購入履歴へ戻った場合は注文一覧の表示で準備完了
+        await PageReady.wait(
+            self.page, "ログイン後ページ表示", [StandardOrderHandler.LIST_LINK_SELECTOR]
+        )
         log_info(f"ログイン後のURL: {self.page.url}")
 
     async def _close_popups(self):
@@ -91,10 +149,12 @@ class Authenticator:
             'button[class*="close"]',
             'div[class*="modal"] .close',
         ]
-        for selector in close_selectors:
+        button, index = await PageUtils.find_first_visible(
+            self.page, close_selectors, timeout=1000, call_site="auth.close_popup"
+        )
+        if button:
             try:
-                if await self.page.is_visible(selector, timeout=1000):
-                    await self.page.click(selector)
-                    log_debug(f"ポップアップを閉じました: {selector}")
+                await button.click()
+                log_debug(f"ポップアップを閉じました: {close_selectors[index]}")
             except:
                 pass
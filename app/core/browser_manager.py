@@ -1,9 +1,14 @@
+import asyncio
 from playwright.async_api import async_playwright
 from app.config import Config
+from app.utils.download_manager import DownloadManager
 
 
 class BrowserManager:
-    def __init__(self):
+    def __init__(self, session_store=None, resource_blocker=None):
+        self.session_store = session_store
+        self.resource_blocker = resource_blocker
+        self.downloads = DownloadManager()
         self.playwright = None
         self.browser = None
         self.contexts = []
@@ -11,6 +16,7 @@ class BrowserManager:
         # メインページ（後方互換性用）
         self.context = None
         self.page = None
+        self.session_active = False  # 認証済み（終了時に storage state を保存する）
 
     async def launch(self):
         """ブラウザを起動しメインページを返す"""
@@ -24,16 +30,25 @@ class BrowserManager:
 
         return self.page
 
-    async def create_worker_pages(self, count: int = None):
-        """並列処理用のページを作成"""
+    async def create_worker_pages(self, count: int = None, share_session: bool = True):
+        """
+        並列処理用のページを作成
+
+        share_session=True の場合、メインコンテキストのストレージ状態
+        （Cookie / localStorage）を複製し、ログイン済みの状態で起動する
+        """
         if count is None:
             count = Config.PARALLEL_WORKERS
 
         self.contexts = []
         self.pages = []
 
+        storage_state = None
+        if share_session and self.context:
+            storage_state = await self.context.storage_state()
+
         for _ in range(count):
-            ctx = await self._create_context()
+            ctx = await self._create_context(storage_state=storage_state)
             page = await ctx.new_page()
             self._setup_download_handler(page)
             self.contexts.append(ctx)
@@ -41,30 +56,47 @@ class BrowserManager:
 
         return self.pages
 
-    async def _create_context(self):
-        """新しいコンテキストを作成"""
-        return await self.browser.new_context(accept_downloads=True)
+    async def save_session(self):
+        """メインコンテキストの storage state を永続化"""
+        if not self.session_store or not self.context:
+            return
+        try:
+            state = await self.context.storage_state()
+            # 鍵導出・ファイル書き込みはイベントループ外で行う
+            await asyncio.to_thread(self.session_store.save, state)
+        except Exception as e:
+            print(f"セッション保存失敗: {e}")
+
+    async def _create_context(self, storage_state: dict = None):
+        """新しいコンテキストを作成（保存済みセッションがあれば読み込む）"""
+        if storage_state is None and self.session_store:
+            # 鍵導出（PBKDF2）・復号はイベントループ外で行う
+            storage_state = await asyncio.to_thread(self.session_store.load)
+        ctx = await self.browser.new_context(
+            accept_downloads=True, storage_state=storage_state
+        )
+        if self.resource_blocker:
+            await self.resource_blocker.attach(ctx)
+        return ctx
 
     def _setup_download_handler(self, page):
-        """ダウンロードハンドラを設定"""
-        page.on("download", lambda download: self._handle_download(download))
-
-    def _handle_download(self, download):
-        """ダウンロードを指定フォルダに保存"""
-        import asyncio
+        """ダウンロードハンドラを設定（処理中の注文に結び付けて保存）"""
+        page.on("download", self.downloads.handle)
 
-        asyncio.create_task(self._save_download(download))
+    async def close(self):
+        # 実行中に更新された Cookie を次回に引き継ぐ
+        if self.session_active:
+            await self.save_session()
 
-    async def _save_download(self, download):
-        """非同期でダウンロードを保存"""
-        import os
+        # 保存中のダウンロードを書き切ってからブラウザを閉じる
+        try:
+            await self.downloads.close()
+        except Exception as e:
+            print(f"ダウンロード待機失敗: {e}")
 
-        filename = download.suggested_filename
-        save_path = os.path.join(Config.DOWNLOAD_DIR, filename)
-        await download.save_as(save_path)
-        print(f"ダウンロード保存: {save_path}")
+        if self.resource_blocker:
+            self.resource_blocker.log_summary()
 
-    async def close(self):
         # ワーカーコンテキストをクローズ
         for ctx in self.contexts:
             try:
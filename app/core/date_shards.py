@@ -0,0 +1,125 @@
+"""
+期間シャード
+責務: DATE_FILTER_FROM/TO の期間を月単位に分割し、シャードごとの一覧URLと範囲判定を提供
+"""
+
+import calendar
+import re
+from datetime import date
+from app.config import Config
+from app.utils.logger import log_warning
+
+# 注文番号（例: 222222-20250101-2222222222）に含まれる注文日
+ORDER_DATE_PATTERN = re.compile(r"-(\d{8})-")
+
+
+def parse_order_date(order_id: str) -> date:
+    """注文番号から注文日を取得（取得できない場合はNone）"""
+    match = ORDER_DATE_PATTERN.search(order_id or "")
+    if not match:
+        return None
+    value = match.group(1)
+    try:
+        return date(int(value[:4]), int(value[4:6]), int(value[6:]))
+    except ValueError:
+        return None
+
+
+def _parse_year_month(value: str) -> tuple:
+    """YYYY-MM 形式を (year, month) に変換（不正・空の場合はNone）"""
+    parts = (value or "").split("-")
+    if len(parts) != 2 or not all(p.isdigit() for p in parts):
+        return None
+    year, month = int(parts[0]), int(parts[1])
+    if not 1 <= month <= 12:
+        return None
+    return year, month
+
+
+def _month_end(year: int, month: int) -> date:
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
+class DateShard:
+    """一覧の巡回単位（start〜end の注文を担当）"""
+
+    def __init__(self, start: date = None, end: date = None):
+        self.start = start  # 担当期間の開始日（None = 下限なし）
+        self.end = end  # 担当期間の終了日（None = 上限なし）
+
+    @classmethod
+    def from_config(cls) -> list:
+        """設定の期間からシャードを生成"""
+        return cls.build(Config.DATE_FILTER_FROM, Config.DATE_FILTER_TO)
+
+    @classmethod
+    def build(cls, date_from: str, date_to: str, today: date = None) -> list:
+        """
+        期間を月単位のシャードに分割（新しい月から順に並べる）
+
+        開始年月がない場合は分割せず、終了年月を上限とするシャード 1 つを返す
+        """
+        start = _parse_year_month(date_from)
+        end = _parse_year_month(date_to)
+        if date_from and not start:
+            log_warning(f"DATE_FILTER_FROM の形式が不正です（YYYY-MM）: {date_from}")
+        if date_to and not end:
+            log_warning(f"DATE_FILTER_TO の形式が不正です（YYYY-MM）: {date_to}")
+
+        if not start:
+            return [cls(end=_month_end(*end) if end else None)]
+
+        if not end:
+            today = today or date.today()
+            end = (today.year, today.month)
+
+        shards = []
+        year, month = end
+        while (year, month) >= start:
+            shards.append(cls(date(year, month, 1), _month_end(year, month)))
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+
+        if not shards:
+            log_warning(f"期間指定が不正です: {date_from} 〜 {date_to}")
+        return shards
+
+    @property
+    def label(self) -> str:
+        if self.start:
+            return self.start.strftime("%Y-%m")
+        if self.end:
+            return f"〜{self.end.strftime('%Y-%m')}"
+        return "全期間"
+
+    def url(self, base_url: str) -> str:
+        """シャードの一覧URL（開始年月で絞り込み）"""
+        if not self.start:
+            return base_url
+        return f"{base_url}?year={self.start.year}&month={self.start.month:02d}"
+
+    def filter_entries(self, entries: list) -> tuple:
+        """
+        ページの注文を担当期間で絞り込む
+
+        Returns:
+            (期間内の注文, このページで担当期間より古い注文に到達したか)
+        """
+        if not entries:
+            return entries, False
+
+        in_range = []
+        dated = [(entry, parse_order_date(entry.order_id)) for entry in entries]
+        for entry, order_date in dated:
+            if order_date is None:
+                in_range.append(entry)
+            elif self.end and order_date > self.end:
+                continue
+            elif self.start and order_date < self.start:
+                continue
+            else:
+                in_range.append(entry)
+
+        # 新しい順に並ぶため、ページ末尾が開始日より古ければ次ページ以降は範囲外
+        last_date = dated[-1][1]
+        passed_start = bool(self.start) and last_date is not None and last_date < self.start
+        return in_range, passed_start
@@ -3,24 +3,210 @@
 責務: 注文情報の永続化とレポート出力
 """
 
+import asyncio
+import atexit
+import json
+import random
 import sqlite3
 import csv
-from datetime import datetime
+from datetime import datetime, timedelta
+from app.config import Config
+from app.core.db_writer import PendingWrite, WriteBehindWriter
+from app.models.order_entry import OrderEntry
 from app.models.order_status import OrderStatus
 
+ESCALATE_SQL = """
+    UPDATE orders SET status = ?, error_message = ?, updated_at = ?, run_id = ?
+    WHERE order_id IN ({placeholders})
+"""
+
+# 次回試行日時: base * 2^(retry_count - 1) * jitter 秒後（上限 cap 秒、RETRY 以外は NULL）
+NEXT_ATTEMPT_SQL = """
+    CASE WHEN :backoff THEN datetime(
+        :now,
+        '+' || CAST(MIN(
+            :backoff_cap,
+            :backoff_base * (1 << MIN(MAX({retry_count} - 1, 0), 16)) * :jitter
+        ) AS INTEGER) || ' seconds'
+    ) END
+"""
+
+# 注文の挿入・更新を 1 文で行う（retry_count の加算・次回試行日時の計算も SQL 内で完結）
+UPSERT_ORDER_SQL = f"""
+    INSERT INTO orders
+    (order_id, order_number, status, filename, downloaded_at, error_message,
+     retry_count, next_attempt_at, created_at, updated_at, run_id, shop_skipped)
+    VALUES (:order_id, :order_number, :status, :filename, :downloaded_at,
+            :error_message, :retry_delta,
+            {NEXT_ATTEMPT_SQL.format(retry_count=":retry_delta")},
+            :now, :now, :run_id, :shop_skipped)
+    ON CONFLICT(order_id) DO UPDATE SET
+        status = excluded.status,
+        run_id = excluded.run_id,
+        shop_skipped = excluded.shop_skipped,
+        order_number = COALESCE(excluded.order_number, orders.order_number),
+        filename = excluded.filename,
+        error_message = excluded.error_message,
+        retry_count = orders.retry_count + :retry_delta,
+        next_attempt_at = {NEXT_ATTEMPT_SQL.format(
+            retry_count="orders.retry_count + :retry_delta"
+        )},
+        downloaded_at = COALESCE(excluded.downloaded_at, orders.downloaded_at),
+        updated_at = excluded.updated_at
+"""
+
+# 一覧で検出した注文の遷移先を記録（新規は PENDING で登録、既存はステータスを変えない）
+RECORD_DISCOVERED_SQL = """
+    INSERT INTO orders
+    (order_id, status, retry_count, detail_url, list_url, is_books,
+     created_at, updated_at, run_id)
+    VALUES (:order_id, :status, 0, :detail_url, :list_url, :is_books,
+            :now, :now, :run_id)
+    ON CONFLICT(order_id) DO UPDATE SET
+        detail_url = COALESCE(excluded.detail_url, orders.detail_url),
+        list_url = COALESCE(excluded.list_url, orders.list_url),
+        is_books = excluded.is_books
+"""
+
+# ショップの発行結果を記録（NO_RECEIPT は連続回数を加算、DONE でリセット）
+RECORD_SHOP_RESULT_SQL = """
+    INSERT INTO shop_capabilities
+    (shop_id, no_receipt_streak, success_count, last_result, last_checked_at)
+    VALUES (:shop_id, :no_receipt, :success, :result, :now)
+    ON CONFLICT(shop_id) DO UPDATE SET
+        no_receipt_streak = CASE WHEN :success THEN 0
+            ELSE shop_capabilities.no_receipt_streak + :no_receipt END,
+        success_count = shop_capabilities.success_count + :success,
+        last_result = excluded.last_result,
+        last_checked_at = excluded.last_checked_at
+"""
+
+# ショップの過去の結果から NO_RECEIPT にした（開いていない）注文を処理対象に戻す
+# run_id を付け替え、過去の実行の集計（run_status_counts）は変えない
+REQUEUE_SHOP_SKIPPED_SQL = """
+    UPDATE orders SET status = :status, shop_skipped = 0, error_message = NULL,
+        next_attempt_at = NULL, updated_at = :now, run_id = :run_id
+    WHERE shop_skipped = 1 AND status = :skipped_status AND order_id LIKE :prefix
+"""
+
+SET_WATERMARK_SQL = """
+INSERT INTO crawl_watermarks (account_key, order_id, updated_at)
+VALUES (?, ?, ?)
+ON CONFLICT(account_key) DO UPDATE SET
+    order_id = excluded.order_id,
+    updated_at = excluded.updated_at
+"""
+
+# セレクタの実績を加算（save() ごとの増分を積み上げる）
+ADD_SELECTOR_STATS_SQL = """
+    INSERT INTO selector_stats
+    (call_site, selector, hits, misses, total_ms, last_hit_at)
+    VALUES (:call_site, :selector, :hits, :misses, :total_ms, :last_hit_at)
+    ON CONFLICT(call_site, selector) DO UPDATE SET
+        hits = selector_stats.hits + excluded.hits,
+        misses = selector_stats.misses + excluded.misses,
+        total_ms = selector_stats.total_ms + excluded.total_ms,
+        last_hit_at = COALESCE(excluded.last_hit_at, selector_stats.last_hit_at)
+"""
+
+SAVE_STEP_TIMINGS_SQL = """
+INSERT INTO step_timings (step, samples, updated_at)
+VALUES (?, ?, ?)
+ON CONFLICT(step) DO UPDATE SET
+    samples = excluded.samples,
+    updated_at = excluded.updated_at
+"""
+
+# 実行単位のステータス件数を orders の変更に合わせて増減するトリガー
+# （同じ実行内でステータスが変わった場合は旧ステータスを減算）
+RUN_COUNT_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_orders_run_count_insert
+    AFTER INSERT ON orders
+    WHEN NEW.run_id IS NOT NULL
+    BEGIN
+        INSERT INTO run_status_counts (run_id, status, order_count)
+        VALUES (NEW.run_id, NEW.status, 1)
+        ON CONFLICT(run_id, status) DO UPDATE SET order_count = order_count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_orders_run_count_update
+    AFTER UPDATE OF status, run_id ON orders
+    WHEN NEW.run_id IS NOT NULL
+        AND (OLD.run_id IS NOT NEW.run_id OR OLD.status IS NOT NEW.status)
+    BEGIN
+        UPDATE run_status_counts SET order_count = order_count - 1
+        WHERE OLD.run_id IS NEW.run_id
+            AND run_id = OLD.run_id AND status = OLD.status;
+        INSERT INTO run_status_counts (run_id, status, order_count)
+        VALUES (NEW.run_id, NEW.status, 1)
+        ON CONFLICT(run_id, status) DO UPDATE SET order_count = order_count + 1;
+    END
+    """,
+)
+
 
 class DBManager:
     MAX_RETRY_COUNT = 3  # 最大リトライ回数
+    IN_CLAUSE_CHUNK = 500  # IN (...) のプレースホルダ上限（SQLITE_MAX_VARIABLE_NUMBER 対策）
+    CACHED_STATEMENTS = 256  # プリペアドステートメントのキャッシュ数
+    BACKOFF_JITTER = 0.2  # 次回試行日時のばらつき（±20%）
+
+    # 接続時に設定する PRAGMA（WAL + synchronous=NORMAL でコミットを軽量化）
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-16000",  # 約16MB
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA busy_timeout=5000",
+    )
 
-    def __init__(self, db_path="data.db"):
+    # classify_orders の判定結果
+    DECISION_PROCESS = "process"  # 処理対象
+    DECISION_SKIP = "skip"  # 処理不要（最終ステータス等）
+    DECISION_ESCALATE = "escalate"  # 最大リトライ回数到達 → ERROR に切り替え
+    DECISION_DEFER = "defer"  # RETRY だが次回試行日時前
+    DECISION_SHOP_NO_RECEIPT = "shop_no_receipt"  # 領収書非対応ショップ → NO_RECEIPT に切り替え
+
+    # 未コミットの RETRY は次回試行日時が未確定のため、読み取り時は試行前として扱う
+    NOT_DUE = "9999-12-31 23:59:59"
+    # 読み取り中にコミットが重なった場合に読み直す回数
+    READ_ATTEMPTS = 5
+
+    def __init__(self, db_path="data.db", write_behind: bool = None):
         self.db_path = db_path
+        self.run_id = None  # start_run() で設定（ステータス件数の集計単位）
+        self._watermarks = {}  # この実行で更新したウォーターマーク（未コミット分を含む）
+        self.conn = self._connect()
         self._init_db()
 
+        # 書き込みは専用スレッドへ（読み取りは未コミット分を重ねて返す）
+        if write_behind is None:
+            write_behind = Config.DB_WRITE_BEHIND
+        self._writer = None
+        if write_behind:
+            self._writer = WriteBehindWriter(
+                db_path,
+                self.PRAGMAS,
+                batch_size=Config.DB_WRITE_BATCH_SIZE,
+                flush_interval=Config.DB_WRITE_FLUSH_INTERVAL,
+            )
+            # close() が呼ばれずに終了した場合も書き込みを失わない（close() で解除）
+            atexit.register(self._writer.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        """WALモードの長寿命コネクションを作成"""
+        conn = sqlite3.connect(
+            self.db_path, cached_statements=self.CACHED_STATEMENTS
+        )
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
     def _init_db(self):
         """データベースとテーブルを初期化"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
+        self.conn.execute(
             """
             CREATE TABLE IF NOT EXISTS orders (
                 order_id TEXT PRIMARY KEY,
@@ -35,48 +221,264 @@ class DBManager:
             )
         """
         )
-        conn.commit()
-        conn.close()
+        self._ensure_columns(
+            "orders",
+            {
+                "run_id": "TEXT",
+                "next_attempt_at": "TEXT",  # RETRY の次回試行日時（バックオフ）
+                # 一覧で検出した遷移先（詳細ページへの直接遷移・再処理に使用）
+                "detail_url": "TEXT",
+                "list_url": "TEXT",
+                "is_books": "INTEGER",
+                # ショップの過去の結果から NO_RECEIPT とした（詳細を開いていない）注文
+                "shop_skipped": "INTEGER NOT NULL DEFAULT 0",
+            },
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS run_status_counts (
+                run_id TEXT,
+                status TEXT,
+                order_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (run_id, status)
+            )
+        """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS shop_capabilities (
+                shop_id TEXT PRIMARY KEY,
+                no_receipt_streak INTEGER NOT NULL DEFAULT 0,
+                success_count INTEGER NOT NULL DEFAULT 0,
+                last_result TEXT,
+                last_checked_at TEXT
+            )
+        """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS crawl_watermarks (
+                account_key TEXT PRIMARY KEY,
+                order_id TEXT,
+                updated_at TEXT
+            )
+        """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS selector_stats (
+                call_site TEXT NOT NULL,
+                selector TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0,
+                total_ms REAL NOT NULL DEFAULT 0,
+                last_hit_at TEXT,
+                PRIMARY KEY (call_site, selector)
+            )
+        """
+        )
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS step_timings (
+                step TEXT PRIMARY KEY,
+                samples TEXT NOT NULL,
+                updated_at TEXT
+            )
+        """
+        )
+        # レポート・再処理対象の抽出をインデックス検索にする
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_orders_status_retry ON orders(status, retry_count)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_orders_updated_at ON orders(updated_at)"
+        )
+        for trigger in RUN_COUNT_TRIGGERS:
+            self.conn.execute(trigger)
+        self.conn.commit()
+
+    def _ensure_columns(self, table: str, columns: dict):
+        """既存DBに不足しているカラムを追加（スキーマ移行）"""
+        existing = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        for name, column_type in columns.items():
+            if name not in existing:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+    def start_run(self, run_id: str):
+        """実行単位を開始（以降の更新を run_id ごとに集計）"""
+        self.run_id = run_id
 
     def get_order_status(self, order_id: str) -> str:
         """注文のステータスを取得"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT status FROM orders WHERE order_id = ?", (order_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else None
+        status, _, _ = self._read_states([order_id]).get(order_id, (None, 0, None))
+        return status
 
     def get_retry_count(self, order_id: str) -> int:
         """注文のリトライ回数を取得"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT retry_count FROM orders WHERE order_id = ?", (order_id,))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] if result else 0
+        _, retry_count, _ = self._read_states([order_id]).get(order_id, (None, 0, None))
+        return retry_count
+
+    def flush(self):
+        """未コミットの書き込みを反映"""
+        if self._writer:
+            self._writer.flush()
+
+    async def flush_async(self):
+        """未コミットの書き込みの反映をイベントループ外で待つ"""
+        if self._writer:
+            await asyncio.to_thread(self._writer.flush)
+
+    def _read_states(self, order_ids: list) -> dict:
+        """
+        注文の (status, retry_count, next_attempt_at) を取得
+
+        ライトビハインド中の未コミット分を DB の値に重ねて返す
+        """
+        order_ids = list(dict.fromkeys(order_ids))
+
+        def select():
+            rows = {}
+            for chunk in self._chunks(order_ids):
+                placeholders = ",".join("?" * len(chunk))
+                cursor = self.conn.execute(
+                    f"SELECT order_id, status, retry_count, next_attempt_at FROM orders WHERE order_id IN ({placeholders})",
+                    chunk,
+                )
+                rows.update(
+                    {row[0]: (row[1], row[2] or 0, row[3]) for row in cursor.fetchall()}
+                )
+            return rows
+
+        rows, pending = self._read_with_overlay(select, order_ids)
+        for order_id, writes in pending.items():
+            status = writes[-1].status
+            _, retry_count, _ = rows.get(order_id, (None, 0, None))
+            next_attempt_at = self.NOT_DUE if status == OrderStatus.RETRY.value else None
+            retry_count += sum(write.retry_delta for write in writes)
+            rows[order_id] = (status, retry_count, next_attempt_at)
+        return rows
+
+    def _read_with_overlay(self, select, keys: list) -> tuple:
+        """
+        DB の値と、それに重ねる未コミットの書き込みを取得
+
+        ロックは未コミット分の取得時だけ持ち、SELECT 中は書き込みスレッドを止めない。
+        SELECT の間にコミットが重なった場合は読み直す
+
+        Returns:
+            (select() の結果, {キー: [PendingWrite]})
+        """
+        if not self._writer:
+            return select(), {}
+        for _ in range(self.READ_ATTEMPTS):
+            before = self._writer.generation
+            rows = select()
+            after, pending = self._writer.pending_writes(keys)
+            if before == after and before % 2 == 0:
+                break
+        return rows, pending
+
+    @staticmethod
+    def _shop_key(shop_id: str) -> str:
+        """ショップの未コミット結果をオーバーレイに載せるキー（注文番号と重ならない）"""
+        return f"shop:{shop_id}"
+
+    def _write(self, write: PendingWrite):
+        """書き込みを実行（ライトビハインド時はキューに積むだけ）"""
+        if self._writer:
+            self._writer.submit(write)
+            return
+        with self.conn:
+            self.conn.execute(write.sql, write.params)
 
     def should_process(self, order_id: str) -> bool:
         """この注文を処理すべきか判定"""
-        status = self.get_order_status(order_id)
+        decision, _ = self.classify_orders([order_id])[order_id]
+        return decision == self.DECISION_PROCESS
+
+    def classify_orders(self, order_ids: list) -> dict:
+        """
+        複数注文の処理要否をまとめて判定
 
-        # 最終ステータスはスキップ
-        if OrderStatus.is_final(status):
-            return False
+        IN (...) クエリで状態を取得し、最大リトライ回数に到達した
+        RETRY 注文は 1 回の UPDATE で ERROR に切り替える
+
+        Returns:
+            dict: {order_id: (判定, ステータス)}
+        """
+        if not order_ids:
+            return {}
 
-        # リトライ回数チェック
-        if status == OrderStatus.RETRY.value:
-            retry_count = self.get_retry_count(order_id)
-            if retry_count >= self.MAX_RETRY_COUNT:
+        rows = self._read_states(order_ids)
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        decisions = {}
+        escalate = []
+        for order_id in order_ids:
+            status, retry_count, next_attempt_at = rows.get(order_id, (None, 0, None))
+
+            if (
+                status == OrderStatus.RETRY.value
+                and (retry_count or 0) >= self.MAX_RETRY_COUNT
+            ):
                 # 最大リトライ回数に到達 → エラーに切り替え
-                self.update_order(
-                    order_id,
-                    OrderStatus.ERROR.value,
-                    error_message="最大リトライ回数に到達",
+                escalate.append(order_id)
+                decisions[order_id] = (self.DECISION_ESCALATE, OrderStatus.ERROR.value)
+            elif next_attempt_at and next_attempt_at > now:
+                # バックオフ中（次回試行日時前）
+                decisions[order_id] = (self.DECISION_DEFER, status)
+            elif OrderStatus.should_process(status):
+                decisions[order_id] = (self.DECISION_PROCESS, status)
+            else:
+                decisions[order_id] = (self.DECISION_SKIP, status)
+
+        # 領収書非対応と判明しているショップの注文は詳細を開かずに NO_RECEIPT
+        process_ids = [
+            order_id
+            for order_id, (decision, _) in decisions.items()
+            if decision == self.DECISION_PROCESS
+        ]
+        if process_ids:
+            no_receipt_shops = self.get_no_receipt_shops(
+                {OrderEntry.shop_id_of(order_id) for order_id in process_ids}
+            )
+            for order_id in process_ids:
+                if OrderEntry.shop_id_of(order_id) in no_receipt_shops:
+                    decisions[order_id] = (
+                        self.DECISION_SHOP_NO_RECEIPT,
+                        OrderStatus.NO_RECEIPT.value,
+                    )
+                    self.update_order(
+                        order_id,
+                        OrderStatus.NO_RECEIPT.value,
+                        error_message="領収書発行機能なし（ショップの過去の結果から判定）",
+                        shop_skipped=True,
+                    )
+
+        if escalate:
+            for chunk in self._chunks(list(dict.fromkeys(escalate))):
+                placeholders = ",".join("?" * len(chunk))
+                self._write(
+                    PendingWrite(
+                        chunk,
+                        OrderStatus.ERROR.value,
+                        ESCALATE_SQL.format(placeholders=placeholders),
+                        [
+                            OrderStatus.ERROR.value,
+                            "最大リトライ回数に到達",
+                            now,
+                            self.run_id,
+                            *chunk,
+                        ],
+                    )
                 )
-                return False
 
-        return OrderStatus.should_process(status)
+        return decisions
+
+    def _chunks(self, items: list):
+        """IN 句用にリストを分割"""
+        for i in range(0, len(items), self.IN_CLAUSE_CHUNK):
+            yield items[i : i + self.IN_CLAUSE_CHUNK]
 
     def update_order(
         self,
@@ -86,131 +488,326 @@ class DBManager:
         error_message: str = None,
         increment_retry: bool = False,
         order_number: int = None,
+        shop_skipped: bool = False,
     ):
-        """注文ステータスを更新または挿入"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """
+        注文ステータスを更新または挿入（UPSERT 1 文、ライトビハインド時は非同期）
+
+        shop_skipped=True はショップの過去の結果から判定した（詳細を開いていない）NO_RECEIPT。
+        ショップの発行成功時に処理対象へ戻す
+        """
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        cursor.execute(
-            "SELECT 1, retry_count FROM orders WHERE order_id = ?", (order_id,)
+        retry_delta = 1 if increment_retry else 0
+        backoff = status == OrderStatus.RETRY.value
+
+        self._write(
+            PendingWrite(
+                [order_id],
+                status,
+                UPSERT_ORDER_SQL,
+                {
+                    "order_id": order_id,
+                    "order_number": order_number,
+                    "status": status,
+                    "filename": filename,
+                    # DONE ステータスの場合はダウンロード日時を設定
+                    "downloaded_at": now if status == "DONE" else None,
+                    "error_message": error_message,
+                    "retry_delta": retry_delta,
+                    "now": now,
+                    "run_id": self.run_id,
+                    "shop_skipped": int(shop_skipped),
+                    # RETRY は指数バックオフで次回試行日時を設定
+                    "backoff": int(backoff),
+                    "backoff_base": Config.RETRY_BACKOFF_BASE_HOURS * 3600,
+                    "backoff_cap": Config.RETRY_BACKOFF_MAX_HOURS * 3600,
+                    "jitter": random.uniform(
+                        1 - self.BACKOFF_JITTER, 1 + self.BACKOFF_JITTER
+                    ),
+                },
+                retry_delta=retry_delta,
+            )
         )
-        result = cursor.fetchone()
-        exists = result is not None
-        current_retry = result[1] if result else 0
 
-        retry_count = current_retry + 1 if increment_retry else current_retry
+    def record_discovered_orders(self, entries: list):
+        """
+        一覧で検出した注文の遷移先を記録
 
-        # DONE ステータスの場合はダウンロード日時を設定
-        downloaded_at = now if status == "DONE" else None
+        未登録の注文は PENDING で登録し、登録済みの注文はステータスを変えずに
+        詳細URL・一覧URL・Books 判定だけを更新する
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for entry in entries:
+            # ステータスは変えないため、読み取り時のオーバーレイには載せない
+            self._write(
+                PendingWrite(
+                    [],
+                    None,
+                    RECORD_DISCOVERED_SQL,
+                    {
+                        "order_id": entry.order_id,
+                        "status": OrderStatus.PENDING.value,
+                        "detail_url": entry.detail_url,
+                        "list_url": entry.list_url,
+                        "is_books": int(entry.is_books),
+                        "now": now,
+                        "run_id": self.run_id,
+                    },
+                )
+            )
 
-        if exists:
-            if status == "DONE":
-                cursor.execute(
-                    """
-                    UPDATE orders 
-                    SET status = ?, filename = ?, error_message = ?, 
-                        retry_count = ?, downloaded_at = ?, updated_at = ?
-                    WHERE order_id = ?
-                """,
-                    (
-                        status,
-                        filename,
-                        error_message,
-                        retry_count,
-                        downloaded_at,
-                        now,
-                        order_id,
-                    ),
+    def record_shop_result(self, shop_id: str, status: str, definitive: bool = False):
+        """
+        実際に発行を試みた結果をショップ単位で記録
+
+        DONE は連続回数をリセットし、ショップの結果から NO_RECEIPT にした注文を処理対象に戻す。
+        NO_RECEIPT は definitive（ページ上で発行できないと確認できた）の場合のみ数える。
+        未発送や表示の遅れによる「見つからない」でショップ全体を非対応扱いにしないため
+
+        Args:
+            shop_id: ショップID
+            status: 発行結果のステータス
+            definitive: NO_RECEIPT が確定的な判定か（IssueResult.definitive）
+        """
+        if not shop_id:
+            return
+        if status == OrderStatus.NO_RECEIPT.value and not definitive:
+            return
+        if status not in (OrderStatus.DONE.value, OrderStatus.NO_RECEIPT.value):
+            return
+
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if status == OrderStatus.DONE.value:
+            # 対象の注文はまとめて更新するため、読み取り時のオーバーレイには載せない
+            self._write(
+                PendingWrite(
+                    [],
+                    None,
+                    REQUEUE_SHOP_SKIPPED_SQL,
+                    {
+                        "status": OrderStatus.PENDING.value,
+                        "skipped_status": OrderStatus.NO_RECEIPT.value,
+                        "prefix": f"{shop_id}-%",
+                        "now": now,
+                        "run_id": self.run_id,
+                    },
                 )
-            else:
-                cursor.execute(
-                    """
-                    UPDATE orders 
-                    SET status = ?, filename = ?, error_message = ?, 
-                        retry_count = ?, updated_at = ?
-                    WHERE order_id = ?
-                """,
-                    (status, filename, error_message, retry_count, now, order_id),
+            )
+        # 未コミットの間も get_no_receipt_shops() に反映するためオーバーレイに載せる
+        self._write(
+            PendingWrite(
+                [self._shop_key(shop_id)],
+                status,
+                RECORD_SHOP_RESULT_SQL,
+                {
+                    "shop_id": shop_id,
+                    "no_receipt": int(status == OrderStatus.NO_RECEIPT.value),
+                    "success": int(status == OrderStatus.DONE.value),
+                    "result": status,
+                    "now": now,
+                },
+            )
+        )
+
+    def get_no_receipt_shops(self, shop_ids) -> set:
+        """
+        領収書非対応とみなすショップを返す
+
+        NO_RECEIPT が閾値以上連続し、最終確認から SHOP_RECHECK_DAYS 以内のショップ。
+        期限切れのショップは次の注文で実際に確認し直す
+        """
+        shop_ids = [shop_id for shop_id in shop_ids if shop_id]
+        if not shop_ids or Config.SHOP_RECHECK_DAYS <= 0:
+            return set()
+
+        since = (datetime.now() - timedelta(days=Config.SHOP_RECHECK_DAYS)).strftime(
+            "%Y-%m-%d %H:%M:%S"
+        )
+
+        def select():
+            rows = {}
+            for chunk in self._chunks(shop_ids):
+                placeholders = ",".join("?" * len(chunk))
+                cursor = self.conn.execute(
+                    f"""
+                    SELECT shop_id, no_receipt_streak, last_checked_at
+                    FROM shop_capabilities WHERE shop_id IN ({placeholders})
+                    """,
+                    chunk,
                 )
-        else:
-            cursor.execute(
-                """
-                INSERT INTO orders 
-                (order_id, order_number, status, filename, downloaded_at, error_message, retry_count, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-                (
-                    order_id,
-                    order_number,
-                    status,
-                    filename,
-                    downloaded_at,
-                    error_message,
-                    retry_count,
-                    now,
-                    now,
-                ),
-            )
-
-        conn.commit()
-        conn.close()
-
-    def get_summary(self, since: str = None) -> dict:
-        """ステータス別の集計を取得 (since以降)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+                rows.update({row[0]: (row[1], row[2]) for row in cursor.fetchall()})
+            return rows
 
-        if since:
-            cursor.execute(
+        keys = {self._shop_key(shop_id): shop_id for shop_id in shop_ids}
+        rows, pending = self._read_with_overlay(select, list(keys))
+
+        # 未コミットの結果を RECORD_SHOP_RESULT_SQL と同じ規則で重ねる
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for key, writes in pending.items():
+            streak, last_checked_at = rows.get(keys[key], (0, None))
+            for write in writes:
+                streak = 0 if write.status == OrderStatus.DONE.value else streak + 1
+                last_checked_at = now
+            rows[keys[key]] = (streak, last_checked_at)
+
+        return {
+            shop_id
+            for shop_id, (streak, last_checked_at) in rows.items()
+            if streak >= Config.SHOP_NO_RECEIPT_THRESHOLD
+            and last_checked_at
+            and last_checked_at >= since
+        }
+
+    def get_watermark(self, account_key: str) -> str:
+        """アカウントの巡回ウォーターマーク（処理済みとみなす最新注文ID）を取得"""
+        if account_key in self._watermarks:
+            return self._watermarks[account_key]  # 未コミットの更新（flush 待ちをしない）
+        row = self.conn.execute(
+            "SELECT order_id FROM crawl_watermarks WHERE account_key = ?",
+            (account_key,),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, account_key: str, order_id: str):
+        """アカウントの巡回ウォーターマークを更新"""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._watermarks[account_key] = order_id
+        self._write(
+            PendingWrite([], None, SET_WATERMARK_SQL, (account_key, order_id, now))
+        )
+
+    def get_selector_stats(self) -> list:
+        """セレクタ統計を呼び出し箇所・ヒット数順に取得"""
+        self.flush()
+        cursor = self.conn.execute(
+            """
+            SELECT call_site, selector, hits, misses, total_ms, last_hit_at
+            FROM selector_stats ORDER BY call_site, hits DESC, misses
+            """
+        )
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def add_selector_stats(self, rows: list):
+        """セレクタ統計の増分を加算"""
+        for row in rows:
+            self._write(PendingWrite([], None, ADD_SELECTOR_STATS_SQL, row))
+
+    def get_step_timings(self) -> dict:
+        """
+        ステップごとの完了時間サンプルを取得
+
+        Returns:
+            dict: {ステップ名: [(完了時間（ミリ秒）, 打ち切りなら True), ...]}
+        """
+        self.flush()
+        timings = {}
+        for step, samples in self.conn.execute("SELECT step, samples FROM step_timings"):
+            try:
+                timings[step] = [
+                    # 打ち切りフラグのない旧形式（数値のみ）は完了サンプルとして読む
+                    (float(v), False) if isinstance(v, (int, float)) else (float(v[0]), bool(v[1]))
+                    for v in json.loads(samples)
+                ]
+            except (TypeError, ValueError, IndexError):
+                continue  # 壊れたサンプルは破棄して学習し直す
+        return timings
+
+    def save_step_timings(self, timings: dict):
+        """ステップごとの完了時間サンプル（[(ミリ秒, 打ち切り), ...]）を保存（置き換え）"""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for step, samples in timings.items():
+            self._write(
+                PendingWrite(
+                    [], None, SAVE_STEP_TIMINGS_SQL, (step, json.dumps(samples), now)
+                )
+            )
+
+    def get_summary(self, since: str = None, run_id: str = None) -> dict:
+        """
+        ステータス別の集計を取得
+
+        run_id 指定時は実行単位の件数テーブルを参照し、
+        since 指定時は updated_at インデックスで範囲検索する
+        """
+        self.flush()
+        if run_id:
+            cursor = self.conn.execute(
                 """
-                SELECT status, COUNT(*) 
-                FROM orders 
+                SELECT status, order_count
+                FROM run_status_counts
+                WHERE run_id = ? AND order_count > 0
+                """,
+                (run_id,),
+            )
+        elif since:
+            cursor = self.conn.execute(
+                """
+                SELECT status, COUNT(*)
+                FROM orders
                 WHERE updated_at >= ?
                 GROUP BY status
                 """,
                 (since,),
             )
         else:
-            cursor.execute(
+            cursor = self.conn.execute(
                 """
-                SELECT status, COUNT(*) 
-                FROM orders 
+                SELECT status, COUNT(*)
+                FROM orders
                 GROUP BY status
                 """
             )
 
-        results = cursor.fetchall()
-        conn.close()
-        return {row[0]: row[1] for row in results}
+        return {row[0]: row[1] for row in cursor.fetchall()}
 
     def get_pending_orders(self) -> list:
         """再処理対象の注文IDリストを取得"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute(
+        self.flush()
+        cursor = self.conn.execute(
             """
-            SELECT order_id FROM orders 
+            SELECT order_id FROM orders
             WHERE status IN (?, ?) AND retry_count < ?
         """,
             (OrderStatus.RETRY.value, OrderStatus.PENDING.value, self.MAX_RETRY_COUNT),
         )
-        results = cursor.fetchall()
-        conn.close()
-        return [row[0] for row in results]
+        return [row[0] for row in cursor.fetchall()]
 
-    def export_report(self, csv_path="report.csv", since: str = None):
-        """データをCSVにエクスポート"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_pending_entries(self) -> list:
+        """再処理対象の注文を、記録済みの遷移先付きで取得（古い注文から順）"""
+        self.flush()
+        cursor = self.conn.execute(
+            """
+            SELECT order_id, detail_url, is_books, list_url
+            FROM orders
+            WHERE status IN (?, ?) AND retry_count < ?
+            ORDER BY created_at
+        """,
+            (OrderStatus.RETRY.value, OrderStatus.PENDING.value, self.MAX_RETRY_COUNT),
+        )
+        return [
+            OrderEntry(
+                order_id,
+                detail_url=detail_url,
+                is_books=bool(is_books),
+                list_url=list_url,
+            )
+            for order_id, detail_url, is_books, list_url in cursor
+        ]
 
+    def export_report(
+        self, csv_path="report.csv", since: str = None, run_id: str = None
+    ):
+        """データをCSVにエクスポート"""
+        self.flush()
         if since:
-            cursor.execute(
+            cursor = self.conn.execute(
                 "SELECT * FROM orders WHERE updated_at >= ? ORDER BY updated_at DESC",
                 (since,),
             )
         else:
-            cursor.execute("SELECT * FROM orders ORDER BY updated_at DESC")
+            cursor = self.conn.execute("SELECT * FROM orders ORDER BY updated_at DESC")
 
         rows = cursor.fetchall()
 
@@ -225,10 +822,8 @@ class DBManager:
                 writer.writerow(column_names)
             writer.writerows(rows)
 
-        conn.close()
-
         # サマリーを出力
-        summary = self.get_summary(since)
+        summary = self.get_summary(since, run_id=run_id)
         print(f"\n=== 実行サマリー ===")
         print(f"完了 (DONE): {summary.get('DONE', 0)} 件")
         print(f"発行不可 (NO_RECEIPT): {summary.get('NO_RECEIPT', 0)} 件")
@@ -237,6 +832,15 @@ class DBManager:
         print(f"レポート出力: {csv_path}")
 
     def close(self):
-        """DBリソースを解放（安全終了用）"""
-        # SQLiteはコネクションをメソッドごとに開閉しているため特別な処理不要
-        pass
+        """DBリソースを解放（キューを書き切り、WALをチェックポイントして閉じる）"""
+        if self._writer:
+            self._writer.close()
+            atexit.unregister(self._writer.close)
+        if self.conn is None:
+            return
+        try:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            self.conn.close()
+            self.conn = None
+
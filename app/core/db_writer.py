@@ -0,0 +1,223 @@
+"""
+DB書き込みキュー（ライトビハインド）
+責務: ステータス更新を専用スレッドでまとめてコミットし、イベントループを止めない
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from app.utils.logger import log_debug, log_error
+
+
+class PendingWrite:
+    """未コミットの書き込み（読み取り時のオーバーレイにも使用）"""
+
+    def __init__(
+        self, order_ids: list, status: str, sql: str, params, retry_delta: int = 0
+    ):
+        self.order_ids = order_ids
+        self.status = status
+        self.sql = sql
+        self.params = params
+        self.retry_delta = retry_delta
+
+
+class _FlushRequest:
+    """キューに積まれた時点までの書き込み完了を通知するマーカー"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """
+    書き込みをキューに積み、件数または時間をトリガーにバッチコミットする
+
+    読み取り側はロックを持たずに DB を SELECT し、その後 pending_writes() で
+    未コミット分を取得する。generation はコミット開始時と（オーバーレイ除去後の）
+    完了時に 1 ずつ進むため、SELECT の前後で値が変わった・奇数（コミット中）の場合は
+    読み直せば、DB の値と未コミット分の二重計上・取りこぼしを避けられる
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        pragmas: tuple = (),
+        batch_size: int = 50,
+        flush_interval: float = 0.5,
+    ):
+        self.db_path = db_path
+        self.pragmas = pragmas
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue()
+        self._pending = {}  # order_id -> [PendingWrite]
+        self._pending_lock = threading.Lock()
+        self._generation = 0  # コミット中は奇数
+        self._unflushed = 0  # 積まれてまだ書き込んでいない件数
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="db-write-behind", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, write: PendingWrite):
+        """書き込みをキューに積む（ブロックしない）"""
+        if self._closed:
+            raise RuntimeError("WriteBehindWriter is closed")
+        with self._pending_lock:
+            for order_id in write.order_ids:
+                self._pending.setdefault(order_id, []).append(write)
+            self._unflushed += 1
+        self._queue.put(write)
+
+    @property
+    def generation(self) -> int:
+        """コミットの世代（コミット中は奇数）"""
+        return self._generation
+
+    def pending_writes(self, keys) -> tuple:
+        """
+        未コミットの書き込みを取得
+
+        Returns:
+            (generation, {キー: [PendingWrite（古い順）]})（未コミット分のないキーは含まない）
+        """
+        with self._pending_lock:
+            return self._generation, {
+                key: list(self._pending[key]) for key in keys if self._pending.get(key)
+            }
+
+    @property
+    def pending_count(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self, timeout: float = None) -> bool:
+        """呼び出し時点までに積まれた書き込みのコミットを待つ（未書き込みがなければ即座に戻る）"""
+        if self._closed or not self._thread.is_alive() or not self._unflushed:
+            return True
+        request = _FlushRequest()
+        self._queue.put(request)
+        return request.done.wait(timeout)
+
+    def close(self):
+        """キューを書き切ってスレッドを停止"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        """書き込みスレッドのメインループ"""
+        conn = sqlite3.connect(self.db_path)
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+
+        try:
+            while True:
+                item = self._queue.get()
+                batch = []
+                markers = []
+                stop = False
+
+                # 件数 or 時間でバッチを区切る
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, _FlushRequest):
+                        markers.append(item)
+                    else:
+                        batch.append(item)
+
+                    if stop or markers or len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+
+                if stop:
+                    # 停止要求以前に積まれた残りも書き切る
+                    while True:
+                        try:
+                            rest = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if isinstance(rest, _FlushRequest):
+                            markers.append(rest)
+                        elif rest is not _STOP:
+                            batch.append(rest)
+
+                if batch:
+                    self._write_batch(conn, batch)
+                for marker in markers:
+                    marker.done.set()
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _write_batch(self, conn, batch: list):
+        """1 トランザクションでバッチをコミット（失敗時は1件ずつ）"""
+        try:
+            for write in batch:
+                conn.execute(write.sql, write.params)
+            self._commit(conn, batch)
+            log_debug(f"DB書き込み: {len(batch)} 件をコミット")
+        except sqlite3.Error as e:
+            conn.rollback()
+            log_error(f"DBバッチ書き込み失敗、1件ずつ再試行します: {e}")
+            for write in batch:
+                try:
+                    conn.execute(write.sql, write.params)
+                    self._commit(conn, [write])
+                except sqlite3.Error as ex:
+                    conn.rollback()
+                    log_error(f"DB書き込み失敗: {write.order_ids} - {ex}")
+                    # 失敗した書き込みもオーバーレイから外す（DB の値に戻す）
+                    self._commit(None, [write])
+
+    def _commit(self, conn, writes: list):
+        """
+        コミットしてオーバーレイから外す（前後で generation を進める）
+
+        ロックはコミット中に持たないため、submit() や読み取りを待たせない
+        """
+        with self._pending_lock:
+            self._generation += 1
+        committed = False
+        try:
+            if conn is not None:
+                conn.commit()
+            committed = True
+        finally:
+            with self._pending_lock:
+                if committed:
+                    self._release(writes)
+                    self._unflushed -= len(writes)
+                self._generation += 1
+
+    def _release(self, batch: list):
+        """コミット済みの書き込みをオーバーレイから外す（_pending_lock 内で呼ぶ）"""
+        for write in batch:
+            for order_id in write.order_ids:
+                writes = self._pending.get(order_id)
+                if not writes:
+                    continue
+                try:
+                    writes.remove(write)
+                except ValueError:
+                    pass
+                if not writes:
+                    del self._pending[order_id]
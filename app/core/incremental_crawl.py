@@ -0,0 +1,99 @@
+"""
+差分巡回（インクリメンタルモード）
+責務: 処理済みの注文だけが続くページに到達したら一覧の巡回を打ち切る
+"""
+
+from app.config import Config
+from app.models.order_status import OrderStatus
+from app.utils.logger import log_info
+
+
+class IncrementalCrawl:
+    """
+    一覧ページの判定結果を見て巡回の打ち切りを決める
+
+    購入履歴は新しい順に並ぶため、最終ステータスの注文だけのページが
+    stop_pages ページ連続したら、それ以降も処理済みとみなして停止する。
+    停止時はその連続区間の最新注文をウォーターマークとして保存し、
+    次回はウォーターマークを含む処理済みページで即座に停止する。
+
+    期間シャードで巡回する場合は start_shard() でシャードごとに判定をやり直し、
+    停止はそのシャードだけに適用する（古いシャードも先頭ページから確認する）。
+    """
+
+    def __init__(self, db_manager, account_key: str, stop_pages: int = 2):
+        self.db = db_manager
+        self.account_key = account_key
+        self.stop_pages = max(1, stop_pages)
+        self.watermark = db_manager.get_watermark(account_key)
+        self._settled_pages = 0
+        self._streak_head = None  # 連続区間の最新注文ID
+        self._watermark_saved = False  # この実行でウォーターマークを更新済み
+
+    @classmethod
+    def from_config(cls, db_manager):
+        """設定から生成（インクリメンタルモード無効時はNone）"""
+        if not Config.INCREMENTAL_MODE:
+            return None
+        crawl = cls(db_manager, Config.get_account_key(), Config.INCREMENTAL_STOP_PAGES)
+        log_info(
+            f"インクリメンタルモード: 処理済みページ {crawl.stop_pages} 連続で停止"
+            f"（ウォーターマーク: {crawl.watermark or 'なし'}）"
+        )
+        return crawl
+
+    def start_shard(self):
+        """次の期間シャードの先頭ページから判定をやり直す"""
+        self._settled_pages = 0
+        self._streak_head = None
+
+    def record_page(self, order_ids: list, decisions: dict) -> bool:
+        """
+        処理前の判定結果でページを評価
+
+        Args:
+            order_ids: ページ内の注文ID（表示順）
+            decisions: DBManager.classify_orders の結果
+
+        Returns:
+            bool: 巡回を打ち切る場合True
+        """
+        if not order_ids:
+            return False
+
+        settled = all(
+            OrderStatus.is_final(decisions[order_id][1]) for order_id in order_ids
+        )
+        if not settled:
+            self._settled_pages = 0
+            self._streak_head = None
+            return False
+
+        self._settled_pages += 1
+        if self._streak_head is None:
+            self._streak_head = order_ids[0]
+
+        if self.watermark and self.watermark in order_ids:
+            log_info(f"ウォーターマーク {self.watermark} に到達（巡回終了）")
+            self._save_watermark()
+            return True
+
+        if self._settled_pages >= self.stop_pages:
+            log_info(f"処理済みページが {self._settled_pages} ページ連続（巡回終了）")
+            self._save_watermark()
+            return True
+
+        return False
+
+    def _save_watermark(self):
+        """
+        連続区間の最新注文をウォーターマークとして保存
+
+        シャードは新しい順に巡回するため、保存するのは実行中で最初（最新）の停止位置だけ
+        """
+        if self._watermark_saved:
+            return
+        self._watermark_saved = True
+        if self._streak_head and self._streak_head != self.watermark:
+            self.db.set_watermark(self.account_key, self._streak_head)
+            self.watermark = self._streak_head
@@ -3,10 +3,15 @@
 責務: 各ログイン方式の具体的な操作手順
 """
 
-import asyncio
 from abc import ABC, abstractmethod
 from app.config import Config
 from app.utils.logger import log_info, log_debug, log_warning
+from app.utils.page_utils import PageUtils
+from app.utils.readiness import Readiness, ReadyCondition
+from app.utils.timeouts import TimeoutRegistry
+
+LOGIN_HOST = "login.account.rakuten.com"
+PASSWORD_SELECTOR = 'input[name="password"]'
 
 
 class LoginFlowStrategy(ABC):
@@ -22,7 +27,15 @@ class LoginFlowStrategy(ABC):
 
     async def is_logged_in(self) -> bool:
         """ログイン成功判定"""
-        return "login.account.rakuten.com" not in self.page.url
+        return LOGIN_HOST not in self.page.url
+
+    async def _wait_for_login_redirect(self, step: str, legacy_sleep: float) -> bool:
+        """ログインページから離れるまで待機"""
+        return await Readiness.wait(
+            step,
+            [ReadyCondition.url_matches(self.page, lambda url: LOGIN_HOST not in url)],
+            legacy_sleep,
+        )
 
 
 class LegacyLoginFlow(LoginFlowStrategy):
@@ -73,10 +86,11 @@ class GlobalIdLoginFlow(LoginFlowStrategy):
             await self._click_next_button()
 
             # パスワード欄の待機
-            pass_selector = 'input[name="password"]'
-            await self.page.wait_for_selector(
-                pass_selector, state="visible", timeout=10000
-            )
+            pass_selector = PASSWORD_SELECTOR
+            with TimeoutRegistry.step("login.password_field", 10000) as timeout:
+                await self.page.wait_for_selector(
+                    pass_selector, state="visible", timeout=timeout
+                )
 
             # パスワード入力
             await self.page.fill(pass_selector, Config.PASSWORD)
@@ -104,27 +118,34 @@ class GlobalIdLoginFlow(LoginFlowStrategy):
             'button:has-text("Next")',
         ]
 
-        for selector in next_selectors:
+        btn, index = await PageUtils.find_first_visible(
+            self.page, next_selectors, timeout=2000, call_site="login.next_button"
+        )
+        if btn:
             try:
-                btn = self.page.locator(selector).first
-                if await btn.is_visible(timeout=2000):
-                    await btn.click(force=True)
-                    log_debug(f"次へボタンをクリック: {selector}")
-                    await asyncio.sleep(1)
-                    return
+                await btn.click(force=True)
+                log_debug(f"次へボタンをクリック: {next_selectors[index]}")
+                await self._wait_for_password_field()
+                return
             except:
-                continue
+                pass
 
         # フォールバック: Enterキー
         await self.page.press('input[name="username"]', "Enter")
         log_debug("Enterキーで次へ")
-        await asyncio.sleep(1)
+        await self._wait_for_password_field()
+
+    async def _wait_for_password_field(self):
+        """「次へ」の後、パスワード欄が表示されるまで待機"""
+        await Readiness.wait(
+            "パスワード欄表示", [ReadyCondition.selector(self.page, PASSWORD_SELECTOR)], 1
+        )
 
     async def _click_submit_button(self, pass_selector: str):
         """ログイン送信（Enterキーを使用）"""
         await self.page.press(pass_selector, "Enter")
         log_debug("Enterキーで送信")
-        await asyncio.sleep(2)
+        await self._wait_for_login_redirect("ログイン送信", 2)
 
     async def _wait_for_login_success(self, max_wait: int = 10) -> bool:
         """ログイン成功を待機"""
@@ -132,12 +153,12 @@ class GlobalIdLoginFlow(LoginFlowStrategy):
             if await self.is_logged_in():
                 log_info("ログイン成功を検出しました")
                 return True
-            await asyncio.sleep(2)
+            await self._wait_for_login_redirect("ログイン完了待ち", 2)
 
         # まだログインページにいる場合、Enterキーで再試行
         if not await self.is_logged_in():
             log_info("まだログインページにいます。Enterキーで再試行...")
-            await self.page.press('input[name="password"]', "Enter")
-            await asyncio.sleep(3)
+            await self.page.press(PASSWORD_SELECTOR, "Enter")
+            await self._wait_for_login_redirect("ログイン再送信", 3)
 
         return await self.is_logged_in()
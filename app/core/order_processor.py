@@ -3,36 +3,86 @@
 責務: 注文処理の全体フロー制御、ページネーション、DB連携
 """
 
-import asyncio
 from app.config import Config
+from app.core.date_shards import DateShard
 from app.core.db_manager import DBManager
-from app.handlers import OrderHandlerFactory, BooksOrderHandler
+from app.core.incremental_crawl import IncrementalCrawl
+from app.core.pagination import PaginationModel
+from app.handlers import OrderHandlerFactory, StandardOrderHandler, BooksOrderHandler
+from app.models.order_entry import OrderEntry
 from app.models.order_status import OrderStatus, IssueResult
 from app.utils.logger import log_info, log_debug, log_warning, log_error, log_separator
+from app.utils.page_utils import PageUtils
+from app.utils.readiness import Readiness, ReadyCondition, PageReady
 
 
 class OrderProcessor:
     """注文処理のオーケストレーター"""
 
     MAX_ORDER_RETRY = 3  # 最大リトライ回数
+    NAVIGATION_TIMEOUT = 30000  # リンククリック後の遷移待ち上限（ミリ秒）
 
     def __init__(self, page, db_manager: DBManager):
         self.page = page
         self.db = db_manager
         self.should_stop = lambda: False  # デフォルトは常にFalse
+        self.pagination = PaginationModel()
+        self.incremental = IncrementalCrawl.from_config(db_manager)
+        self._reached_settled = False  # インクリメンタルモードで処理済み区間に到達（シャード単位）
+        self._current_shard = DateShard()  # 巡回中の期間シャード
+        self._passed_shard_start = False  # シャードの開始日より古い注文に到達
+        self._deferred = []  # 後でまとめて再試行する RETRY 注文 [(entry, 通し番号, 結果)]
 
     async def process_all(self):
-        """全ページの注文を処理"""
+        """全期間シャードの全ページの注文を処理"""
         log_separator()
         log_info("注文履歴を処理中...")
 
+        total_processed = 0
+        total_skipped = 0
+        total_errors = 0
+
+        shards = DateShard.from_config()
+        for shard in shards:
+            if self.should_stop():
+                break
+
+            if len(shards) > 1:
+                log_info(f"=== 期間 {shard.label} ===")
+
+            processed, skipped, errors = await self._process_shard(shard)
+            total_processed += processed
+            total_skipped += skipped
+            total_errors += errors
+
+        # 後回しにした RETRY 注文を再試行（待機なし）
+        processed, skipped, errors = await self._retry_deferred()
+        total_processed += processed
+        total_skipped += skipped
+        total_errors += errors
+
+        log_separator()
+        log_info("全ページ処理完了:")
+        log_info(f"  成功: {total_processed} 件")
+        log_info(f"  スキップ: {total_skipped} 件")
+        log_info(f"  エラー/リトライ: {total_errors} 件")
+
+    async def _process_shard(self, shard: DateShard) -> tuple:
+        """期間シャードの一覧を先頭ページから処理"""
         total_processed = 0
         total_skipped = 0
         total_errors = 0
         page_num = 1
 
-        # 最初のページに遷移（日付フィルター適用）
-        await self._navigate_to_purchase_history()
+        self._current_shard = shard
+        self._passed_shard_start = False
+        self._reached_settled = False
+        self.pagination = PaginationModel()
+        if self.incremental:
+            self.incremental.start_shard()
+
+        # シャードの先頭ページに遷移（日付フィルター適用）
+        await self._navigate_to_purchase_history(shard)
 
         while True:
             if self.should_stop():
@@ -48,6 +98,14 @@ class OrderProcessor:
             total_skipped += skipped
             total_errors += errors
 
+            if self._reached_settled:
+                log_info(f"期間 {shard.label} の以降のページは処理済みのため巡回を終了します")
+                break
+
+            if self._passed_shard_start:
+                log_info(f"期間 {shard.label} の範囲外に到達しました")
+                break
+
             # 次のページへ
             if not await self._go_to_next_page():
                 log_info("最後のページに到達しました")
@@ -55,37 +113,50 @@ class OrderProcessor:
 
             page_num += 1
 
-        log_separator()
-        log_info("全ページ処理完了:")
-        log_info(f"  成功: {total_processed} 件")
-        log_info(f"  スキップ: {total_skipped} 件")
-        log_info(f"  エラー/リトライ: {total_errors} 件")
+        return total_processed, total_skipped, total_errors
 
     async def _process_current_page(self) -> tuple:
         """現在のページの注文を処理"""
         # 現在のページURLを保存（詳細から戻る時に使用）
         self._current_list_url = self.page.url
 
+        # ページ番号パラメータ・総ページ数を学習（学習済みなら何もしない）
+        await self.pagination.observe(self.page)
+
         # 一覧ページでは Standard ハンドラで注文番号を抽出
         list_handler = OrderHandlerFactory.create(self.page)
 
-        # 注文番号を抽出
-        order_ids = await list_handler.extract_order_ids()
+        # 注文エントリを抽出（注文番号・詳細URL・Books判定を一括取得）
+        entries = await list_handler.extract_orders()
 
-        if not order_ids:
+        if not entries:
             log_warning("このページに注文が見つかりませんでした。")
             return 0, 0, 0
 
+        # 担当期間外の注文を除外
+        entries, self._passed_shard_start = self._current_shard.filter_entries(entries)
+        if not entries:
+            log_info("このページに期間内の注文はありません")
+            return 0, 0, 0
+
+        order_ids = [entry.order_id for entry in entries]
         log_info(f"このページに {len(order_ids)} 件の注文を検出")
 
         processed = 0
         skipped = 0
         errors = 0
 
-        for i, order_id in enumerate(order_ids):
-            # DBチェック（遷移前に判定）
-            if not self.db.should_process(order_id):
-                status = self.db.get_order_status(order_id)
+        # DBチェック（遷移前にページ分をまとめて判定）
+        decisions = self.db.classify_orders(order_ids)
+        # 詳細URL等を記録（次回以降の直接遷移・再処理用）
+        self.db.record_discovered_orders(entries)
+        if self.incremental:
+            self._reached_settled = self.incremental.record_page(order_ids, decisions)
+
+        for i, entry in enumerate(entries):
+            order_id = entry.order_id
+            decision, status = decisions[order_id]
+            if decision != DBManager.DECISION_PROCESS:
                 log_info(f"[{i + 1}/{len(order_ids)}] スキップ ({status}): {order_id}")
                 skipped += 1
                 continue
@@ -93,27 +164,19 @@ class OrderProcessor:
             log_info(f"[{i + 1}/{len(order_ids)}] 処理中: {order_id}")
 
             try:
-                # 現在の一覧ページに戻る（ページ番号を保持）
-                await self._navigate_to_current_list_page()
-
-                # Books判定（一覧ページで処理できるか確認）
-                if await BooksOrderHandler.is_books_order(self.page, order_id):
-                    log_info(f"Books注文検出(一覧処理): {order_id}")
-                    handler = BooksOrderHandler(self.page)
-                else:
-                    # 詳細ページに遷移（汎用ナビゲーション）
-                    if not await self._navigate_to_detail(order_id):
-                        log_warning(f"詳細遷移失敗: {order_id}")
-                        errors += 1
-                        continue
-
-                    # 詳細ページのURLでハンドラを選択
-                    handler = OrderHandlerFactory.create(self.page)
-                    log_debug(f"ハンドラ選択: {handler.__class__.__name__}")
+                result = await self._process_entry(entry)
+                if result is None:
+                    log_warning(f"詳細遷移失敗: {order_id}")
+                    errors += 1
+                    continue
 
-                # 領収書発行（リトライ付き）
-                result = await self._process_with_retry(handler, order_id, i + 1)
+                if result.status == OrderStatus.RETRY:
+                    # その場で待たずに後回しにし、次の注文へ進む
+                    log_warning(f"リトライ対象（後で再試行）: {result.error_message}")
+                    self._deferred.append((entry, i + 1, result))
+                    continue
 
+                self._update_db(order_id, result, i + 1)
                 if result.status == OrderStatus.DONE:
                     processed += 1
                 elif result.status == OrderStatus.NO_RECEIPT:
@@ -127,49 +190,94 @@ class OrderProcessor:
 
         return processed, skipped, errors
 
-    async def _process_with_retry(
-        self, handler, order_id: str, order_number: int
-    ) -> IssueResult:
-        """リトライ付き発行処理"""
-        result = None
-
-        for attempt in range(self.MAX_ORDER_RETRY):
-            if attempt > 0:
-                log_info(f"リトライ {attempt + 1}/{self.MAX_ORDER_RETRY}")
-                await asyncio.sleep(2)
-
-            result = await handler.issue_receipt(order_id)
-
-            if result.status in [
-                OrderStatus.DONE,
-                OrderStatus.NO_RECEIPT,
-                OrderStatus.ERROR,
-            ]:
-                self._update_db(order_id, result, order_number)
-                return result
-
-            if result.status == OrderStatus.RETRY:
-                log_warning(f"リトライ対象: {result.error_message}")
-                continue
+    async def _process_entry(self, entry) -> IssueResult:
+        """1件の注文の発行を 1 回試行（遷移失敗時はNone）"""
+        # Books判定（抽出時に判定済み。一覧ページで処理できる）
+        if entry.is_books:
+            log_info(f"Books注文検出(一覧処理): {entry.order_id}")
+            await self._open_list_page(entry)
+            handler = BooksOrderHandler(self.page)
+        else:
+            # 詳細ページに遷移（詳細URLへ直接、なければ一覧からクリック）
+            if not await self._open_detail(entry):
+                return None
 
-        # 最大リトライ到達 → RETRYとして保存（次回実行時にまたリトライするため）
-        # ただし、DBManager側で総リトライ回数が上限を超えたらERRORになる
-        msg = f"{self.MAX_ORDER_RETRY}回リトライ失敗: {result.error_message if result else '不明'}"
-        log_warning(f"最大リトライ回数到達: {order_id} -> 次回以降に持ち越し")
+            # 詳細ページのURLでハンドラを選択
+            handler = OrderHandlerFactory.create(self.page)
+            log_debug(f"ハンドラ選択: {handler.__class__.__name__}")
 
-        final_result = IssueResult.retry(msg)
+        return await handler.issue_with_deadline(entry.order_id)
 
-        self.db.update_order(
-            order_id,
-            OrderStatus.RETRY.value,
-            error_message=final_result.error_message,
-            increment_retry=True,  # ここでDBのretry_countを+1
-            order_number=order_number,
-        )
-        return final_result
+    async def _retry_deferred(self) -> tuple:
+        """
+        後回しにした RETRY 注文を全ページ処理後にまとめて再試行
+
+        1 注文あたり MAX_ORDER_RETRY 回まで試行し、それでも RETRY の注文は
+        retry_count を加算して次回以降の実行（バックオフ後）に持ち越す。
+        終了要求で再試行しきれなかった注文は retry_count を加算せずに持ち越す
+        """
+        processed = 0
+        skipped = 0
+        errors = 0
+        deferred, self._deferred = self._deferred, []
+        interrupted = set()  # 終了要求で残りの試行を行わなかった注文
+
+        for attempt in range(2, self.MAX_ORDER_RETRY + 1):
+            if not deferred:
+                break
+            if self.should_stop():
+                interrupted.update(entry.order_id for entry, _, _ in deferred)
+                break
+            log_info(f"リトライ {attempt}/{self.MAX_ORDER_RETRY}: {len(deferred)} 件")
+
+            remaining = []
+            for entry, order_number, last_result in deferred:
+                if self.should_stop():
+                    interrupted.add(entry.order_id)
+                    remaining.append((entry, order_number, last_result))
+                    continue
+                try:
+                    result = await self._process_entry(entry)
+                except Exception as e:
+                    log_error(f"処理エラー: {e}")
+                    result = IssueResult.retry(f"処理エラー: {str(e)[:100]}")
+                if result is None:
+                    result = IssueResult.retry("詳細遷移失敗")
+
+                if result.status == OrderStatus.RETRY:
+                    remaining.append((entry, order_number, result))
+                    continue
+
+                self._update_db(entry.order_id, result, order_number)
+                if result.status == OrderStatus.DONE:
+                    processed += 1
+                elif result.status == OrderStatus.NO_RECEIPT:
+                    skipped += 1
+                else:
+                    errors += 1
+            deferred = remaining
+
+        # 実行内で解決しなかった注文 → RETRYとして保存（次回試行日時はバックオフで設定）
+        # ただし、DBManager側で総リトライ回数が上限を超えたらERRORになる
+        for entry, order_number, result in deferred:
+            exhausted = entry.order_id not in interrupted
+            if exhausted:
+                log_warning(f"リトライ失敗: {entry.order_id} -> 次回以降に持ち越し")
+            else:
+                log_info(f"終了要求のため次回以降に持ち越し: {entry.order_id}")
+            self.db.update_order(
+                entry.order_id,
+                OrderStatus.RETRY.value,
+                error_message=f"実行内リトライ失敗: {result.error_message or '不明'}",
+                increment_retry=exhausted,  # 試行しきった場合だけDBのretry_countを+1
+                order_number=order_number,
+            )
+            errors += 1
+
+        return processed, skipped, errors
 
     def _update_db(self, order_id: str, result: IssueResult, order_number: int):
-        """発行結果をDBに保存"""
+        """発行結果をDBに保存（ショップの領収書対応状況も学習）"""
         self.db.update_order(
             order_id,
             result.status.value,
@@ -177,37 +285,56 @@ class OrderProcessor:
             error_message=result.error_message,
             order_number=order_number,
         )
+        self.db.record_shop_result(
+            OrderEntry.shop_id_of(order_id), result.status.value, result.definitive
+        )
 
-    async def _navigate_to_purchase_history(self):
-        """購入履歴ページ（1ページ目）に遷移（日付フィルター適用）"""
-        url = Config.PURCHASE_HISTORY_URL
-
-        # 日付フィルターが設定されている場合はURLに追加
-        if Config.is_date_filter_enabled():
-            params = []
-            if Config.DATE_FILTER_FROM:
-                # YYYY-MM形式からyear, monthを抽出
-                parts = Config.DATE_FILTER_FROM.split("-")
-                if len(parts) == 2:
-                    params.append(f"year={parts[0]}")
-                    params.append(f"month={parts[1]}")
-            if params:
-                url = f"{url}?{'&'.join(params)}"
-                log_info(f"日付フィルター適用: {Config.DATE_FILTER_FROM}")
+    async def _navigate_to_purchase_history(self, shard: DateShard = None):
+        """購入履歴ページ（1ページ目）に遷移（期間シャードの日付フィルター適用）"""
+        shard = shard or self._current_shard
+        url = shard.url(Config.PURCHASE_HISTORY_URL)
+        if url != Config.PURCHASE_HISTORY_URL:
+            log_info(f"日付フィルター適用: {shard.label}")
 
         await self.page.goto(url)
-        await self.page.wait_for_load_state("networkidle")
-        await asyncio.sleep(2)
+        await self._wait_for_order_list("一覧表示", 2)
 
     async def _navigate_to_current_list_page(self):
         """現在の一覧ページに戻る（ページ番号を保持）"""
         if hasattr(self, "_current_list_url") and self._current_list_url:
             await self.page.goto(self._current_list_url)
-            await self.page.wait_for_load_state("networkidle")
-            await asyncio.sleep(1)
+            await self._wait_for_order_list("一覧再表示", 1)
         else:
             await self._navigate_to_purchase_history()
 
+    async def _wait_for_order_list(self, step: str, settle: float):
+        """一覧ページの注文リンクが描画されるまで待機（注文がなければ networkidle + settle 秒）"""
+        await PageReady.wait(
+            self.page, step, [StandardOrderHandler.LIST_LINK_SELECTOR], settle
+        )
+
+    async def _open_detail(self, entry) -> bool:
+        """注文詳細ページを開く（一覧の再読み込み・リンク探索を省略）"""
+        if entry.detail_url and entry.detail_url.startswith("http"):
+            await self.page.goto(entry.detail_url)
+            await PageReady.wait(
+                self.page, "詳細ページ表示", StandardOrderHandler.RECEIPT_SECTION_SELECTORS
+            )
+            log_debug(f"詳細URLへ直接遷移: {entry.detail_url}")
+            return True
+
+        # 詳細URLがない場合は一覧ページに戻ってリンクをクリック
+        await self._open_list_page(entry)
+        return await self._navigate_to_detail(entry.order_id)
+
+    async def _open_list_page(self, entry):
+        """注文を検出した一覧ページに戻る（ページ番号を保持）"""
+        if entry.list_url:
+            await self.page.goto(entry.list_url)
+            await self._wait_for_order_list("抽出元の一覧表示", 1)
+        else:
+            await self._navigate_to_current_list_page()
+
     async def _navigate_to_detail(self, order_id: str) -> bool:
         """注文詳細ページに遷移（汎用）"""
         link_selectors = [
@@ -215,22 +342,45 @@ class OrderProcessor:
             f'a[href*="/detail/{order_id}"]',
         ]
 
-        for selector in link_selectors:
-            try:
-                link = self.page.locator(selector).first
-                if await link.is_visible(timeout=2000):
-                    await link.click()
-                    await self.page.wait_for_load_state("networkidle")
-                    await asyncio.sleep(1)
-                    log_debug(f"詳細遷移: {selector}")
-                    return True
-            except:
-                continue
+        link, index = await PageUtils.find_first_visible(
+            self.page, link_selectors, timeout=2000
+        )
+        if not link:
+            return False
 
-        return False
+        try:
+            list_url = self.page.url
+            await link.click()
+            await Readiness.wait(
+                "詳細ページ遷移",
+                [ReadyCondition.url_changed(self.page, list_url)],
+                1,
+                timeout=self.NAVIGATION_TIMEOUT,
+            )
+            await PageReady.wait(
+                self.page, "詳細ページ表示", StandardOrderHandler.RECEIPT_SECTION_SELECTORS
+            )
+            log_debug(f"詳細遷移: {link_selectors[index]}")
+            return True
+        except:
+            return False
 
     async def _go_to_next_page(self) -> bool:
         """次のページに遷移"""
+        # ページ番号パラメータを学習済みなら URL で直接遷移
+        if self.pagination.is_learned:
+            moved = await self.pagination.goto_next(
+                self.page, StandardOrderHandler.LIST_LINK_SELECTOR
+            )
+            if moved:
+                self._current_list_url = self.page.url
+                return True
+            if moved is False:
+                log_info("次のページが見つかりません（終了）")
+                return False
+            # 総ページ数の範囲内で遷移に失敗 → 「次へ」ボタンで遷移
+            log_info("URL での遷移に失敗したため、次へボタンで遷移します")
+
         # ページネーションボタンを探す前に、確実に一覧ページに戻る
         await self._navigate_to_current_list_page()
 
@@ -258,9 +408,11 @@ class OrderProcessor:
                             continue
 
                         await btn.click(timeout=3000)
-                        await self.page.wait_for_load_state("networkidle")
-                        await asyncio.sleep(2)
+                        await self.page.wait_for_load_state("domcontentloaded")
+                        await self._wait_for_order_list("次ページ表示", 2)
                         self._current_list_url = self.page.url
+                        if self.pagination.is_learned:
+                            self.pagination.moved_to(self.page.url)
                         log_info(
                             f"次のページへ遷移: {self._current_list_url} (selector: {selector})"
                         )
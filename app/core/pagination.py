@@ -0,0 +1,167 @@
+"""
+ページネーションモデル
+責務: 一覧URLのページ番号パラメータと総ページ数を学習し、任意ページへ直接遷移
+"""
+
+from collections import Counter
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+from app.utils.logger import log_info, log_debug, log_warning
+from app.utils.timeouts import TimeoutRegistry
+
+# ページ内のリンクのうち、テキストが数字のもの（ページ番号リンク候補）を取得
+PAGE_LINKS_SCRIPT = """
+() => Array.from(document.querySelectorAll("a[href]"))
+    .map((a) => ({ href: a.href, text: (a.textContent || "").trim() }))
+    .filter((link) => /^\\d+$/.test(link.text))
+"""
+
+
+class PaginationModel:
+    """一覧ページのページ番号パラメータを学習して goto で直接遷移する"""
+
+    READY_TIMEOUT = 10000  # 遷移後に注文リンクを待つ時間（ミリ秒、学習前の既定値）
+    ATTEMPTS = 2  # 総ページ数の範囲内のページへの遷移を試す回数
+
+    def __init__(self):
+        self.base_url = None  # 学習元の一覧URL
+        self.param = None  # ページ番号のクエリパラメータ名
+        self.total_pages = None  # 把握している最大ページ番号
+        self.current_page = 1
+
+    @property
+    def is_learned(self) -> bool:
+        return self.param is not None
+
+    async def observe(self, page):
+        """
+        一覧ページのページ番号リンクを読み取る
+
+        未学習時はパラメータ名と総ページ数を学習し、学習済みでも
+        把握している最終ページに到達した場合は総ページ数を更新する
+        （表示範囲が限られたページャーでも先のページを見つけるため）
+        """
+        if self.is_learned and (
+            self.total_pages is None or self.current_page < self.total_pages
+        ):
+            return
+
+        try:
+            links = await page.evaluate(PAGE_LINKS_SCRIPT)
+        except Exception as e:
+            log_debug(f"ページ番号リンクの取得に失敗: {e}")
+            return
+        if not isinstance(links, list):
+            return
+
+        if not self.is_learned:
+            param = self.detect_page_param(page.url, links)
+            if not param:
+                return
+            self.param = param
+            self.base_url = page.url
+            self.current_page = self._page_number_of(page.url) or self.current_page
+            log_info(f"ページ番号パラメータを学習: {param}")
+
+        numbers = [
+            int(link["text"])
+            for link in links
+            if self._page_number_of(link["href"]) == int(link["text"])
+        ]
+        if numbers:
+            total = max(numbers)
+            if self.total_pages is None or total > self.total_pages:
+                self.total_pages = total
+                log_info(f"総ページ数（把握分）: {total}")
+
+    @classmethod
+    def detect_page_param(cls, list_url: str, links: list) -> str:
+        """リンクテキストの数字と値が一致するクエリパラメータ名を推定"""
+        base = urlparse(list_url)
+        votes = Counter()
+        for link in links:
+            parsed = urlparse(link["href"])
+            if parsed.netloc != base.netloc or parsed.path != base.path:
+                continue
+            for key, value in parse_qsl(parsed.query):
+                if value == link["text"]:
+                    votes[key] += 1
+
+        if not votes:
+            return None
+        return votes.most_common(1)[0][0]
+
+    def url_for(self, page_number: int) -> str:
+        """指定ページのURLを生成"""
+        parsed = urlparse(self.base_url)
+        query = [(k, v) for k, v in parse_qsl(parsed.query) if k != self.param]
+        query.append((self.param, str(page_number)))
+        return urlunparse(parsed._replace(query=urlencode(query)))
+
+    async def goto_next(self, page, ready_selector: str):
+        """
+        次のページへ直接遷移
+
+        総ページ数の範囲内のページは ATTEMPTS 回まで試し、それでも表示できなければ
+        現在のページに戻して None を返す（呼び出し元は「次へ」ボタンでの遷移に切り替える）
+
+        Returns:
+            True: 注文リンクのあるページに遷移できた
+            False: 最終ページを過ぎた（総ページ数の超過、または総ページ数不明で注文なし）
+            None: 遷移に失敗した（最終ページとは判断できない）
+        """
+        next_page = self.current_page + 1
+        within_total = self.total_pages is not None and next_page <= self.total_pages
+        if self.total_pages is not None and not within_total:
+            return False
+
+        url = self.url_for(next_page)
+        attempts = self.ATTEMPTS if within_total else 1
+        for attempt in range(1, attempts + 1):
+            try:
+                await page.goto(url)
+            except Exception as e:
+                log_warning(f"ページ {next_page} への遷移に失敗 ({attempt}/{attempts}): {e}")
+                continue
+
+            try:
+                # 最終ページの次は必ずタイムアウトするため、実績から決めた上限で打ち切る
+                with TimeoutRegistry.step("list.next_page", self.READY_TIMEOUT) as timeout:
+                    await page.locator(ready_selector).first.wait_for(
+                        state="attached", timeout=timeout
+                    )
+            except Exception:
+                if not within_total:
+                    log_info(f"ページ {next_page} に注文がありません（終了）")
+                    return False
+                log_warning(
+                    f"ページ {next_page}/{self.total_pages} の注文が表示されません"
+                    f" ({attempt}/{attempts})"
+                )
+                continue
+
+            self.current_page = next_page
+            log_info(f"ページ {next_page} へ直接遷移: {url}")
+            return True
+
+        await self._return_to_current(page)
+        return None
+
+    async def _return_to_current(self, page):
+        """ボタンでの遷移に切り替えられるよう、現在のページに戻る"""
+        try:
+            await page.goto(self.url_for(self.current_page))
+        except Exception as e:
+            log_debug(f"現在のページに戻れませんでした: {e}")
+
+    def moved_to(self, url: str):
+        """ボタン等、URL 指定以外で次のページへ進んだことを記録"""
+        self.current_page = self._page_number_of(url) or self.current_page + 1
+
+    def _page_number_of(self, url: str) -> int:
+        """URLからページ番号を取得（パラメータがなければNone）"""
+        if not self.param:
+            return None
+        for key, value in parse_qsl(urlparse(url).query):
+            if key == self.param and value.isdigit():
+                return int(value)
+        return None
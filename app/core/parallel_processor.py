@@ -1,43 +1,153 @@
 """
-並列注文処理クラス（ページ単位）
-責務: 各ワーカーが異なるページを担当して並列処理
+並列注文処理クラス（パイプライン）
+責務: 一覧の巡回（ディスカバリ）と発行処理（ワーカー）をキューで分離して並列処理
 """
 
 import asyncio
 from app.config import Config
+from app.core.date_shards import DateShard
 from app.core.db_manager import DBManager
+from app.core.incremental_crawl import IncrementalCrawl
+from app.core.pagination import PaginationModel
 from app.handlers import OrderHandlerFactory, StandardOrderHandler, BooksOrderHandler
-from app.models.order_status import OrderStatus, IssueResult
+from app.models.order_status import OrderStatus
 from app.utils.logger import log_info, log_debug, log_warning, log_error, log_separator
+from app.utils.page_utils import PageUtils
+from app.utils.readiness import Readiness, ReadyCondition, PageReady
+from app.utils.timeouts import TimeoutRegistry
 
 
 class ParallelOrderProcessor:
-    """ページ単位で注文を並列処理"""
+    """ディスカバリ 1 本 + 発行ワーカー N 本のパイプラインで注文を並列処理"""
 
-    def __init__(self, worker_pages: list, db_manager: DBManager):
+    QUEUE_SIZE_PER_WORKER = 5  # キュー上限（ワーカー1つあたり）
+    MAX_ORDER_RETRY = 3  # 1 回の実行内での最大試行回数
+    NAVIGATION_TIMEOUT = 30000  # リンククリック後の遷移待ち上限（ミリ秒）
+
+    def __init__(self, worker_pages: list, db_manager: DBManager, discovery_page=None):
         self.worker_pages = worker_pages
         self.db = db_manager
         self.worker_count = len(worker_pages)
+        # 一覧ページを巡回するページ（未指定時はワーカー0が巡回後に処理へ合流）
+        self.discovery_page = discovery_page
         self.should_stop = lambda: False  # デフォルトは常にFalse
+        self._deferred = []  # 後でまとめて再試行する RETRY 注文 [(entry, 結果)]
+        self._attempted = set()  # ワーカーが処理を始めた注文（再試行の持ち越し判定用）
 
     async def process_all(self):
-        """全ワーカーで並列処理開始"""
+        """一覧の巡回と発行処理を並行して実行"""
         log_separator()
         log_info(f"並列処理開始 (ワーカー数: {self.worker_count})")
 
-        # 各ワーカーを起動（それぞれ異なるページを処理）
+        queue = asyncio.Queue(maxsize=self.worker_count * self.QUEUE_SIZE_PER_WORKER)
+
+        shared_page = self.discovery_page is None
+        discovery_page = self.worker_pages[0] if shared_page else self.discovery_page
+        discovery = asyncio.create_task(self._discovery_loop(discovery_page, queue))
+
         tasks = []
         for worker_id in range(self.worker_count):
             page = self.worker_pages[worker_id]
-            task = self._worker_loop(worker_id, page)
-            tasks.append(task)
+            # ディスカバリとページを共有するワーカーは巡回完了後に開始
+            wait_for = discovery if shared_page and worker_id == 0 else None
+            tasks.append(self._worker_loop(worker_id, page, queue, wait_for))
 
         # 全ワーカーの完了を待機
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
-        # 結果集計
+        # ワーカーが先に終了した場合（中断時）はディスカバリを止める
+        if not discovery.done():
+            discovery.cancel()
+        try:
+            discovery_skipped = await discovery
+        except asyncio.CancelledError:
+            discovery_skipped = 0
+        except Exception as e:
+            log_error(f"ディスカバリエラー: {e}")
+            discovery_skipped = 0
+
+        # 後回しにした RETRY 注文を再試行（待機なし）
+        results += await self._retry_deferred()
+        self._log_results(results, discovery_skipped)
+
+    async def process_orders(self, entries: list):
+        """
+        指定した注文だけを処理（一覧の巡回なし）
+
+        DB に記録済みの遷移先（詳細URL・一覧URL）へ直接遷移する
+        """
+        log_separator()
+        log_info(f"再処理開始: {len(entries)} 件 (ワーカー数: {self.worker_count})")
+
+        results = await self._run_entries(entries)
+        results += await self._retry_deferred()
+        self._log_results(results)
+
+    async def _run_entries(self, entries: list) -> list:
+        """注文リストをキューに積み、全ワーカーで処理"""
+        queue = asyncio.Queue()
+        for entry in entries:
+            queue.put_nowait(entry)
+        for _ in range(self.worker_count):
+            queue.put_nowait(None)
+
+        return await asyncio.gather(
+            *[
+                self._worker_loop(worker_id, page, queue)
+                for worker_id, page in enumerate(self.worker_pages)
+            ],
+            return_exceptions=True,
+        )
+
+    async def _retry_deferred(self) -> list:
+        """
+        後回しにした RETRY 注文を、キューが空になった後にまとめて再試行
+
+        1 注文あたり MAX_ORDER_RETRY 回まで試行し、それでも RETRY の注文は
+        retry_count を加算して次回以降の実行（バックオフ後）に持ち越す。
+        終了要求で再試行しきれなかった注文は retry_count を加算せずに持ち越す
+        """
+        results = []
+        interrupted = set()  # 終了要求で残りの試行を行わなかった注文
+        for attempt in range(2, self.MAX_ORDER_RETRY + 1):
+            if not self._deferred:
+                break
+            if self.should_stop():
+                interrupted.update(entry.order_id for entry, _ in self._deferred)
+                break
+            deferred, self._deferred = self._deferred, []
+            log_info(f"リトライ {attempt}/{self.MAX_ORDER_RETRY}: {len(deferred)} 件")
+            self._attempted = set()
+            results += await self._run_entries([entry for entry, _ in deferred])
+            # 終了要求でワーカーが取り出さなかった注文は前回の結果のまま持ち越す
+            for entry, result in deferred:
+                if entry.order_id not in self._attempted:
+                    interrupted.add(entry.order_id)
+                    self._deferred.append((entry, result))
+
+        # 実行内で解決しなかった注文 → RETRYとして保存（次回試行日時はバックオフで設定）
+        carried, self._deferred = self._deferred, []
+        for entry, result in carried:
+            exhausted = entry.order_id not in interrupted
+            if exhausted:
+                log_warning(f"リトライ失敗: {entry.order_id} -> 次回以降に持ち越し")
+            else:
+                log_info(f"終了要求のため次回以降に持ち越し: {entry.order_id}")
+            self.db.update_order(
+                entry.order_id,
+                OrderStatus.RETRY.value,
+                error_message=f"実行内リトライ失敗: {result.error_message or '不明'}",
+                increment_retry=exhausted,  # 試行しきった場合だけDBのretry_countを+1
+                order_number=entry.order_number,
+            )
+        if carried:
+            results.append((0, 0, len(carried)))
+        return results
+
+    def _log_results(self, results: list, discovery_skipped: int = 0):
+        """ワーカーの結果を集計して出力"""
         total_processed = 0
-        total_skipped = 0
+        total_skipped = discovery_skipped
         total_errors = 0
 
         for result in results:
@@ -56,136 +166,238 @@ class ParallelOrderProcessor:
         log_info(f"  スキップ: {total_skipped} 件")
         log_info(f"  エラー: {total_errors} 件")
 
-    async def _worker_loop(self, worker_id: int, page) -> tuple:
-        """ワーカーのメインループ - 担当ページを順次処理"""
-        processed = 0
+    async def _discovery_loop(self, page, queue: asyncio.Queue) -> int:
+        """
+        期間シャードごとに一覧ページを 1 回だけ巡回し、処理対象の注文をキューに投入
+
+        Returns:
+            int: DB判定でスキップした件数
+        """
         skipped = 0
-        errors = 0
 
-        # 最初のページに遷移
         try:
-            await page.goto(Config.PURCHASE_HISTORY_URL, timeout=30000)
-            await page.wait_for_load_state("domcontentloaded", timeout=15000)
-        except Exception as e:
-            log_warning(f"[W{worker_id}] 初期ページ読み込みタイムアウト: {e}")
-        await asyncio.sleep(2)
-
-        # 担当ページまでスキップ（Worker 0 → page 1, Worker 1 → page 2...）
-        for _ in range(worker_id):
-            if not await self._go_to_next_page(page):
-                log_info(f"[W{worker_id}] 担当ページなし - 終了")
-                return processed, skipped, errors
-            await asyncio.sleep(1)
+            incremental = IncrementalCrawl.from_config(self.db)
+            shards = DateShard.from_config()
+            for shard in shards:
+                if self.should_stop():
+                    break
+                if len(shards) > 1:
+                    log_info(f"[D] === 期間 {shard.label} ===")
+
+                shard_skipped, keep_going = await self._discover_shard(
+                    page, queue, shard, incremental
+                )
+                skipped += shard_skipped
+                if not keep_going:
+                    break
+        finally:
+            # 各ワーカーに終了を通知
+            for _ in range(self.worker_count):
+                if not await self._put(queue, None):
+                    break
 
-        page_num = worker_id + 1
+        return skipped
 
-        while True:
-            if self.should_stop():
-                log_info(f"[W{worker_id}] 終了がリクエストされました")
-                break
+    async def _discover_shard(
+        self, page, queue: asyncio.Queue, shard: DateShard, incremental=None
+    ) -> tuple:
+        """
+        1 つの期間シャードを先頭ページ（シャード専用URL）から巡回
 
-            log_info(f"[W{worker_id}] ページ {page_num} 処理中...")
+        Returns:
+            (DB判定でスキップした件数, 次のシャードへ進むか)
+        """
+        skipped = 0
+        page_num = 1
+        if incremental:
+            incremental.start_shard()
 
-            # 現在のページを処理
-            p, s, e = await self._process_page(worker_id, page)
-            processed += p
-            skipped += s
-            errors += e
+        try:
+            with TimeoutRegistry.step("list.goto", 30000) as timeout:
+                await page.goto(shard.url(Config.PURCHASE_HISTORY_URL), timeout=timeout)
+        except Exception as e:
+            log_warning(f"[D] 初期ページ読み込みタイムアウト: {e}")
+        await self._wait_for_order_list(page, "[D] 一覧表示", 2)
+
+        pagination = PaginationModel()
+        while not self.should_stop():
+            # ページ番号パラメータ・総ページ数を学習（学習済みなら何もしない）
+            await pagination.observe(page)
+
+            entries = await StandardOrderHandler(page).extract_orders()
+            log_info(f"[D] ページ {page_num}: {len(entries)} 件検出")
+
+            # 担当期間外の注文を除外
+            entries, passed_start = shard.filter_entries(entries)
+            # 逐次処理と同じくページ内の位置を注文の表示順として記録
+            for i, entry in enumerate(entries):
+                entry.order_number = i + 1
+
+            reached_settled = False
+            if entries:
+                # DBチェック（ページ分をまとめて判定）
+                order_ids = [entry.order_id for entry in entries]
+                decisions = self.db.classify_orders(order_ids)
+                # 詳細URL等を記録（次回以降の直接遷移・再処理用）
+                self.db.record_discovered_orders(entries)
+                if incremental:
+                    reached_settled = incremental.record_page(order_ids, decisions)
+                for entry in entries:
+                    decision, _ = decisions[entry.order_id]
+                    if decision != DBManager.DECISION_PROCESS:
+                        skipped += 1
+                        continue
+                    if not await self._put(queue, entry):
+                        return skipped, False
 
-            # 次の担当ページへ（worker_count ページ分スキップ）
-            moved = False
-            for _ in range(self.worker_count):
-                if not await self._go_to_next_page(page):
-                    log_info(f"[W{worker_id}] 最終ページ到達")
-                    return processed, skipped, errors
-                await asyncio.sleep(0.5)
-                moved = True
+            if reached_settled:
+                log_info(f"[D] 期間 {shard.label} の以降は処理済みのため巡回終了 ({page_num} ページ)")
+                break
 
-            if not moved:
+            if passed_start:
+                log_info(f"[D] 期間 {shard.label} の範囲外に到達 ({page_num} ページ)")
                 break
 
-            page_num += self.worker_count
+            has_next = None
+            if pagination.is_learned:
+                # URL で直接次ページへ（ボタン探索・固定待機なし）
+                has_next = await pagination.goto_next(
+                    page, StandardOrderHandler.LIST_LINK_SELECTOR
+                )
+            if has_next is None:
+                # 未学習、または総ページ数の範囲内で URL 遷移に失敗 → 「次へ」ボタン
+                has_next = await self._go_to_next_page(page)
+                if has_next and pagination.is_learned:
+                    pagination.moved_to(page.url)
+            if not has_next:
+                log_info(f"[D] 最終ページ到達 ({page_num} ページ)")
+                break
+            page_num += 1
 
-        return processed, skipped, errors
+        return skipped, True
 
-    async def _process_page(self, worker_id: int, page) -> tuple:
-        """1ページ分の注文を処理"""
+    async def _put(self, queue: asyncio.Queue, item) -> bool:
+        """キューに投入（満杯の間に終了要求があれば諦めてFalse）"""
+        while True:
+            try:
+                await asyncio.wait_for(queue.put(item), timeout=1.0)
+                return True
+            except asyncio.TimeoutError:
+                if self.should_stop():
+                    return False
+
+    async def _worker_loop(
+        self, worker_id: int, page, queue: asyncio.Queue, wait_for=None
+    ) -> tuple:
+        """ワーカーのメインループ - キューから注文を取り出して処理"""
         processed = 0
         skipped = 0
         errors = 0
 
-        # 現在のページURLを保存
-        current_url = page.url
-
-        # 注文番号を抽出
-        handler = StandardOrderHandler(page)
-        order_ids = await handler.extract_order_ids()
-
-        if not order_ids:
-            return 0, 0, 0
-
-        for order_id in order_ids:
-            # DBチェック
-            if not self.db.should_process(order_id):
-                skipped += 1
-                continue
-
-            log_debug(f"[W{worker_id}] 処理: {order_id}")
-
+        if wait_for is not None:
             try:
-                # 現在のページに戻る
-                await page.goto(current_url)
-                # networkidle -> domcontentloaded に緩和
-                await page.wait_for_load_state("domcontentloaded")
-                await asyncio.sleep(0.5)
-
-                # Books判定（一覧ページで処理できるか確認）
-                if await BooksOrderHandler.is_books_order(page, order_id):
-                    log_debug(f"[W{worker_id}] Books注文検出(一覧処理): {order_id}")
-                    issue_handler = BooksOrderHandler(page)
-                else:
-                    # 詳細ページに遷移
-                    if not await self._navigate_to_detail(page, order_id):
-                        log_warning(f"[W{worker_id}] 遷移失敗: {order_id}")
-                        errors += 1
-                        continue
-
-                    # ハンドラ選択
-                    issue_handler = OrderHandlerFactory.create(page)
+                await asyncio.shield(wait_for)
+            except Exception:
+                pass
 
-                # 発行処理
-                result = await issue_handler.issue_receipt(order_id)
+        while True:
+            entry = await queue.get()
+            if entry is None:
+                break
 
-                # DB更新
-                self.db.update_order(
-                    order_id,
-                    result.status.value,
-                    filename=getattr(result, "filename", None),
-                    error_message=result.error_message,
-                )
+            if self.should_stop():
+                log_info(f"[W{worker_id}] 終了がリクエストされました")
+                break
 
-                if result.status == OrderStatus.DONE:
-                    log_info(f"[W{worker_id}] 完了: {order_id}")
-                    processed += 1
-                elif result.status == OrderStatus.NO_RECEIPT:
-                    skipped += 1
-                else:
-                    errors += 1
+            self._attempted.add(entry.order_id)
+            status = await self._process_entry(worker_id, page, entry)
 
-            except Exception as e:
-                log_error(f"[W{worker_id}] エラー: {order_id} - {e}")
+            if status == OrderStatus.DONE:
+                processed += 1
+            elif status == OrderStatus.NO_RECEIPT:
+                skipped += 1
+            elif status == OrderStatus.RETRY:
+                continue  # 後でまとめて再試行（結果はその時に集計）
+            else:
                 errors += 1
 
-        # 処理完了後、確実に一覧ページに戻る（ページネーションのため）
+        return processed, skipped, errors
+
+    async def _process_entry(self, worker_id: int, page, entry) -> OrderStatus:
+        """1件の注文を処理し、結果ステータスを返す（遷移失敗・例外時はNone）"""
+        order_id = entry.order_id
+        log_debug(f"[W{worker_id}] 処理: {order_id}")
+
         try:
-            if page.url != current_url:
-                await page.goto(current_url)
-                await page.wait_for_load_state("domcontentloaded")
-                await asyncio.sleep(1)
-        except Exception as e:
-            log_warning(f"[W{worker_id}] 一覧ページ復帰エラー: {e}")
+            # Books判定（抽出時に判定済み。一覧ページで処理できる）
+            if entry.is_books:
+                log_debug(f"[W{worker_id}] Books注文検出(一覧処理): {order_id}")
+                if not await self._open_list_page(page, entry):
+                    log_warning(f"[W{worker_id}] 一覧URLが未記録: {order_id}")
+                    return None
+                issue_handler = BooksOrderHandler(page)
+            else:
+                # 詳細ページに遷移（詳細URLへ直接、なければ一覧からクリック）
+                if not await self._open_detail(page, entry):
+                    log_warning(f"[W{worker_id}] 遷移失敗: {order_id}")
+                    return None
+
+                # ハンドラ選択
+                issue_handler = OrderHandlerFactory.create(page)
+
+            # 発行処理
+            result = await issue_handler.issue_with_deadline(order_id)
+
+            if result.status == OrderStatus.RETRY:
+                # その場で待たずに後回しにし、次の注文へ進む
+                log_warning(f"[W{worker_id}] リトライ対象（後で再試行）: {order_id}")
+                self._deferred.append((entry, result))
+                return result.status
+
+            # DB更新
+            self.db.update_order(
+                order_id,
+                result.status.value,
+                filename=getattr(result, "filename", None),
+                error_message=result.error_message,
+                order_number=entry.order_number,
+            )
+            # ショップの領収書対応状況を学習
+            self.db.record_shop_result(entry.shop_id, result.status.value, result.definitive)
+
+            if result.status == OrderStatus.DONE:
+                log_info(f"[W{worker_id}] 完了: {order_id}")
+            return result.status
 
-        return processed, skipped, errors
+        except Exception as e:
+            log_error(f"[W{worker_id}] エラー: {order_id} - {e}")
+            return None
+
+    async def _open_list_page(self, page, entry) -> bool:
+        """抽出元の一覧ページへ（一覧URLが未記録ならFalse）"""
+        if not entry.list_url:
+            return False
+        await page.goto(entry.list_url)
+        await self._wait_for_order_list(page, "抽出元の一覧表示", 0.5)
+        return True
+
+    async def _wait_for_order_list(self, page, step: str, settle: float):
+        """一覧ページの注文リンクが描画されるまで待機（注文がなければ networkidle + settle 秒）"""
+        await PageReady.wait(page, step, [StandardOrderHandler.LIST_LINK_SELECTOR], settle)
+
+    async def _open_detail(self, page, entry) -> bool:
+        """注文詳細ページを開く（一覧の再読み込み・リンク探索を省略）"""
+        if entry.detail_url and entry.detail_url.startswith("http"):
+            await page.goto(entry.detail_url)
+            await PageReady.wait(
+                page, "詳細ページ表示", StandardOrderHandler.RECEIPT_SECTION_SELECTORS
+            )
+            return True
+
+        # 詳細URLがない場合は一覧ページに戻ってリンクをクリック
+        if not await self._open_list_page(page, entry):
+            return False
+        return await self._navigate_to_detail(page, entry.order_id)
 
     async def _navigate_to_detail(self, page, order_id: str) -> bool:
         """注文詳細ページに遷移"""
@@ -194,18 +406,25 @@ class ParallelOrderProcessor:
             f'a[href*="/detail/{order_id}"]',
         ]
 
-        for selector in selectors:
-            try:
-                link = page.locator(selector).first
-                if await link.is_visible(timeout=2000):
-                    await link.click()
-                    await page.wait_for_load_state("domcontentloaded")
-                    await asyncio.sleep(1)
-                    return True
-            except:
-                continue
+        link, _ = await PageUtils.find_first_visible(page, selectors, timeout=2000)
+        if not link:
+            return False
 
-        return False
+        try:
+            list_url = page.url
+            await link.click()
+            await Readiness.wait(
+                "詳細ページ遷移",
+                [ReadyCondition.url_changed(page, list_url)],
+                1,
+                timeout=self.NAVIGATION_TIMEOUT,
+            )
+            await PageReady.wait(
+                page, "詳細ページ表示", StandardOrderHandler.RECEIPT_SECTION_SELECTORS
+            )
+            return True
+        except:
+            return False
 
     async def _go_to_next_page(self, page) -> bool:
         """次のページに遷移"""
@@ -237,7 +456,7 @@ class ParallelOrderProcessor:
                         try:
                             await btn.click(timeout=3000)
                             await page.wait_for_load_state("domcontentloaded")
-                            await asyncio.sleep(2)
+                            await self._wait_for_order_list(page, "[D] 次ページ表示", 2)
                             log_info(f"次のページへ遷移: {selector}")
                             return True
                         except:
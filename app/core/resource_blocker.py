@@ -0,0 +1,165 @@
+"""
+ネットワークリソースブロッカー
+責務: 不要なリソース要求（画像・フォント・広告/解析ホスト等）の遮断と統計
+"""
+
+import re
+from collections import Counter
+from urllib.parse import urlparse
+from app.config import Config
+from app.utils.logger import log_info, log_debug
+
+
+class ResourceBlocker:
+    """
+    リソース種別とホストの許可/拒否ポリシーで要求を遮断する
+
+    ルーティングを設定した要求はブラウザの HTTP キャッシュを使わなくなるため、
+    遮断対象になりうる URL（拒否ホスト・遮断する種別の拡張子・許可リスト外のホスト）
+    だけをルーティングし、それ以外はブラウザに直接処理させる
+    """
+
+    # 遮断した要求の推定サイズ（バイト）。実際には取得しないため概算値
+    ESTIMATED_BYTES = {
+        "image": 40_000,
+        "media": 500_000,
+        "font": 60_000,
+        "stylesheet": 30_000,
+        "script": 50_000,
+    }
+    DEFAULT_ESTIMATED_BYTES = 5_000
+
+    # リソース種別ごとの拡張子（URL で種別を絞り込んでルーティングするため）
+    TYPE_EXTENSIONS = {
+        "image": ("png", "jpe?g", "gif", "webp", "avif", "svg", "ico", "bmp"),
+        "media": ("mp4", "webm", "ogg", "mp3", "m4a", "wav", "mov"),
+        "font": ("woff2?", "ttf", "otf", "eot"),
+        "stylesheet": ("css",),
+        "script": ("m?js",),
+    }
+
+    def __init__(
+        self,
+        blocked_types: list = None,
+        blocked_hosts: list = None,
+        allowed_hosts: list = None,
+    ):
+        self.blocked_types = set(blocked_types or [])
+        self.blocked_hosts = [h.lower() for h in blocked_hosts or []]
+        self.allowed_hosts = [h.lower() for h in allowed_hosts or []]
+        self.total_requests = 0
+        self.blocked_by_type = Counter()
+        self.estimated_bytes_saved = 0
+
+    @classmethod
+    def from_config(cls):
+        """設定からブロッカーを生成（無効時・ポリシーが空の場合はNone）"""
+        if not Config.BLOCK_RESOURCES:
+            return None
+        if not (Config.BLOCK_RESOURCE_TYPES or Config.BLOCK_HOSTS or Config.ALLOW_HOSTS):
+            return None
+        return cls(Config.BLOCK_RESOURCE_TYPES, Config.BLOCK_HOSTS, Config.ALLOW_HOSTS)
+
+    @property
+    def blocked_requests(self) -> int:
+        return sum(self.blocked_by_type.values())
+
+    async def attach(self, context):
+        """遮断対象になりうる要求だけにルーティングを設定（全要求は件数のみ数える）"""
+        context.on("request", self._count_request)
+        for pattern in self.route_patterns():
+            await context.route(pattern, self.handle_route)
+
+    def route_patterns(self) -> list:
+        """ルーティングする URL パターン（ブラウザ側で照合される正規表現）"""
+        patterns = []
+        if self.blocked_hosts:
+            patterns.append(self._host_pattern(self.blocked_hosts))
+
+        extensions = []
+        for resource_type in sorted(self.blocked_types):
+            if resource_type not in self.TYPE_EXTENSIONS:
+                # URL で判別できない種別は全要求をルーティングする（キャッシュは効かない）
+                log_debug(f"リソース種別 {resource_type} は URL で判別できないため全要求を判定します")
+                return ["**/*"]
+            extensions.extend(self.TYPE_EXTENSIONS[resource_type])
+        if extensions:
+            patterns.append(
+                re.compile(
+                    rf"^https?://[^?#]*\.(?:{'|'.join(extensions)})(?:[?#]|$)", re.IGNORECASE
+                )
+            )
+
+        if self.allowed_hosts:
+            # 許可リスト外のホスト（否定先読み）
+            allowed = self._host_pattern(self.allowed_hosts).pattern[len("^https?://") :]
+            patterns.append(re.compile(rf"^https?://(?!{allowed})", re.IGNORECASE))
+        return patterns
+
+    @staticmethod
+    def _host_pattern(domains: list):
+        """ドメイン（サブドメイン含む）の URL に一致する正規表現"""
+        hosts = "|".join(re.escape(d) for d in domains)
+        return re.compile(
+            rf"^https?://(?:[^/?#@]*\.)?(?:{hosts})(?::\d+)?(?:[/?#]|$)", re.IGNORECASE
+        )
+
+    def _count_request(self, request):
+        self.total_requests += 1
+
+    async def handle_route(self, route):
+        """ルートハンドラ: ポリシーに従い遮断または続行"""
+        request = route.request
+
+        if self.should_block(request.resource_type, request.url):
+            self._record_blocked(request.resource_type)
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        """この要求を遮断すべきか判定"""
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            return False
+
+        host = (parsed.hostname or "").lower()
+
+        if self._matches(host, self.blocked_hosts):
+            return True
+
+        # ドキュメント（遷移・ポップアップ・PDF）は拒否ホスト以外は常に許可
+        if resource_type == "document":
+            return False
+
+        if resource_type in self.blocked_types:
+            return True
+
+        if self.allowed_hosts and not self._matches(host, self.allowed_hosts):
+            return True
+
+        return False
+
+    def summary(self) -> str:
+        """遮断統計の要約"""
+        detail = ", ".join(f"{t}: {c}" for t, c in self.blocked_by_type.most_common())
+        return (
+            f"リソース遮断: {self.blocked_requests}/{self.total_requests} 件"
+            f" (削減量の推定: 約 {self.estimated_bytes_saved / 1024 / 1024:.1f} MB"
+            " ※種別ごとの概算サイズによる推定値で、実測ではありません)"
+            + (f" [{detail}]" if detail else "")
+        )
+
+    def log_summary(self):
+        log_info(self.summary())
+
+    def _record_blocked(self, resource_type: str):
+        self.blocked_by_type[resource_type] += 1
+        self.estimated_bytes_saved += self.ESTIMATED_BYTES.get(
+            resource_type, self.DEFAULT_ESTIMATED_BYTES
+        )
+
+    @staticmethod
+    def _matches(host: str, domains: list) -> bool:
+        """ホストがドメインリストのいずれか（サブドメイン含む）に一致するか"""
+        return any(host == d or host.endswith("." + d) for d in domains)
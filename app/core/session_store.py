@@ -0,0 +1,96 @@
+"""
+セッション永続化クラス
+責務: ログイン済みの storage state を暗号化してディスクに保存・復元
+"""
+
+import base64
+import hashlib
+import json
+import os
+from cryptography.fernet import Fernet, InvalidToken
+from app.config import Config
+from app.utils.logger import log_info, log_debug, log_warning
+
+
+class SessionStore:
+    """アカウント単位の暗号化セッションファイルを管理"""
+
+    SALT_SIZE = 16
+    PBKDF2_ITERATIONS = 200_000
+
+    def __init__(self, account_key: str, secret: str, session_dir: str):
+        self.account_key = account_key
+        self.secret = secret
+        self.session_dir = session_dir
+        # 鍵導出（PBKDF2）は重いため、同じソルトの鍵は使い回す
+        self._salt = None
+        self._fernets = {}
+
+    @classmethod
+    def from_config(cls):
+        """設定からストアを生成（無効時・ID未設定時はNone）"""
+        if not Config.SESSION_PERSIST or not Config.USER_ID:
+            return None
+        secret = Config.SESSION_SECRET or Config.PASSWORD or ""
+        return cls(Config.get_account_key(), secret, Config.SESSION_DIR)
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.session_dir, f"session_{self.account_key}.bin")
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> dict:
+        """保存済みの storage state を復号して返す（なし・復号失敗時はNone）"""
+        if not self.exists():
+            return None
+
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+            salt, token = raw[: self.SALT_SIZE], raw[self.SALT_SIZE :]
+            data = self._fernet(salt).decrypt(token)
+            self._salt = salt
+            log_debug(f"セッションファイル読込: {self.path}")
+            return json.loads(data.decode("utf-8"))
+        except (InvalidToken, ValueError) as e:
+            log_warning(f"セッションファイルを復号できません（破棄します）: {e}")
+            self.clear()
+            return None
+
+    def save(self, state: dict):
+        """storage state を暗号化して保存（一時ファイル経由で置換）"""
+        os.makedirs(self.session_dir, exist_ok=True)
+
+        # ソルトは実行中は固定（Fernet は暗号化ごとに IV を変える）
+        if self._salt is None:
+            self._salt = os.urandom(self.SALT_SIZE)
+        salt = self._salt
+        token = self._fernet(salt).encrypt(json.dumps(state).encode("utf-8"))
+
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(salt + token)
+        os.replace(tmp_path, self.path)
+        log_info("セッションを保存しました")
+
+    def clear(self):
+        """セッションファイルを削除"""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _fernet(self, salt: bytes) -> Fernet:
+        """シークレットとソルトから暗号鍵を導出（導出済みならキャッシュを返す）"""
+        if salt not in self._fernets:
+            key = hashlib.pbkdf2_hmac(
+                "sha256",
+                f"{self.account_key}:{self.secret}".encode("utf-8"),
+                salt,
+                self.PBKDF2_ITERATIONS,
+            )
+            self._fernets[salt] = Fernet(base64.urlsafe_b64encode(key))
+        return self._fernets[salt]
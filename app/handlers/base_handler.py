@@ -3,23 +3,95 @@
 """
 
 import asyncio
+import re
 from abc import ABC, abstractmethod
 from urllib.parse import urlparse, parse_qs
 from app.config import Config
+from app.models.order_entry import OrderEntry
 from app.models.order_status import IssueResult, OrderStatus
+from app.utils.download_manager import DownloadManager
 from app.utils.logger import log_info, log_debug, log_warning, log_error
+from app.utils.page_utils import PageUtils
+from app.utils.readiness import Readiness, ReadyCondition
+
+ORDER_ID_PATTERN = re.compile(r"^[\d-]+$")
+
+# Books 領収書リンク（これを含む要素の id が注文番号）
+BOOKS_RECEIPT_LINK_SELECTOR = (
+    ".status-info__receipt-link, a[href^='javascript:postReceipt']"
+)
+
+# 確認モーダルのOKボタン
+CONFIRM_MODAL_SELECTORS = [
+    'div.color-azure-light--2auXR:has-text("OK")',
+    'a:has(div:has-text("OK"))',
+    'button:has-text("OK")',
+    'button:has-text("はい")',
+    '[role="button"]:has-text("OK")',
+]
+
+# 一覧ページのリンク href と Books 領収書リンクの所属 id を 1 回の呼び出しで取得
+EXTRACT_ORDERS_SCRIPT = """
+([linkSelector, booksSelector]) => {
+    const hrefs = Array.from(
+        document.querySelectorAll(linkSelector),
+        (a) => a.href || a.getAttribute("href") || ""
+    );
+    const booksIds = new Set();
+    document.querySelectorAll(booksSelector).forEach((link) => {
+        for (let el = link.parentElement; el; el = el.parentElement) {
+            if (el.id) booksIds.add(el.id);
+        }
+    });
+    return { hrefs, booksIds: Array.from(booksIds) };
+}
+"""
 
 
 class OrderHandler(ABC):
     """注文処理ハンドラの基底クラス"""
 
+    # 一覧ページで注文リンクとみなすセレクタ（サブクラスで上書き）
+    LIST_LINK_SELECTOR = 'a[href*="order_number="], a[href*="/detail/"]'
+
     def __init__(self, page):
         self.page = page
+        self.stage = None  # 発行処理の現在の段階（期限超過時にどこで止まったかを記録する）
 
-    @abstractmethod
     async def extract_order_ids(self) -> list:
         """一覧ページから注文番号を抽出"""
-        pass
+        return [entry.order_id for entry in await self.extract_orders()]
+
+    async def extract_orders(self) -> list:
+        """
+        一覧ページから注文エントリを抽出
+
+        リンクごとの IPC を避け、href と Books 判定を 1 回の evaluate で取得する
+
+        Returns:
+            list[OrderEntry]: ページ上の出現順（重複なし）
+        """
+        try:
+            result = await self.page.evaluate(
+                EXTRACT_ORDERS_SCRIPT,
+                [self.LIST_LINK_SELECTOR, BOOKS_RECEIPT_LINK_SELECTOR],
+            )
+        except Exception as e:
+            log_warning(f"注文リンクの取得に失敗: {e}")
+            return []
+
+        books_ids = set(result.get("booksIds") or [])
+        list_url = self.page.url
+
+        return [
+            OrderEntry(
+                order_id,
+                detail_url=href,
+                is_books=order_id in books_ids,
+                list_url=list_url,
+            )
+            for order_id, href in self._parse_order_hrefs(result.get("hrefs") or [])
+        ]
 
     @abstractmethod
     async def navigate_to_detail(self, order_id: str) -> bool:
@@ -31,6 +103,53 @@ class OrderHandler(ABC):
         """領収書を発行"""
         pass
 
+    async def issue_with_deadline(self, order_id: str, deadline: float = None) -> IssueResult:
+        """
+        期限付きで領収書を発行
+
+        期限を超えたら issue_receipt をキャンセルし、試行中に開いたページ（ポップアップ・
+        新しいタブ）を閉じて RETRY を返す。1 件の注文でワーカーが止まり続けないようにする
+
+        Args:
+            order_id: 注文番号
+            deadline: 期限（秒、省略時は ORDER_DEADLINE_SECONDS。0 で無効）
+        """
+        deadline = Config.ORDER_DEADLINE_SECONDS if deadline is None else deadline
+        page = self.page
+
+        # 発行中にこのページで発生したダウンロードは注文番号で保存する
+        with DownloadManager.order(page, order_id):
+            if not deadline:
+                return await self.issue_receipt(order_id)
+
+            context = page.context
+            opened_before = set(context.pages)
+            self.stage = "開始"
+
+            try:
+                return await asyncio.wait_for(self.issue_receipt(order_id), deadline)
+            except asyncio.TimeoutError:
+                stage = self.stage
+                log_warning(f"期限超過（{deadline}秒）: {order_id} 段階: {stage}")
+                await self._close_pages_opened_since(context, opened_before)
+                return IssueResult.retry(f"期限超過（{deadline}秒）: {stage}")
+            finally:
+                # 新しいタブへ切り替えていても、呼び出し元のページに戻す
+                self.page = page
+
+    @staticmethod
+    async def _close_pages_opened_since(context, opened_before: set):
+        """opened_before 以降に開いたページを閉じる"""
+        for stray in list(context.pages):
+            if stray in opened_before:
+                continue
+            try:
+                if not stray.is_closed():
+                    await stray.close()
+                    log_debug("期限超過: 試行中に開いたページを閉じました")
+            except Exception as e:
+                log_debug(f"ページを閉じられませんでした: {e}")
+
     # 共通メソッド
     async def _fill_addressee(self) -> bool:
         """宛名を入力（共通処理）"""
@@ -63,28 +182,36 @@ class OrderHandler(ABC):
 
     async def _click_confirm_modal(self) -> bool:
         """確認モーダルのOKボタンをクリック（共通処理）"""
-        confirm_selectors = [
-            'div.color-azure-light--2auXR:has-text("OK")',
-            'a:has(div:has-text("OK"))',
-            'button:has-text("OK")',
-            'button:has-text("はい")',
-            '[role="button"]:has-text("OK")',
-        ]
-
-        await asyncio.sleep(0.5)
+        # 表示待ちは探索に含める（従来の 0.5 秒の事前待機分を上限に加算）
+        btn, index = await PageUtils.find_first_visible(
+            self.page,
+            CONFIRM_MODAL_SELECTORS,
+            timeout=2500,
+            call_site="handler.confirm_modal",
+        )
+        if not btn:
+            return False
 
-        for selector in confirm_selectors:
-            try:
-                btn = self.page.locator(selector).first
-                if await btn.is_visible(timeout=2000):
-                    await btn.click(force=True)
-                    log_debug(f"確認モーダルOKクリック: {selector}")
-                    await asyncio.sleep(1)
-                    return True
-            except:
-                continue
+        try:
+            await btn.click(force=True)
+            log_debug(f"確認モーダルOKクリック: {CONFIRM_MODAL_SELECTORS[index]}")
+            await Readiness.wait(
+                "確認モーダルを閉じる", [ReadyCondition.element(btn, "hidden")], 1
+            )
+            return True
+        except:
+            return False
 
-        return False
+    def _parse_order_hrefs(self, hrefs: list) -> list:
+        """hrefリストから (注文番号, 最初のhref) を重複なしで返す"""
+        seen = set()
+        orders = []
+        for href in hrefs:
+            order_id = self._parse_order_id_from_href(href) if href else ""
+            if order_id and order_id not in seen:
+                seen.add(order_id)
+                orders.append((order_id, href))
+        return orders
 
     def _parse_order_id_from_href(self, href: str) -> str:
         """hrefから注文番号を抽出"""
@@ -102,9 +229,7 @@ class OrderHandler(ABC):
 
         # バリデーション
         if order_id:
-            import re
-
-            if not re.match(r"^[\d-]+$", order_id):
+            if not ORDER_ID_PATTERN.match(order_id):
                 return ""
             if "-" not in order_id and len(order_id) < 15:
                 return ""
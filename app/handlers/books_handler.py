@@ -2,38 +2,22 @@
 BooksOrderHandler
 """
 
-import asyncio
 from app.models.order_status import IssueResult
 from app.utils.logger import log_info, log_debug, log_warning, log_error
+from app.utils.page_utils import PageUtils
+from app.utils.readiness import Readiness, ReadyCondition
+from app.utils.receipt_writer import ReceiptWriter
+from app.utils.timeouts import TimeoutRegistry
 from .base_handler import OrderHandler
 
 
 class BooksOrderHandler(OrderHandler):
     """楽天ブックス用ハンドラ"""
 
-    async def extract_order_ids(self) -> list:
-        """一覧ページから注文番号を抽出"""
-        order_ids = []
-
-        # ブックスの注文リンク
-        detail_links = self.page.locator(
-            'a[href*="order_number="], a.status-info__receipt-link'
-        )
-        count = await detail_links.count()
-
-        for i in range(count):
-            try:
-                link = detail_links.nth(i)
-                href = await link.get_attribute("href")
-
-                if href:
-                    order_id = self._parse_order_id_from_href(href)
-                    if order_id and order_id not in order_ids:
-                        order_ids.append(order_id)
-            except:
-                continue
-
-        return order_ids
+    # ブックスの注文リンク
+    LIST_LINK_SELECTOR = 'a[href*="order_number="], a.status-info__receipt-link'
+    # 領収書発行ボタン（ユーザー情報: input[value='領収書発行']）
+    ISSUE_BUTTON_SELECTOR = "#receiptInputFormButton, button:has-text('発行する'), input[value='発行する'], input[value='領収書発行']"
 
     async def navigate_to_detail(self, order_id: str) -> bool:
         """注文詳細ページに遷移"""
@@ -41,19 +25,25 @@ class BooksOrderHandler(OrderHandler):
             f'a[href*="order_number={order_id}"]',
         ]
 
-        for selector in link_selectors:
-            try:
-                link = self.page.locator(selector).first
-                if await link.is_visible(timeout=2000):
-                    await link.click()
-                    await self.page.wait_for_load_state("domcontentloaded")
-                    await asyncio.sleep(1)
-                    log_debug(f"[Books] 詳細遷移: {selector}")
-                    return True
-            except:
-                continue
+        link, index = await PageUtils.find_first_visible(
+            self.page, link_selectors, timeout=2000
+        )
+        if not link:
+            return False
 
-        return False
+        try:
+            list_url = self.page.url
+            await link.click()
+            await self.page.wait_for_load_state("domcontentloaded")
+            await Readiness.wait(
+                "[Books] 詳細ページ遷移",
+                [ReadyCondition.url_changed(self.page, list_url)],
+                1,
+            )
+            log_debug(f"[Books] 詳細遷移: {link_selectors[index]}")
+            return True
+        except:
+            return False
 
     @staticmethod
     async def is_books_order(page, order_id: str) -> bool:
@@ -71,14 +61,26 @@ class BooksOrderHandler(OrderHandler):
             log_info(f"[Books] 処理開始: {order_id} (URL: {self.page.url})")
 
             # 1. 領収書リンクをクリック
+            self.stage = "領収書リンク"
+            link_page_url = self.page.url
             if not await self._click_receipt_link(order_id):
                 return IssueResult.no_receipt(
                     "領収書リンクが見つからない(リトライ停止)"
                 )
 
             # 遷移待ち (networkidleは除外)
+            # 遷移・新しいタブ・発行ボタン表示のいずれかで再開
+            # （クリック後の 2 秒と遷移後の 2 秒の固定待機を置き換え）
             await self.page.wait_for_load_state("domcontentloaded")
-            await asyncio.sleep(2)
+            await Readiness.wait(
+                "[Books] 領収書リンククリック後",
+                [
+                    ReadyCondition.url_changed(self.page, link_page_url),
+                    ReadyCondition.new_page(self.page.context),
+                    ReadyCondition.selector(self.page, self.ISSUE_BUTTON_SELECTOR),
+                ],
+                4,
+            )
 
             # デバッグ: 現在の状態を確認
             log_info(f"[Books] リンククリック後のURL: {self.page.url}")
@@ -92,20 +94,18 @@ class BooksOrderHandler(OrderHandler):
                     "[Books] 新しいページを検出しました。そちらを操作対象にします。"
                 )
                 self.page = pages[-1]
+                self.stage = "新しいタブ読み込み"
 
-                # URLが有効になるまで待機
-                for _ in range(60):
-                    try:
-                        if self.page.url and self.page.url != "about:blank":
-                            break
-                    except:
-                        pass
-                    await asyncio.sleep(0.5)
+                # URLが有効になるまで待機（0.5 秒 × 60 回のポーリングを置き換え）
+                await Readiness.wait(
+                    "[Books] 新しいタブのURL", [ReadyCondition.url_assigned(self.page)], 30
+                )
 
                 try:
-                    await self.page.wait_for_load_state(
-                        "domcontentloaded", timeout=60000
-                    )
+                    with TimeoutRegistry.step("books.tab_load", 60000) as timeout:
+                        await self.page.wait_for_load_state(
+                            "domcontentloaded", timeout=timeout
+                        )
                     # ポップアップ生成などでnetworkidleになるのを待つといつまでも終わらないことがある
                     # await self.page.wait_for_load_state("networkidle", timeout=60000)
                 except:
@@ -116,6 +116,7 @@ class BooksOrderHandler(OrderHandler):
                 log_info(f"[Books] 操作対象ページ切り替え完了: {self.page.url}")
 
             # 2. 発行ボタンを待機
+            self.stage = "発行ボタン待機"
             btn = await self._wait_for_issue_button()
             if not btn:
                 # デバッグ用HTML保存
@@ -133,6 +134,7 @@ class BooksOrderHandler(OrderHandler):
                 )
 
             # 3. ポップアップ制御とダウンロード
+            self.stage = "ポップアップ"
             return await self._handle_popup_and_download(btn, order_id)
 
         except Exception as e:
@@ -152,12 +154,11 @@ class BooksOrderHandler(OrderHandler):
 
     async def _wait_for_issue_button(self):
         """領収書発行ボタンを待機して取得"""
-        # ユーザー情報: input[value='領収書発行']
-        btn_selector = "#receiptInputFormButton, button:has-text('発行する'), input[value='発行する'], input[value='領収書発行']"
         try:
             # first() で特定し、wait_for で可視化を待つ (60s)
-            locator = self.page.locator(btn_selector).first
-            await locator.wait_for(state="visible", timeout=60000)
+            locator = self.page.locator(self.ISSUE_BUTTON_SELECTOR).first
+            with TimeoutRegistry.step("books.issue_button", 60000, adaptive=False) as timeout:
+                await locator.wait_for(state="visible", timeout=timeout)
             return locator
         except Exception as e:
             log_error(f"[Books] 発行ボタン待機中にエラー(wait_for): {str(e)}")
@@ -172,8 +173,10 @@ class BooksOrderHandler(OrderHandler):
                 await btn.click()
 
             page2 = await popup_info.value
+            self.stage = "PDF保存"
             try:
-                await page2.wait_for_load_state("domcontentloaded", timeout=60000)
+                with TimeoutRegistry.step("books.popup_load", 60000) as timeout:
+                    await page2.wait_for_load_state("domcontentloaded", timeout=timeout)
             except Exception as e:
                 log_info(
                     f"[Books] ページロード待機(popup)タイムアウトorエラー: {e} (ダウンロードは開始されている可能性があります)"
@@ -205,10 +208,9 @@ class BooksOrderHandler(OrderHandler):
         if pdf_url.lower().endswith(".pdf"):
             try:
                 response = await page.request.get(pdf_url)
-                if response.ok:
-                    data = await response.body()
-                    with open(save_path, "wb") as f:
-                        f.write(data)
+                if response.ok and await ReceiptWriter.write_bytes(
+                    await response.body(), save_path
+                ):
                     log_info(f"領収書保存完了: {filename}")
                     return IssueResult.success(filename)
             except:
@@ -225,9 +227,8 @@ class BooksOrderHandler(OrderHandler):
 
     async def _click_receipt_link(self, order_id: str = None) -> bool:
         """領収書リンクをクリック"""
-        # ページ読み込みを待機
+        # ページ読み込みを待機（リンクの表示待ちは探索に含める）
         await self.page.wait_for_load_state("domcontentloaded")
-        await asyncio.sleep(2)
 
         selectors = []
 
@@ -252,16 +253,17 @@ class BooksOrderHandler(OrderHandler):
             ]
         )
 
-        for selector in selectors:
+        # 従来の事前待機 2 秒 + 探索 5 秒を上限とする
+        element, index = await PageUtils.find_first_visible(
+            self.page, selectors, timeout=7000
+        )
+        if element:
             try:
-                element = self.page.locator(selector).first
-                if await element.is_visible(timeout=5000):  # 探索は短めに
-                    await element.click()
-                    log_info(f"[Books] 領収書リンククリック: {selector}")
-                    await asyncio.sleep(2)
-                    return True
+                await element.click()
+                log_info(f"[Books] 領収書リンククリック: {selectors[index]}")
+                return True
             except:
-                continue
+                pass
 
         log_warning("[Books] 領収書リンクが見つからない")
         return False
@@ -5,34 +5,29 @@ StandardOrderHandler
 import asyncio
 from app.models.order_status import IssueResult
 from app.utils.logger import log_info, log_debug
+from app.utils.page_utils import PageUtils
+from app.utils.readiness import Readiness, ReadyCondition, PageReady
+from app.utils.receipt_capture import ReceiptCapture
 from .base_handler import OrderHandler
 
 
 class StandardOrderHandler(OrderHandler):
     """通常の楽天ショップ用ハンドラ"""
 
-    async def extract_order_ids(self) -> list:
-        """一覧ページから注文番号を抽出"""
-        order_ids = []
-
-        detail_links = self.page.locator(
-            'a[href*="order_number="], a[href*="/detail/"]'
-        )
-        count = await detail_links.count()
-
-        for i in range(count):
-            try:
-                link = detail_links.nth(i)
-                href = await link.get_attribute("href")
-
-                if href:
-                    order_id = self._parse_order_id_from_href(href)
-                    if order_id and order_id not in order_ids:
-                        order_ids.append(order_id)
-            except:
-                continue
-
-        return order_ids
+    # 詳細ページの領収書セクション（表示されたら詳細ページの準備完了）
+    RECEIPT_SECTION_SELECTORS = [
+        'span:has-text("領収書")',
+        'text="領収書"',
+        'text="領収書・請求書"',
+        'a:has-text("領収書")',
+    ]
+    # 領収書セクションを開いた後に表示される要素（宛名欄・再発行メッセージ・発行ボタン）
+    RECEIPT_FORM_SELECTORS = [
+        'input[placeholder*="宛名"], input[placeholder*="楽天"]',
+        'text="一度発行済みのため"',
+        'button:has-text("発行する")',
+    ]
+    NAVIGATION_TIMEOUT = 30000  # リンククリック後の遷移待ち上限（ミリ秒）
 
     async def navigate_to_detail(self, order_id: str) -> bool:
         """注文詳細ページに遷移"""
@@ -41,24 +36,34 @@ class StandardOrderHandler(OrderHandler):
             f'a[href*="/detail/{order_id}"]',
         ]
 
-        for selector in link_selectors:
-            try:
-                link = self.page.locator(selector).first
-                if await link.is_visible(timeout=2000):
-                    await link.click()
-                    await self.page.wait_for_load_state("networkidle")
-                    await asyncio.sleep(1)
-                    log_debug(f"[Standard] 詳細遷移: {selector}")
-                    return True
-            except:
-                continue
+        link, index = await PageUtils.find_first_visible(
+            self.page, link_selectors, timeout=2000
+        )
+        if not link:
+            return False
 
-        return False
+        try:
+            list_url = self.page.url
+            await link.click()
+            await Readiness.wait(
+                "詳細ページ遷移",
+                [ReadyCondition.url_changed(self.page, list_url)],
+                1,
+                timeout=self.NAVIGATION_TIMEOUT,
+            )
+            await PageReady.wait(
+                self.page, "詳細ページ表示", self.RECEIPT_SECTION_SELECTORS
+            )
+            log_debug(f"[Standard] 詳細遷移: {link_selectors[index]}")
+            return True
+        except:
+            return False
 
     async def issue_receipt(self, order_id: str) -> IssueResult:
         """領収書を発行"""
         try:
             # 1. 領収書セクションをクリック
+            self.stage = "領収書セクション"
             if not await self._click_receipt_section():
                 # 30秒(デフォルト等)探しても見つからなければ、発行不可とみなす
                 return IssueResult.no_receipt(
@@ -66,19 +71,32 @@ class StandardOrderHandler(OrderHandler):
                 )
 
             # 2. 宛名入力
+            self.stage = "宛名入力"
             needs_confirm = await self._fill_addressee()
 
-            # 3. 発行ボタンをクリック
-            if not await self._click_issue_button():
-                return IssueResult.no_receipt("発行ボタンが見つからない(リトライ停止)")
-
-            # 4. 確認モーダル
-            if needs_confirm:
-                await self._click_confirm_modal()
-
-            await asyncio.sleep(3)
+            # 発行操作で届くダウンロード・PDFレスポンスを注文番号で保存する
+            async with ReceiptCapture(self.page, order_id) as capture:
+                # 3. 発行ボタンをクリック
+                self.stage = "発行ボタン"
+                if not await self._click_issue_button():
+                    # 領収書フォームは開けたが発行操作がない → ショップが発行に対応していない
+                    return IssueResult.no_receipt(
+                        "発行ボタンが見つからない(リトライ停止)", definitive=True
+                    )
+
+                # 4. 確認モーダル
+                if needs_confirm:
+                    self.stage = "確認モーダル"
+                    await self._click_confirm_modal()
+
+                # 5. PDFがファイルとして保存されるまで待機
+                self.stage = "PDF保存"
+                filename = await capture.wait()
+
+            if not filename:
+                return IssueResult.retry("PDFを取得できませんでした")
             log_info(f"領収書発行完了: {order_id}")
-            return IssueResult.success(f"receipt_{order_id}.pdf")
+            return IssueResult.success(filename)
 
         except asyncio.TimeoutError:
             return IssueResult.retry("タイムアウト")
@@ -87,25 +105,32 @@ class StandardOrderHandler(OrderHandler):
 
     async def _click_receipt_section(self) -> bool:
         """領収書セクションをクリック"""
-        selectors = [
-            'span:has-text("領収書")',
-            'text="領収書"',
-            'text="領収書・請求書"',
-            'a:has-text("領収書")',
-        ]
-
-        for selector in selectors:
-            try:
-                element = self.page.locator(selector).first
-                if await element.is_visible(timeout=10000):  # 10秒に延長
-                    await element.click()
-                    log_info(f"[Standard] 領収書セクションクリック: {selector}")
-                    await asyncio.sleep(1)
-                    return True
-            except:
-                continue
+        selectors = self.RECEIPT_SECTION_SELECTORS
+
+        element, index = await PageUtils.find_first_visible(
+            self.page,
+            selectors,
+            timeout=10000,
+            call_site="standard.receipt_section",
+            adaptive_timeout=False,
+        )
+        if not element:
+            return False
 
-        return False
+        try:
+            await element.click()
+            log_info(f"[Standard] 領収書セクションクリック: {selectors[index]}")
+            await Readiness.wait(
+                "領収書フォーム表示",
+                [
+                    ReadyCondition.selector(self.page, s)
+                    for s in self.RECEIPT_FORM_SELECTORS
+                ],
+                1,
+            )
+            return True
+        except:
+            return False
 
     async def _click_issue_button(self) -> bool:
         """発行ボタンをクリック"""
@@ -115,15 +140,19 @@ class StandardOrderHandler(OrderHandler):
             'span:has-text("発行する")',
         ]
 
-        for selector in selectors:
-            try:
-                btn = self.page.locator(selector).first
-                if await btn.is_visible(timeout=10000):  # 10秒に延長
-                    await btn.click()
-                    log_info("発行ボタンをクリック")
-                    await asyncio.sleep(1)
-                    return True
-            except:
-                continue
-
-        return False
+        btn, _ = await PageUtils.find_first_visible(
+            self.page,
+            selectors,
+            timeout=10000,
+            call_site="standard.issue_button",
+            adaptive_timeout=False,
+        )
+        if not btn:
+            return False
+
+        try:
+            await btn.click()
+            log_info("発行ボタンをクリック")
+            return True
+        except:
+            return False
@@ -3,6 +3,7 @@
 責務: アプリケーション全体の起動と制御
 """
 
+import argparse
 import asyncio
 import signal
 from app.config import Config
@@ -11,14 +12,24 @@ from app.core.authenticator import Authenticator
 from app.core.order_processor import OrderProcessor
 from app.core.parallel_processor import ParallelOrderProcessor
 from app.core.db_manager import DBManager
+from app.core.session_store import SessionStore
+from app.core.resource_blocker import ResourceBlocker
 from app.utils.logger import log_info, log_warning, log_error, log_separator
+from app.utils.page_utils import PageUtils
+from app.utils.readiness import Readiness
+from app.utils.selector_stats import SelectorStats
+from app.utils.timeouts import TimeoutRegistry
 from app.services.slack_service import SlackService
 
 
 class RakutenBotApp:
-    def __init__(self):
+    def __init__(self, retry_only: bool = False):
         Config.validate()
-        self.browser_manager = BrowserManager()
+        self.retry_only = retry_only  # DB の再処理対象だけを処理（一覧を巡回しない）
+        self.browser_manager = BrowserManager(
+            session_store=SessionStore.from_config(),
+            resource_blocker=ResourceBlocker.from_config(),
+        )
         self.db_manager = DBManager()
         self.slack_service = SlackService(
             Config.SLACK_BOT_TOKEN, Config.SLACK_CHANNEL_ID
@@ -46,6 +57,12 @@ class RakutenBotApp:
 
         # DBのフォーマットに合わせる ("%Y-%m-%d %H:%M:%S")
         start_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # 実行開始時刻を実行IDとしてステータス件数を集計
+        self.db_manager.start_run(start_time)
+        # フォールバックセレクタの実績を読み込み、候補の並び順に反映
+        PageUtils.selector_stats = SelectorStats(self.db_manager)
+        # 前回までのステップ完了時間を読み込み、タイムアウトに反映
+        TimeoutRegistry.load(self.db_manager)
 
         self._setup_signal_handlers()
 
@@ -58,32 +75,36 @@ class RakutenBotApp:
             # セットアップ
             page = await self.browser_manager.launch()
 
-            # 認証
+            # 認証（保存済みセッションが有効ならログインを省略）
             auth = Authenticator(page)
-            await auth.login()
+            if await auth.ensure_logged_in():
+                await self.browser_manager.save_session()
+            # 終了時にも保存し、実行中に更新された Cookie を引き継ぐ
+            self.browser_manager.session_active = auth.logged_in
 
             if self.should_stop:
                 log_info("終了がリクエストされました")
                 return
 
-            # 並列処理モード判定
-            if Config.PARALLEL_WORKERS > 1:
+            # 処理モード判定
+            if self.retry_only:
+                await self._run_retry_only(page)
+            elif Config.PARALLEL_WORKERS > 1:
                 await self._run_parallel(page)
             else:
                 await self._run_sequential(page)
 
-            # レポート出力
-            self.db_manager.export_report(since=start_time)
-
         except Exception as e:
             log_error(f"アプリケーションエラーが発生しました: {e}")
         finally:
             # 完了・中断・エラーに関わらずレポートを出力
             try:
-                self.db_manager.export_report(since=start_time)
+                # 書き込みキューの反映はイベントループ外で待つ
+                await self.db_manager.flush_async()
+                self.db_manager.export_report(since=start_time, run_id=start_time)
 
                 # Slack通知
-                summary = self.db_manager.get_summary(since=start_time)
+                summary = self.db_manager.get_summary(run_id=start_time)
                 self.slack_service.send_report(summary, "report.csv")
 
             except Exception as ex:
@@ -94,11 +115,23 @@ class RakutenBotApp:
     def _cleanup(self):
         """安全なクリーンアップ処理"""
         log_info("クリーンアップ中...")
+        Readiness.log_summary()
+        if PageUtils.selector_stats:
+            try:
+                PageUtils.selector_stats.save()
+            except Exception as e:
+                log_error(f"セレクタ統計の保存失敗: {e}")
+            PageUtils.selector_stats = None
+        TimeoutRegistry.log_summary()
+        try:
+            TimeoutRegistry.save()
+        except Exception as e:
+            log_error(f"タイムアウト学習値の保存失敗: {e}")
         try:
-            # DBを閉じる
+            # 書き込みキューを書き切ってからDBを閉じる（中断時も結果を失わない）
             self.db_manager.close()
-        except:
-            pass
+        except Exception as e:
+            log_error(f"DBクローズ失敗: {e}")
         log_separator()
         log_info("Bot 終了")
         log_separator()
@@ -113,25 +146,98 @@ class RakutenBotApp:
         """並列処理モード"""
         log_info(f"並列処理モード: {Config.PARALLEL_WORKERS} ワーカー")
 
-        # ワーカーページを作成
+        worker_pages = await self._prepare_worker_pages()
+        if worker_pages is None:
+            return
+
+        # 並列処理開始
+        processor = ParallelOrderProcessor(
+            worker_pages, self.db_manager, discovery_page=page
+        )
+        processor.should_stop = lambda: self.should_stop
+        await processor.process_all()
+
+    async def _run_retry_only(self, page):
+        """再処理モード - DB の RETRY/PENDING 注文へ直接遷移して処理"""
+        await self.db_manager.flush_async()
+        entries = self.db_manager.get_pending_entries()
+        log_info(f"再処理モード: 対象 {len(entries)} 件")
+
+        # 遷移先が記録されていない注文（旧バージョンで登録・一覧URLのない Books）は
+        # 一覧の巡回が必要
+        unknown = [e for e in entries if not e.is_locatable]
+        if unknown:
+            log_warning(
+                f"遷移先が未記録のため {len(unknown)} 件を除外（通常実行で再検出されます）"
+            )
+            entries = [e for e in entries if e.is_locatable]
+        if not entries:
+            return
+
+        if Config.PARALLEL_WORKERS > 1:
+            worker_pages = await self._prepare_worker_pages()
+            if worker_pages is None:
+                return
+        else:
+            worker_pages = [page]
+
+        processor = ParallelOrderProcessor(worker_pages, self.db_manager)
+        processor.should_stop = lambda: self.should_stop
+        await processor.process_orders(entries)
+
+    async def _prepare_worker_pages(self) -> list:
+        """ワーカーページを作成してセッションを確認（中断時はNone）"""
+        # ワーカーページを作成（メインページのセッションを複製）
         worker_pages = await self.browser_manager.create_worker_pages()
 
-        # 各ワーカーでログイン
-        for i, worker_page in enumerate(worker_pages):
+        # セッションを並列に確認し、無効なワーカーのみログイン
+        valid_flags = await asyncio.gather(
+            *[Authenticator(p).is_session_valid() for p in worker_pages]
+        )
+        for i, (worker_page, valid) in enumerate(zip(worker_pages, valid_flags)):
+            if valid:
+                continue
             if self.should_stop:
-                return
-            log_info(f"ワーカー {i} ログイン中...")
+                return None
+            log_info(f"ワーカー {i} セッション無効 → ログイン中...")
             worker_auth = Authenticator(worker_page)
             await worker_auth.login()
 
-        # 並列処理開始
-        processor = ParallelOrderProcessor(worker_pages, self.db_manager)
-        processor.should_stop = lambda: self.should_stop
-        await processor.process_all()
+        return worker_pages
+
+
+def parse_args(argv=None):
+    """コマンドライン引数を解析"""
+    parser = argparse.ArgumentParser(description="楽天請求書ダウンロードBot")
+    parser.add_argument(
+        "--retry-only",
+        action="store_true",
+        help="一覧を巡回せず、DB の RETRY/PENDING 注文だけを再処理する",
+    )
+    parser.add_argument(
+        "--selector-report",
+        action="store_true",
+        help="セレクタの実績とヒットしていないセレクタを表示して終了する",
+    )
+    return parser.parse_args(argv)
+
+
+def print_selector_report():
+    """DB のセレクタ統計を表示（ブラウザは起動しない）"""
+    db_manager = DBManager()
+    try:
+        print(SelectorStats.format_report(db_manager.get_selector_stats()))
+    finally:
+        db_manager.close()
+
 
+async def main(argv=None):
+    args = parse_args(argv)
+    if args.selector_report:
+        print_selector_report()
+        return
 
-async def main():
-    app = RakutenBotApp()
+    app = RakutenBotApp(retry_only=args.retry_only)
     try:
         await app.run()
     finally:
@@ -0,0 +1,41 @@
+"""
+一覧ページの注文エントリ
+責務: 一覧ページから抽出した注文の識別情報と遷移先を保持
+"""
+
+
+class OrderEntry:
+    """一覧ページから抽出した注文"""
+
+    def __init__(
+        self,
+        order_id: str,
+        detail_url: str = None,
+        is_books: bool = False,
+        list_url: str = None,
+        order_number: int = None,
+    ):
+        self.order_id = order_id
+        self.detail_url = detail_url  # 詳細ページURL（リンクのhref）
+        self.is_books = is_books  # 一覧ページに Books 領収書リンクがあるか
+        self.list_url = list_url  # 抽出元の一覧ページURL
+        self.order_number = order_number  # 一覧ページ内の表示順（1始まり）
+
+    @staticmethod
+    def shop_id_of(order_id: str) -> str:
+        """注文番号の先頭セグメント（ショップID）を返す"""
+        return (order_id or "").split("-", 1)[0] or None
+
+    @property
+    def is_locatable(self) -> bool:
+        """記録済みの遷移先から開けるか（Books は一覧ページから発行するため一覧URLが必要）"""
+        if self.is_books:
+            return bool(self.list_url)
+        return bool(self.detail_url or self.list_url)
+
+    @property
+    def shop_id(self) -> str:
+        return self.shop_id_of(self.order_id)
+
+    def __repr__(self):
+        return f"OrderEntry({self.order_id!r}, books={self.is_books})"
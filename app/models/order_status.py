@@ -39,6 +39,8 @@ class IssueResult:
     def __init__(self, status: OrderStatus, error_message: str = None):
         self.status = status
         self.error_message = error_message
+        # NO_RECEIPT がページ上で確認できた判定か（「見つからない」だけの場合は False）
+        self.definitive = False
 
     @classmethod
     def success(cls, filename: str = None):
@@ -47,8 +49,10 @@ class IssueResult:
         return result
 
     @classmethod
-    def no_receipt(cls, reason: str = "領収書発行機能なし"):
-        return cls(OrderStatus.NO_RECEIPT, reason)
+    def no_receipt(cls, reason: str = "領収書発行機能なし", definitive: bool = False):
+        result = cls(OrderStatus.NO_RECEIPT, reason)
+        result.definitive = definitive
+        return result
 
     @classmethod
     def retry(cls, reason: str):
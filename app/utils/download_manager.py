@@ -0,0 +1,154 @@
+"""
+ダウンロード管理
+責務: ページのダウンロードイベントを処理中の注文に結び付けて保存し、保存タスクを追跡する
+"""
+
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from app.config import Config
+from app.utils.logger import log_info, log_debug, log_warning
+from app.utils.receipt_capture import ReceiptCapture
+from app.utils.receipt_writer import ReceiptWriter
+
+
+class DownloadManager:
+    """
+    ダウンロードの保存を管理する
+
+    発行処理中のページ（OrderHandler.issue_with_deadline が order() で登録）で発生した
+    ダウンロードは receipt_{注文番号} として保存し、それ以外は suggested_filename を
+    重複しない名前にして保存する。ディスク書き込みの同時実行数を制限し、
+    close() で保存中のタスクを待ってからブラウザを閉じられるようにする。
+    """
+
+    CLOSE_TIMEOUT = 60  # close() で保存中のダウンロードを待つ上限（秒）
+
+    _orders = {}  # {ページ: 処理中の注文番号}
+
+    def __init__(self, max_concurrent_writes: int = None):
+        self._semaphore = asyncio.Semaphore(
+            max_concurrent_writes or Config.DOWNLOAD_WRITE_CONCURRENCY
+        )
+        self._tasks = set()
+        self._reserved = set()  # 保存中のパス（同名の同時保存を避ける）
+        self.metrics = []  # [{"order_id", "filename", "bytes", "wait_ms", "save_ms", "ok"}]
+
+    @classmethod
+    @contextmanager
+    def order(cls, page, order_id: str):
+        """このブロックの間にページで発生したダウンロードを order_id に結び付ける"""
+        cls._orders[page] = order_id
+        try:
+            yield
+        finally:
+            if cls._orders.get(page) == order_id:
+                del cls._orders[page]
+
+    @classmethod
+    def order_for(cls, page) -> str:
+        """ページで処理中の注文番号（なければNone）"""
+        return cls._orders.get(page)
+
+    def handle(self, download):
+        """download イベントのハンドラ（保存タスクを作成して追跡する）"""
+        # 発行処理が注文番号で保存するダウンロードは二重に保存しない
+        if ReceiptCapture.is_active(download.page):
+            return
+
+        order_id = self.order_for(download.page)
+        save_path = self._reserve_path(download, order_id)
+        task = asyncio.create_task(self._save(download, order_id, save_path))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @property
+    def pending(self) -> int:
+        """保存中のダウンロード数"""
+        return len(self._tasks)
+
+    def _reserve_path(self, download, order_id: str) -> str:
+        """保存先を決める（既存ファイル・保存中のファイルと重複しない名前）"""
+        suggested = download.suggested_filename or "download"
+        if order_id:
+            extension = os.path.splitext(suggested)[1] or ".pdf"
+            base, extension = f"receipt_{order_id}", extension
+        else:
+            base, extension = os.path.splitext(suggested)
+
+        path = os.path.join(Config.DOWNLOAD_DIR, base + extension)
+        suffix = 1
+        while path in self._reserved or (not order_id and os.path.exists(path)):
+            path = os.path.join(Config.DOWNLOAD_DIR, f"{base}_{suffix}{extension}")
+            suffix += 1
+        self._reserved.add(path)
+        return path
+
+    async def _save(self, download, order_id: str, save_path: str):
+        """書き込み枠を確保して保存し、所要時間とサイズを記録"""
+        queued = time.monotonic()
+        metric = {
+            "order_id": order_id,
+            "filename": os.path.basename(save_path),
+            "bytes": 0,
+            "wait_ms": 0.0,
+            "save_ms": 0.0,
+            "ok": False,
+        }
+        try:
+            async with self._semaphore:
+                started = time.monotonic()
+                metric["wait_ms"] = (started - queued) * 1000
+                # 注文の領収書は PDF であることを確認して置き換える
+                saved = await ReceiptWriter.save_download(
+                    download, save_path, require_pdf=bool(order_id)
+                )
+                metric["save_ms"] = (time.monotonic() - started) * 1000
+            if not saved:
+                return
+            metric["bytes"] = os.path.getsize(save_path)
+            metric["ok"] = True
+            log_info(
+                f"ダウンロード保存: {metric['filename']}"
+                f" ({metric['bytes']} bytes, {metric['save_ms']:.0f}ms"
+                f"{', 注文 ' + order_id if order_id else ''})"
+            )
+        except Exception as e:
+            log_warning(f"ダウンロード保存失敗: {metric['filename']} - {e}")
+        finally:
+            self._reserved.discard(save_path)
+            self.metrics.append(metric)
+
+    async def close(self, timeout: float = None):
+        """保存中のダウンロードを待ち、集計をログ出力"""
+        if self._tasks:
+            log_info(f"保存中のダウンロードを待機: {len(self._tasks)} 件")
+            _, pending = await asyncio.wait(
+                set(self._tasks), timeout=timeout or self.CLOSE_TIMEOUT
+            )
+            for task in pending:
+                task.cancel()
+            if pending:
+                log_warning(f"保存が終わらなかったダウンロード: {len(pending)} 件")
+                await asyncio.gather(*pending, return_exceptions=True)
+        self.log_summary()
+
+    def log_summary(self):
+        """保存件数・サイズ・所要時間の集計をログ出力"""
+        if not self.metrics:
+            return
+        saved = [metric for metric in self.metrics if metric["ok"]]
+        failed = len(self.metrics) - len(saved)
+        if saved:
+            total_bytes = sum(metric["bytes"] for metric in saved)
+            average_save = sum(metric["save_ms"] for metric in saved) / len(saved)
+            max_wait = max(metric["wait_ms"] for metric in saved)
+            log_info(
+                f"ダウンロード: {len(saved)} 件保存 ({total_bytes} bytes),"
+                f" 平均保存 {average_save:.0f}ms, 最大書き込み待ち {max_wait:.0f}ms,"
+                f" 失敗 {failed} 件"
+            )
+        else:
+            log_info(f"ダウンロード: 失敗 {failed} 件")
+        log_debug(f"ダウンロード明細: {self.metrics}")
@@ -4,16 +4,22 @@
 """
 
 import asyncio
+import time
 from app.utils.logger import log_debug, log_warning
+from app.utils.readiness import PageReady
+from app.utils.timeouts import TimeoutRegistry
 
 
 class PageUtils:
     """Playwright ページ操作のユーティリティクラス"""
 
-    DEFAULT_TIMEOUT = 30000  # 30秒
+    DEFAULT_TIMEOUT = 30000  # 30秒（step 指定時は学習値が優先）
+    selector_stats = None  # SelectorStats（設定時は call_site 指定の探索で並び順を学習）
 
     @staticmethod
-    async def wait_and_click(page, selector: str, timeout: int = None) -> bool:
+    async def wait_and_click(
+        page, selector: str, timeout: int = None, step: str = None
+    ) -> bool:
         """
         要素が表示されるまで待機してからクリック
 
@@ -21,14 +27,15 @@ class PageUtils:
             page: Playwright ページオブジェクト
             selector: CSSセレクタまたはテキストセレクタ
             timeout: タイムアウト（ミリ秒）
+            step: タイムアウト学習のステップ名
 
         Returns:
             bool: 成功した場合True
         """
-        timeout = timeout or PageUtils.DEFAULT_TIMEOUT
         try:
             locator = page.locator(selector).first
-            await locator.wait_for(state="visible", timeout=timeout)
+            with TimeoutRegistry.step(step, timeout or PageUtils.DEFAULT_TIMEOUT) as limit:
+                await locator.wait_for(state="visible", timeout=limit)
             await locator.click()
             log_debug(f"クリック成功: {selector}")
             return True
@@ -37,7 +44,7 @@ class PageUtils:
             return False
 
     @staticmethod
-    async def wait_for_popup(page, click_action, timeout: int = None):
+    async def wait_for_popup(page, click_action, timeout: int = None, step: str = None):
         """
         ポップアップ（新しいタブ）を待機しながらアクションを実行
 
@@ -45,22 +52,24 @@ class PageUtils:
             page: Playwright ページオブジェクト
             click_action: ポップアップを開くアクション（async callable）
             timeout: タイムアウト（ミリ秒）
+            step: タイムアウト学習のステップ名（ポップアップが開くまで）
 
         Returns:
             新しいページオブジェクト、失敗時はNone
         """
         timeout = timeout or PageUtils.DEFAULT_TIMEOUT
         try:
-            # イベントベースでポップアップを監視
-            popup_future = asyncio.ensure_future(
-                page.wait_for_event("popup", timeout=timeout)
-            )
+            with TimeoutRegistry.step(step, timeout) as limit:
+                # イベントベースでポップアップを監視
+                popup_future = asyncio.ensure_future(
+                    page.wait_for_event("popup", timeout=limit)
+                )
 
-            # クリックアクションを実行
-            await click_action()
+                # クリックアクションを実行
+                await click_action()
 
-            # ポップアップを待機
-            new_page = await popup_future
+                # ポップアップを待機
+                new_page = await popup_future
 
             # ページの読み込みを待機
             await new_page.wait_for_load_state("domcontentloaded", timeout=timeout)
@@ -72,7 +81,9 @@ class PageUtils:
             return None
 
     @staticmethod
-    async def wait_for_download(page, click_action, timeout: int = None):
+    async def wait_for_download(
+        page, click_action, timeout: int = None, step: str = None
+    ):
         """
         ダウンロードイベントを待機しながらアクションを実行
 
@@ -80,16 +91,17 @@ class PageUtils:
             page: Playwright ページオブジェクト
             click_action: ダウンロードを開始するアクション（async callable）
             timeout: タイムアウト（ミリ秒）
+            step: タイムアウト学習のステップ名
 
         Returns:
             ダウンロードオブジェクト、失敗時はNone
         """
-        timeout = timeout or PageUtils.DEFAULT_TIMEOUT
         try:
-            async with page.expect_download(timeout=timeout) as download_info:
-                await click_action()
+            with TimeoutRegistry.step(step, timeout or PageUtils.DEFAULT_TIMEOUT) as limit:
+                async with page.expect_download(timeout=limit) as download_info:
+                    await click_action()
 
-            download = await download_info.value
+                download = await download_info.value
             log_debug(f"ダウンロード開始: {download.suggested_filename}")
             return download
 
@@ -98,7 +110,9 @@ class PageUtils:
             return None
 
     @staticmethod
-    async def wait_for_navigation(page, click_action, timeout: int = None) -> bool:
+    async def wait_for_navigation(
+        page, click_action, timeout: int = None, ready_selectors: list = ()
+    ) -> bool:
         """
         ナビゲーション完了を待機しながらアクションを実行
 
@@ -106,6 +120,8 @@ class PageUtils:
             page: Playwright ページオブジェクト
             click_action: ナビゲーションを開始するアクション（async callable）
             timeout: タイムアウト（ミリ秒）
+            ready_selectors: 遷移先の表示完了を示すセレクタ
+                （見つからない場合は上限付きの networkidle で判定）
 
         Returns:
             bool: 成功した場合True
@@ -115,7 +131,7 @@ class PageUtils:
             async with page.expect_navigation(timeout=timeout):
                 await click_action()
 
-            await page.wait_for_load_state("networkidle", timeout=timeout)
+            await PageReady.wait(page, "ナビゲーション", ready_selectors)
             log_debug(f"ナビゲーション完了: {page.url}")
             return True
 
@@ -124,7 +140,9 @@ class PageUtils:
             return False
 
     @staticmethod
-    async def safe_fill(page, selector: str, value: str, timeout: int = None) -> bool:
+    async def safe_fill(
+        page, selector: str, value: str, timeout: int = None, step: str = None
+    ) -> bool:
         """
         要素が表示されるまで待機してから入力
 
@@ -133,14 +151,15 @@ class PageUtils:
             selector: CSSセレクタ
             value: 入力する値
             timeout: タイムアウト（ミリ秒）
+            step: タイムアウト学習のステップ名
 
         Returns:
             bool: 成功した場合True
         """
-        timeout = timeout or PageUtils.DEFAULT_TIMEOUT
         try:
             locator = page.locator(selector).first
-            await locator.wait_for(state="visible", timeout=timeout)
+            with TimeoutRegistry.step(step, timeout or PageUtils.DEFAULT_TIMEOUT) as limit:
+                await locator.wait_for(state="visible", timeout=limit)
             await locator.fill(value)
             log_debug(f"入力成功: {selector}")
             return True
@@ -148,6 +167,125 @@ class PageUtils:
             log_warning(f"入力失敗 ({selector}): {e}")
             return False
 
+    @staticmethod
+    async def find_first_visible(
+        page,
+        selectors: list,
+        timeout: int = 5000,
+        call_site: str = None,
+        adaptive_timeout: bool = True,
+    ) -> tuple:
+        """
+        複数のセレクタを同時に待機し、最初に可視になった要素を返す
+
+        各セレクタの wait_for を並行して走らせるため、待機時間は
+        セレクタ数に関係なく最大 timeout で済む。同時に可視の場合は
+        リストの先頭に近いセレクタを優先する。
+
+        Args:
+            page: Playwright ページオブジェクト
+            selectors: 優先順のセレクタのリスト
+            timeout: 全体のタイムアウト（ミリ秒）
+            call_site: 統計の集計単位（指定時は実績順に並べ替えて結果を記録し、
+                タイムアウトも完了時間の学習値を使う）
+            adaptive_timeout: False の場合は学習値を使わず timeout で待つ
+                （見つからないことが NO_RECEIPT などの最終判定になる探索用）
+
+        Returns:
+            (要素, 渡されたリストでのインデックス)、見つからない場合は (None, -1)
+        """
+        if not selectors:
+            return None, -1
+        if not call_site:
+            return await PageUtils._race_visible(page, selectors, timeout)
+
+        # 見つかる場合の所要時間から決めたタイムアウトで、見つからない場合は早く諦める
+        step = f"visible.{call_site}"
+        timeout = TimeoutRegistry.get(step, timeout, adaptive=adaptive_timeout)
+        stats = PageUtils.selector_stats
+        ordered = stats.order(call_site, selectors) if stats else list(selectors)
+
+        started = time.monotonic()
+        not_visible = []
+        element, index = await PageUtils._race_visible(page, ordered, timeout, not_visible)
+        elapsed_ms = (time.monotonic() - started) * 1000
+        winner = ordered[index] if element else None
+        if stats:
+            stats.record(
+                call_site, ordered, winner, elapsed_ms, [ordered[i] for i in not_visible]
+            )
+        if not element:
+            TimeoutRegistry.record_timeout(step, timeout, elapsed_ms)
+            return None, -1
+        TimeoutRegistry.record(step, elapsed_ms)
+        return element, selectors.index(winner)
+
+    @staticmethod
+    async def _race_visible(
+        page, selectors: list, timeout: int, not_visible: list = None
+    ) -> tuple:
+        """
+        find_first_visible の本体（並べ替え・記録なし）
+
+        not_visible を渡した場合、確認して可視でなかった候補のインデックスを追加する
+        （勝者が決まった時点で打ち切った候補は含めない）
+        """
+        if not_visible is None:
+            not_visible = []
+
+        locators = [page.locator(selector).first for selector in selectors]
+        tasks = {
+            asyncio.ensure_future(
+                locator.wait_for(state="visible", timeout=timeout)
+            ): index
+            for index, locator in enumerate(locators)
+        }
+
+        pending = set(tasks)
+        winner = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in sorted(done, key=tasks.get):
+                    index = tasks[task]
+                    if task.cancelled() or task.exception() is not None:
+                        not_visible.append(index)
+                        continue
+                    # 待機完了直後に消えた要素は除外
+                    if winner is None and await PageUtils._is_visible(locators[index]):
+                        winner = index
+                    elif winner is None:
+                        not_visible.append(index)
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        if winner is None:
+            return None, -1
+
+        # 先頭に近いセレクタが既に可視ならそちらを優先
+        for index in range(winner):
+            if await PageUtils._is_visible(locators[index]):
+                winner = index
+                break
+            if index not in not_visible:
+                not_visible.append(index)
+
+        log_debug(f"可視要素検出: {selectors[winner]} (候補 {winner + 1}/{len(selectors)})")
+        return locators[winner], winner
+
+    @staticmethod
+    async def _is_visible(locator) -> bool:
+        """待機なしの可視判定（例外時はFalse）"""
+        try:
+            return await locator.is_visible()
+        except Exception:
+            return False
+
     @staticmethod
     async def find_visible_element(page, selectors: list, timeout: int = 5000):
         """
@@ -156,16 +294,10 @@ class PageUtils:
         Args:
             page: Playwright ページオブジェクト
             selectors: セレクタのリスト
-            timeout: 各セレクタのタイムアウト（ミリ秒）
+            timeout: 全体のタイムアウト（ミリ秒）
 
         Returns:
             見つかった要素、見つからない場合はNone
         """
-        for selector in selectors:
-            try:
-                locator = page.locator(selector).first
-                if await locator.is_visible(timeout=timeout):
-                    return locator
-            except:
-                continue
-        return None
+        locator, _ = await PageUtils.find_first_visible(page, selectors, timeout)
+        return locator
@@ -8,6 +8,9 @@ import os
 from app.config import Config
 from app.utils.logger import log_info, log_debug, log_warning
 from app.utils.page_utils import PageUtils
+from app.utils.readiness import Readiness, ReadyCondition
+from app.utils.receipt_writer import ReceiptWriter
+from app.utils.timeouts import TimeoutRegistry
 
 
 class PdfDownloader:
@@ -69,7 +72,8 @@ class PdfDownloader:
             download = await download_info.value
             filename = f"receipt_{order_id}.pdf"
             save_path = os.path.join(Config.DOWNLOAD_DIR, filename)
-            await download.save_as(save_path)
+            if not await ReceiptWriter.save_download(download, save_path):
+                return ""
             log_info(f"ダウンロード保存: {save_path}")
             return filename
 
@@ -115,8 +119,10 @@ class PdfDownloader:
         """ページからPDFをダウンロード"""
         try:
             # ページの読み込みを待機
-            await page.wait_for_load_state("load", timeout=120000)
-            await asyncio.sleep(2)
+            with TimeoutRegistry.step("pdf.page_load", 120000) as timeout:
+                await page.wait_for_load_state("load", timeout=timeout)
+            # PDF の URL に切り替わるまで待機（固定 2 秒の待機を置き換え）
+            await Readiness.wait("PDFタブのURL", [ReadyCondition.url_assigned(page)], 2)
 
             pdf_url = page.url
             log_debug(f"PDF URL: {pdf_url}")
@@ -126,18 +132,19 @@ class PdfDownloader:
             save_path = os.path.join(Config.DOWNLOAD_DIR, filename)
 
             response = await page.context.request.get(pdf_url)
-            if response.ok:
-                pdf_content = await response.body()
-                with open(save_path, "wb") as f:
-                    f.write(pdf_content)
-                log_info(f"PDF保存: {save_path} ({len(pdf_content)} bytes)")
-                await page.close()
-                return filename
-            else:
+            if not response.ok:
                 log_warning(f"PDF取得失敗: HTTP {response.status}")
                 await page.close()
                 return ""
 
+            pdf_content = await response.body()
+            saved = await ReceiptWriter.write_bytes(pdf_content, save_path)
+            await page.close()
+            if not saved:
+                return ""
+            log_info(f"PDF保存: {save_path} ({len(pdf_content)} bytes)")
+            return filename
+
         except Exception as e:
             log_warning(f"PDF保存エラー: {e}")
             try:
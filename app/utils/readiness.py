@@ -0,0 +1,251 @@
+"""
+待機条件（レディネス）
+責務: 固定スリープの代わりに各ステップが待つ条件（URL・要素・レスポンス・ダウンロード）を
+並行して待機し、成立した時点で再開する。従来のスリープとの差をステップごとに集計する
+"""
+
+import asyncio
+import time
+from app.config import Config
+from app.utils.logger import log_debug, log_info
+
+
+class ReadyCondition:
+    """待機条件（タイムアウト（ミリ秒）を受け取り、成立まで待つコルーチンを生成する）"""
+
+    def __init__(self, name: str, factory):
+        self.name = name
+        self.factory = factory
+
+    @classmethod
+    def url_changed(cls, page, previous_url: str):
+        """URL が previous_url から変わる（既に変わっていれば即成立）"""
+        return cls(
+            "url",
+            lambda timeout: page.wait_for_url(
+                lambda url: url != previous_url,
+                timeout=timeout,
+                wait_until="domcontentloaded",
+            ),
+        )
+
+    @classmethod
+    def url_matches(cls, page, url):
+        """URL がパターン（glob・正規表現・関数）に一致する"""
+        return cls(
+            "url",
+            lambda timeout: page.wait_for_url(
+                url, timeout=timeout, wait_until="domcontentloaded"
+            ),
+        )
+
+    @classmethod
+    def url_assigned(cls, page):
+        """新しく開いたタブに about:blank 以外の URL が読み込まれる"""
+        return cls.url_matches(page, lambda url: url != "about:blank")
+
+    @classmethod
+    def selector(cls, page, selector: str, state: str = "visible"):
+        """セレクタに一致する要素が state になる"""
+        return cls(
+            selector,
+            lambda timeout: page.locator(selector).first.wait_for(
+                state=state, timeout=timeout
+            ),
+        )
+
+    @classmethod
+    def element(cls, locator, state: str = "visible", name: str = "element"):
+        """ロケーターが state（visible / hidden / attached / detached）になる"""
+        return cls(name, lambda timeout: locator.wait_for(state=state, timeout=timeout))
+
+    @classmethod
+    def load_state(cls, page, state: str = "domcontentloaded"):
+        """ページが指定のロード状態になる"""
+        return cls(state, lambda timeout: page.wait_for_load_state(state, timeout=timeout))
+
+    @classmethod
+    def response(cls, page, predicate):
+        """predicate(response) を満たすレスポンスを受信する"""
+        return cls(
+            "response",
+            lambda timeout: page.wait_for_event(
+                "response", predicate=predicate, timeout=timeout
+            ),
+        )
+
+    @classmethod
+    def download(cls, page):
+        """ダウンロードが開始される"""
+        return cls("download", lambda timeout: page.wait_for_event("download", timeout=timeout))
+
+    @classmethod
+    def new_page(cls, context):
+        """コンテキストに新しいページ（タブ）が開く"""
+        return cls("page", lambda timeout: context.wait_for_event("page", timeout=timeout))
+
+
+class Readiness:
+    """
+    待機ステップの実行と集計
+
+    条件のいずれかが成立した時点で再開する。timeout を省略した場合は
+    従来のスリープと同じ時間を上限とするため、従来より遅くなることはない。
+    """
+
+    _steps = {}  # {ステップ名: {"count", "ready", "legacy_ms", "actual_ms"}}
+
+    @classmethod
+    async def wait(
+        cls, step: str, conditions: list, legacy_sleep: float, timeout: int = None
+    ) -> bool:
+        """
+        条件のいずれかが成立するまで待機
+
+        Args:
+            step: ステップ名（集計単位）
+            conditions: ReadyCondition のリスト
+            legacy_sleep: 置き換え前の固定スリープ（秒）
+            timeout: 上限（ミリ秒、省略時は legacy_sleep）
+
+        Returns:
+            bool: 条件が成立した場合True（タイムアウト時も処理は続行できる）
+        """
+        timeout = timeout if timeout is not None else int(legacy_sleep * 1000)
+        started = time.monotonic()
+        matched = await cls.race(conditions, timeout)
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        cls._record(step, matched is not None, legacy_sleep * 1000, elapsed_ms)
+        log_debug(
+            f"[待機] {step}: {elapsed_ms:.0f}ms "
+            f"({matched.name if matched else 'タイムアウト'}, "
+            f"従来 {legacy_sleep * 1000:.0f}ms → 短縮 {legacy_sleep * 1000 - elapsed_ms:+.0f}ms)"
+        )
+        return matched is not None
+
+    @staticmethod
+    async def race(conditions: list, timeout: int):
+        """
+        条件を並行して待機し、最初に成立した条件を返す
+
+        Returns:
+            成立した ReadyCondition（全条件の失敗・タイムアウト時はNone）
+        """
+        started = time.monotonic()
+        tasks = {}
+        for condition in conditions:
+            try:
+                tasks[asyncio.ensure_future(condition.factory(timeout))] = condition
+            except Exception:
+                continue
+
+        matched = None
+        pending = set(tasks)
+        try:
+            deadline = started + timeout / 1000
+            while pending and matched is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if not task.cancelled() and task.exception() is None:
+                        matched = matched or tasks[task]
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        return matched
+
+    @classmethod
+    def _record(cls, step: str, ready: bool, legacy_ms: float, actual_ms: float):
+        entry = cls._steps.setdefault(
+            step, {"count": 0, "ready": 0, "legacy_ms": 0.0, "actual_ms": 0.0}
+        )
+        entry["count"] += 1
+        entry["ready"] += int(ready)
+        entry["legacy_ms"] += legacy_ms
+        entry["actual_ms"] += actual_ms
+
+    @classmethod
+    def summary(cls) -> dict:
+        """ステップごとの集計（{ステップ名: {"count", "ready", "legacy_ms", "actual_ms"}}）"""
+        return {step: dict(entry) for step, entry in cls._steps.items()}
+
+    @classmethod
+    def log_summary(cls):
+        """実行全体の短縮時間をステップごとにログ出力"""
+        if not cls._steps:
+            return
+        log_info("=== 待機時間の短縮 ===")
+        total_saved = 0.0
+        for step, entry in sorted(
+            cls._steps.items(), key=lambda item: item[1]["actual_ms"] - item[1]["legacy_ms"]
+        ):
+            saved = entry["legacy_ms"] - entry["actual_ms"]
+            total_saved += saved
+            log_info(
+                f"{step}: {entry['count']} 回（成立 {entry['ready']}）"
+                f" 平均 {entry['actual_ms'] / entry['count']:.0f}ms, 短縮 {saved / 1000:.1f}秒"
+            )
+        log_info(f"合計短縮: {total_saved / 1000:.1f}秒")
+
+    @classmethod
+    def reset(cls):
+        cls._steps = {}
+
+
+class PageReady:
+    """
+    ページ遷移後の表示完了判定
+
+    ページごとの条件（注文一覧・領収書セクション・ログインフォーム等の要素）が
+    成立した時点で完了とする。条件が成立しないページ（注文 0 件の一覧など）に備え、
+    networkidle（上限 NETWORKIDLE_FALLBACK_MS）＋従来の待機時間をフォールバックとして並行に待つ。
+    常駐通信で networkidle にならないページでも上限で打ち切られる。
+    """
+
+    @classmethod
+    async def wait(cls, page, step: str, selectors: list = (), settle: float = 0) -> bool:
+        """
+        selectors のいずれかの要素が attached になるまで待機
+
+        Args:
+            page: Playwright ページオブジェクト
+            step: ステップ名（ログ用）
+            selectors: 表示完了を示すセレクタ
+            settle: フォールバック時に networkidle 後に待つ時間（秒、従来の固定待機）
+
+        Returns:
+            bool: 条件が成立した場合True（フォールバックで進んだ場合False）
+        """
+        cap = Config.NETWORKIDLE_FALLBACK_MS
+        fallback = ReadyCondition(
+            "networkidle", lambda timeout: cls._networkidle(page, cap, settle)
+        )
+        conditions = [
+            ReadyCondition.selector(page, selector, "attached") for selector in selectors
+        ]
+
+        started = time.monotonic()
+        matched = await Readiness.race(conditions + [fallback], cap + int(settle * 1000) + 1000)
+        ready = matched is not None and matched is not fallback
+        log_debug(
+            f"[ページ準備] {step}: {(time.monotonic() - started) * 1000:.0f}ms "
+            f"({matched.name if matched else 'タイムアウト'})"
+        )
+        return ready
+
+    @staticmethod
+    async def _networkidle(page, cap: int, settle: float):
+        """networkidle（上限 cap ミリ秒）を待ってから settle 秒待つ"""
+        try:
+            await page.wait_for_load_state("networkidle", timeout=cap)
+        except Exception as e:
+            log_debug(f"networkidle 待機を打ち切り（上限 {cap}ms）: {e}")
+        if settle:
+            await asyncio.sleep(settle)
@@ -0,0 +1,138 @@
+"""
+領収書PDFの取得
+責務: 発行操作の間に届いたダウンロード・PDFレスポンスを注文番号に結び付けて保存する
+"""
+
+import asyncio
+import os
+import time
+from app.config import Config
+from app.utils.logger import log_info, log_debug, log_warning
+from app.utils.receipt_writer import ReceiptWriter
+from app.utils.timeouts import TimeoutRegistry
+
+
+class ReceiptCapture:
+    """
+    発行クリックを囲んで PDF を待ち受ける
+
+    ページのダウンロードイベント、コンテキストの PDF レスポンス、発行で開いたタブの
+    ダウンロードイベントを監視し、最初に保存できたものを receipt_{注文番号}.pdf として
+    DOWNLOAD_DIR に書き込む。ファイルが存在して初めて成功とする。
+
+        async with ReceiptCapture(page, order_id) as capture:
+            await issue_button.click()
+            filename = await capture.wait()
+
+    capture 中のページは BrowserManager のダウンロードハンドラが保存しない。
+    """
+
+    TIMEOUT = 15000  # PDF の到着を待つ上限（ミリ秒、学習前の既定値）
+    STEP = "receipt.capture"
+
+    _active_pages = set()  # capture 中のページ
+
+    def __init__(self, page, order_id: str):
+        self.page = page
+        self.order_id = order_id
+        self.filename = f"receipt_{order_id}.pdf"
+        self._events = asyncio.Queue()
+        self._opened_pages = []
+
+    @classmethod
+    def is_active(cls, page) -> bool:
+        """ページが capture 中か（BrowserManager 側で二重保存しないための判定）"""
+        return page in cls._active_pages
+
+    async def __aenter__(self):
+        self._active_pages.add(self.page)
+        self.page.on("download", self._on_download)
+        self.page.context.on("response", self._on_response)
+        self.page.context.on("page", self._on_page)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.page.remove_listener("download", self._on_download)
+        self.page.context.remove_listener("response", self._on_response)
+        self.page.context.remove_listener("page", self._on_page)
+        for page in self._opened_pages:
+            page.remove_listener("download", self._on_download)
+            self._active_pages.discard(page)
+            # PDF 表示用に開いたタブは保存後に閉じる
+            try:
+                if not page.is_closed():
+                    await page.close()
+            except Exception as e:
+                log_debug(f"PDFタブを閉じられませんでした: {e}")
+        self._active_pages.discard(self.page)
+        return False
+
+    def _on_download(self, download):
+        self._events.put_nowait(("download", download))
+
+    def _on_response(self, response):
+        if self._is_pdf(response):
+            self._events.put_nowait(("response", response))
+
+    def _on_page(self, page):
+        self._opened_pages.append(page)
+        self._active_pages.add(page)
+        page.on("download", self._on_download)
+
+    @staticmethod
+    def _is_pdf(response) -> bool:
+        """PDF 本体のレスポンスか（Content-Type で判定）"""
+        try:
+            content_type = (response.headers or {}).get("content-type", "")
+        except Exception:
+            return False
+        return "application/pdf" in content_type.lower()
+
+    async def wait(self, timeout: int = None) -> str:
+        """
+        PDF を保存するまで待機
+
+        Args:
+            timeout: 上限（ミリ秒、省略時は実績から決めた値）
+
+        Returns:
+            保存したファイル名（届かない・保存できない場合は空文字列）
+        """
+        if timeout is None:
+            timeout = TimeoutRegistry.get(self.STEP, self.TIMEOUT)
+        save_path = os.path.join(Config.DOWNLOAD_DIR, self.filename)
+        started = time.monotonic()
+        deadline = started + timeout / 1000
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                TimeoutRegistry.record(self.STEP, timeout, censored=True)
+                log_warning(f"PDFが届きませんでした（{timeout}ms）: {self.order_id}")
+                return ""
+            try:
+                kind, source = await asyncio.wait_for(self._events.get(), remaining)
+            except asyncio.TimeoutError:
+                continue
+
+            # ダウンロード扱いのレスポンスは本文が取れないため、その場合は次のイベントを待つ
+            if not await self._save(kind, source, save_path):
+                continue
+
+            TimeoutRegistry.record(self.STEP, (time.monotonic() - started) * 1000)
+            log_info(f"領収書保存完了: {self.filename} ({kind})")
+            return self.filename
+
+    @staticmethod
+    async def _save(kind: str, source, save_path: str) -> bool:
+        """ダウンロード／レスポンスを保存し、ファイルができたか返す"""
+        if kind == "download":
+            saved = await ReceiptWriter.save_download(source, save_path)
+        else:
+            try:
+                data = await source.body()
+            except Exception as e:
+                log_debug(f"PDFレスポンスの本文を取得できません: {e}")
+                return False
+            saved = await ReceiptWriter.write_bytes(data, save_path)
+        return saved and os.path.exists(save_path)
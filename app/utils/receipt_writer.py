@@ -0,0 +1,136 @@
+"""
+領収書ファイルの書き込み
+責務: PDF を一時ファイルに書き出し、検証・fsync の後にアトミックに置き換える（イベントループ外で実行）
+"""
+
+import asyncio
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from app.config import Config
+from app.utils.logger import log_debug, log_warning
+
+
+class ReceiptWriter:
+    """
+    領収書の保存先への書き込み
+
+    一時ファイル（同じディレクトリの .part）に書いて fsync し、PDF ヘッダを確認してから
+    os.replace で置き換える。途中で中断しても receipt_*.pdf が壊れた状態で残らない。
+    ディスク I/O は専用のスレッドプールで行い、ワーカーのイベントループを止めない。
+    """
+
+    PDF_HEADER = b"%PDF-"
+    HEADER_SEARCH_BYTES = 1024  # ヘッダの前に余分なバイトがあっても許容する範囲
+
+    _executor = None
+
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=Config.DOWNLOAD_WRITE_CONCURRENCY,
+                thread_name_prefix="receipt-writer",
+            )
+        return cls._executor
+
+    @classmethod
+    async def _run(cls, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls._get_executor(), func, *args)
+
+    @classmethod
+    async def write_bytes(cls, data: bytes, save_path: str, require_pdf: bool = True) -> bool:
+        """
+        バイト列を保存
+
+        Args:
+            data: ファイルの内容
+            save_path: 保存先
+            require_pdf: PDF ヘッダがなければ保存しない
+
+        Returns:
+            bool: 保存できた場合True
+        """
+        temp_path = None
+        try:
+            temp_path = cls._temp_path(save_path)
+            return await cls._run(cls._write_and_commit, data, temp_path, save_path, require_pdf)
+        except Exception as e:
+            log_warning(f"ファイル書き込み失敗: {os.path.basename(save_path)} - {e}")
+            cls._discard(temp_path)
+            return False
+
+    @classmethod
+    async def save_download(cls, download, save_path: str, require_pdf: bool = True) -> bool:
+        """
+        Playwright のダウンロードを保存（save_as で一時ファイルへ書き、検証後に置き換える）
+
+        Returns:
+            bool: 保存できた場合True
+        """
+        temp_path = None
+        try:
+            temp_path = cls._temp_path(save_path)
+            await download.save_as(temp_path)
+            return await cls._run(cls._commit, temp_path, save_path, require_pdf)
+        except Exception as e:
+            log_warning(f"ダウンロード保存失敗: {os.path.basename(save_path)} - {e}")
+            cls._discard(temp_path)
+            return False
+
+    @staticmethod
+    def _temp_path(save_path: str) -> str:
+        """保存先と同じディレクトリの一時ファイル（同じファイルシステム内で rename するため）"""
+        directory, name = os.path.split(save_path)
+        fd, temp_path = tempfile.mkstemp(dir=directory or ".", prefix=f".{name}.", suffix=".part")
+        os.close(fd)
+        return temp_path
+
+    @classmethod
+    def _write_and_commit(cls, data: bytes, temp_path: str, save_path: str, require_pdf: bool) -> bool:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        return cls._commit(temp_path, save_path, require_pdf)
+
+    @classmethod
+    def _commit(cls, temp_path: str, save_path: str, require_pdf: bool) -> bool:
+        """一時ファイルを検証・fsync して保存先に置き換える"""
+        with open(temp_path, "rb+") as f:
+            head = f.read(cls.HEADER_SEARCH_BYTES)
+            if require_pdf and cls.PDF_HEADER not in head:
+                log_warning(
+                    f"PDFではないため保存しません: {os.path.basename(save_path)} ({head[:16]!r})"
+                )
+                f.close()
+                cls._discard(temp_path)
+                return False
+            os.fsync(f.fileno())
+
+        os.replace(temp_path, save_path)
+        cls._fsync_directory(os.path.dirname(save_path))
+        log_debug(f"ファイル保存: {save_path} ({os.path.getsize(save_path)} bytes)")
+        return True
+
+    @staticmethod
+    def _fsync_directory(directory: str):
+        """rename をディスクに反映（対応していない OS では何もしない）"""
+        try:
+            fd = os.open(directory or ".", os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _discard(temp_path: str):
+        if not temp_path:
+            return
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
@@ -0,0 +1,130 @@
+"""
+セレクタ統計
+責務: 呼び出し箇所ごとのセレクタのヒット/ミス・待機時間を記録し、候補の並び順を学習する
+"""
+
+from datetime import datetime
+from app.utils.logger import log_debug
+
+
+class SelectorStats:
+    """
+    フォールバックセレクタの実績を集計する
+
+    PageUtils.find_first_visible が呼び出し箇所（call_site）ごとに結果を記録し、
+    次回以降はヒット数の多いセレクタを先頭に並べ替える。
+    同時に可視の候補は先頭側が優先されるため、実績のある表記が勝ちやすくなる。
+    """
+
+    DEAD_MIN_ATTEMPTS = 20  # この回数以上確認して一度も可視にならなければ不要なセレクタとみなす
+
+    def __init__(self, db_manager=None):
+        self.db = db_manager
+        # {call_site: {selector: {"hits", "misses", "total_ms", "last_hit_at"}}}
+        self._stats = {}
+        self._unsaved = {}  # 前回 save() 以降の増分（同じ構造）
+        if db_manager:
+            for row in db_manager.get_selector_stats():
+                self._entry(self._stats, row["call_site"], row["selector"]).update(
+                    hits=row["hits"],
+                    misses=row["misses"],
+                    total_ms=row["total_ms"],
+                    last_hit_at=row["last_hit_at"],
+                )
+
+    @staticmethod
+    def _entry(stats: dict, call_site: str, selector: str) -> dict:
+        return stats.setdefault(call_site, {}).setdefault(
+            selector, {"hits": 0, "misses": 0, "total_ms": 0.0, "last_hit_at": None}
+        )
+
+    def order(self, call_site: str, selectors: list) -> list:
+        """ヒット数の多い順に並べ替えた候補を返す（同数なら元の順序）"""
+        site = self._stats.get(call_site)
+        if not site:
+            return list(selectors)
+        return sorted(
+            selectors, key=lambda selector: -site.get(selector, {}).get("hits", 0)
+        )
+
+    def record(
+        self,
+        call_site: str,
+        selectors: list,
+        winner: str,
+        elapsed_ms: float,
+        not_visible: list = (),
+    ):
+        """
+        1 回分の結果を記録
+
+        ミスは「確認して可視でなかった」候補だけに数える。勝者以外でも可視だった
+        （確認前に打ち切った）候補を数えると、並び順で後ろにある有効な候補が
+        不要なセレクタとして報告されるため
+
+        Args:
+            call_site: 呼び出し箇所の名前
+            selectors: 待機した候補
+            winner: 可視になったセレクタ（見つからなかった場合はNone = 全候補がミス）
+            elapsed_ms: 判定までの時間（ミリ秒）
+            not_visible: 勝者がいる場合に、確認して可視でなかった候補
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        missed = set(selectors) if winner is None else set(not_visible) - {winner}
+        for stats in (self._stats, self._unsaved):
+            for selector in selectors:
+                if selector == winner:
+                    entry = self._entry(stats, call_site, selector)
+                    entry["hits"] += 1
+                    entry["total_ms"] += elapsed_ms
+                    entry["last_hit_at"] = now
+                elif selector in missed:
+                    self._entry(stats, call_site, selector)["misses"] += 1
+
+    def save(self):
+        """増分を DB に書き込む"""
+        if not self.db or not self._unsaved:
+            return
+        rows = [
+            {"call_site": call_site, "selector": selector, **entry}
+            for call_site, site in self._unsaved.items()
+            for selector, entry in site.items()
+        ]
+        self.db.add_selector_stats(rows)
+        self._unsaved = {}
+        log_debug(f"セレクタ統計を保存: {len(rows)} 件")
+
+    @classmethod
+    def dead_selectors(cls, rows: list, min_attempts: int = None) -> list:
+        """一度もヒットせず、確認して可視でなかった回数が min_attempts 回以上のセレクタを返す"""
+        min_attempts = min_attempts or cls.DEAD_MIN_ATTEMPTS
+        return [
+            row
+            for row in rows
+            if row["hits"] == 0 and row["misses"] >= min_attempts
+        ]
+
+    @classmethod
+    def format_report(cls, rows: list, min_attempts: int = None) -> str:
+        """呼び出し箇所ごとの実績と不要なセレクタの一覧を文字列で返す"""
+        if not rows:
+            return "セレクタ統計はまだありません"
+
+        lines = ["=== セレクタ統計 ==="]
+        current_site = None
+        for row in rows:
+            if row["call_site"] != current_site:
+                current_site = row["call_site"]
+                lines.append(f"[{current_site}]")
+            average = row["total_ms"] / row["hits"] if row["hits"] else 0
+            lines.append(
+                f"  {row['hits']:>5} hit / {row['misses']:>5} miss"
+                f"  平均 {average:>6.0f}ms  {row['selector']}"
+            )
+
+        dead = cls.dead_selectors(rows, min_attempts)
+        lines.append("")
+        lines.append(f"=== 不要なセレクタ（ヒットなし）: {len(dead)} 件 ===")
+        for row in dead:
+            lines.append(f"  [{row['call_site']}] {row['selector']} ({row['misses']} 回ミス)")
+        return "\n".join(lines)
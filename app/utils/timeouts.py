@@ -0,0 +1,182 @@
+"""
+タイムアウト管理
+責務: ステップごとの完了時間を記録し、観測した p99 からタイムアウトを決める
+"""
+
+import time
+from contextlib import contextmanager
+from app.config import Config
+from app.utils.logger import log_debug, log_info
+
+
+class TimeoutRegistry:
+    """
+    ステップ名ごとのタイムアウト
+
+    直近 WINDOW 件の結果を保持し、タイムアウト = clamp(TIMEOUT_P99_MULTIPLIER × p99, floor, ceiling)
+    とする（floor = 既定値 × TIMEOUT_FLOOR_RATIO、ceiling = 既定値 × TIMEOUT_CEILING_FACTOR）。
+    タイムアウトで打ち切った待機は「少なくともその時間はかかる」打ち切りサンプルとして記録し、
+    窓内に打ち切りがあるステップは min(打ち切り時間 × CENSORED_GROWTH, 既定値) 以上に戻す。
+    p99 では 1% 未満の遅いページを無視してしまうため、取りこぼしでタイムアウトが縮み続けない。
+    サンプルが MIN_SAMPLES 件未満のステップは呼び出し元の既定値を使う。
+    サンプルは DB に保存し、次回の実行に引き継ぐ。
+    """
+
+    WINDOW = 200  # ステップごとに保持するサンプル数
+    MIN_SAMPLES = 20  # 学習値を使い始めるサンプル数
+    CENSORED_GROWTH = 2.0  # 打ち切りがあった場合に打ち切り時間へ掛ける倍率
+    TIMED_OUT_RATIO = 0.95  # 経過時間がタイムアウトのこの割合以上なら打ち切りとみなす
+
+    _db = None
+    _samples = {}  # {ステップ名: [(完了時間（ミリ秒）, 打ち切りなら True), ...]}
+    _dirty = set()  # 前回 save() 以降に更新したステップ
+
+    @classmethod
+    def load(cls, db_manager):
+        """DB からサンプルを読み込む"""
+        cls._db = db_manager
+        cls._samples = {
+            step: samples[-cls.WINDOW :]
+            for step, samples in db_manager.get_step_timings().items()
+        }
+        cls._dirty = set()
+
+    @classmethod
+    def save(cls):
+        """更新したステップのサンプルを DB に書き込む"""
+        if not cls._db or not cls._dirty:
+            return
+        cls._db.save_step_timings(
+            {step: cls._samples[step] for step in cls._dirty}
+        )
+        log_debug(f"タイムアウト学習値を保存: {len(cls._dirty)} ステップ")
+        cls._dirty = set()
+
+    @classmethod
+    def reset(cls):
+        cls._db = None
+        cls._samples = {}
+        cls._dirty = set()
+
+    @classmethod
+    def record(cls, step: str, elapsed_ms: float, censored: bool = False):
+        """
+        ステップの結果を記録
+
+        Args:
+            step: ステップ名
+            elapsed_ms: 完了時間（打ち切りの場合は打ち切ったタイムアウト）
+            censored: タイムアウトで打ち切った場合True
+        """
+        samples = cls._samples.setdefault(step, [])
+        samples.append((round(elapsed_ms, 1), censored))
+        del samples[: -cls.WINDOW]
+        cls._dirty.add(step)
+
+    @classmethod
+    def record_timeout(cls, step: str, timeout: float, elapsed_ms: float):
+        """失敗した待機がタイムアウトによるものなら打ち切りサンプルとして記録"""
+        if step and elapsed_ms >= timeout * cls.TIMED_OUT_RATIO:
+            cls.record(step, timeout, censored=True)
+
+    @classmethod
+    def percentiles(cls, step: str) -> tuple:
+        """完了したサンプルの (p50, p99)（サンプルがなければ (None, None)）"""
+        samples = sorted(ms for ms, censored in cls._samples.get(step, []) if not censored)
+        if not samples:
+            return None, None
+        return cls._percentile(samples, 50), cls._percentile(samples, 99)
+
+    @staticmethod
+    def _percentile(sorted_samples: list, percent: float) -> float:
+        """最近順位法によるパーセンタイル"""
+        rank = max(1, -(-len(sorted_samples) * percent // 100))  # 切り上げ
+        return sorted_samples[int(rank) - 1]
+
+    @classmethod
+    def get(
+        cls,
+        step: str,
+        default: int,
+        floor: int = None,
+        ceiling: int = None,
+        adaptive: bool = True,
+    ) -> int:
+        """
+        ステップのタイムアウト（ミリ秒）
+
+        Args:
+            step: ステップ名
+            default: サンプル不足時の値（従来の固定値）
+            floor: 下限（省略時は default × TIMEOUT_FLOOR_RATIO）
+            ceiling: 上限（省略時は default × TIMEOUT_CEILING_FACTOR）
+            adaptive: False の場合は常に default（見つからないことが最終判定になる
+                待機では、学習値による取りこぼしを NO_RECEIPT にしないため）
+        """
+        samples = cls._samples.get(step, [])
+        if not adaptive or len(samples) < cls.MIN_SAMPLES:
+            return default
+        _, p99 = cls.percentiles(step)
+        if p99 is None:
+            return default
+
+        floor = floor if floor is not None else int(default * Config.TIMEOUT_FLOOR_RATIO)
+        ceiling = (
+            ceiling if ceiling is not None else int(default * Config.TIMEOUT_CEILING_FACTOR)
+        )
+        timeout = p99 * Config.TIMEOUT_P99_MULTIPLIER
+
+        # 打ち切りがあれば既定値まで戻す（それ以上は完了したサンプルでのみ伸ばす）
+        censored = [ms for ms, is_censored in samples if is_censored]
+        if censored:
+            timeout = max(timeout, min(max(censored) * cls.CENSORED_GROWTH, default))
+
+        return int(min(max(timeout, floor), ceiling))
+
+    @classmethod
+    @contextmanager
+    def step(
+        cls,
+        step: str,
+        default: int,
+        floor: int = None,
+        ceiling: int = None,
+        adaptive: bool = True,
+    ):
+        """
+        タイムアウトを渡して処理を計測
+
+        例外なく終わった場合は完了時間を、タイムアウトで失敗した場合は打ち切りサンプルを記録する。
+        step が None の場合は default をそのまま使い、記録もしない
+
+            with TimeoutRegistry.step("books.tab_load", 60000) as timeout:
+                await page.wait_for_load_state("domcontentloaded", timeout=timeout)
+        """
+        if step is None:
+            yield default
+            return
+        timeout = cls.get(step, default, floor, ceiling, adaptive)
+        started = time.monotonic()
+        try:
+            yield timeout
+        except Exception:
+            cls.record_timeout(step, timeout, (time.monotonic() - started) * 1000)
+            raise
+        cls.record(step, (time.monotonic() - started) * 1000)
+
+    @classmethod
+    def log_summary(cls):
+        """学習済みステップの p50/p99 と打ち切り件数をログ出力"""
+        learned = [
+            step for step, samples in cls._samples.items() if len(samples) >= cls.MIN_SAMPLES
+        ]
+        if not learned:
+            return
+        log_info("=== タイムアウト学習値 ===")
+        for step in sorted(learned):
+            p50, p99 = cls.percentiles(step)
+            timed_out = sum(1 for _, censored in cls._samples[step] if censored)
+            if p50 is None:
+                log_info(f"{step}: 完了なし / 打ち切り {timed_out}")
+                continue
+            log_info(f"{step}: p50 {p50:.0f}ms / p99 {p99:.0f}ms / 打ち切り {timed_out}")
@@ -2,5 +2,5 @@
 cd "$(dirname "$0")"
 source venv/bin/activate
 export PYTHONPATH=$PYTHONPATH:.
-python -m app.main
+python -m app.main "$@"
 deactivate
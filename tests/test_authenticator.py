@@ -11,6 +11,7 @@ def mock_page():
     page = AsyncMock()
     type(page).url = PropertyMock(return_value="https://login.account.rakuten.com/")
     page.title = AsyncMock(return_value="ログイン")
+    page.locator = MagicMock()
     return page
 
 
@@ -29,12 +30,28 @@ async def test_navigates_to_login_page(mock_page):
         mock_page.goto.assert_any_call("https://www.rakuten.co.jp/")
 
 
+def _visible_only(page, visible_selectors):
+    """指定したセレクタだけが可視のロケーターを返すようにする"""
+
+    def locator(selector):
+        element = MagicMock()
+        if selector in visible_selectors:
+            element.wait_for = AsyncMock()
+            element.is_visible = AsyncMock(return_value=True)
+        else:
+            element.wait_for = AsyncMock(side_effect=Exception("timeout"))
+            element.is_visible = AsyncMock(return_value=False)
+        return MagicMock(first=element)
+
+    page.locator = MagicMock(side_effect=locator)
+
+
 @pytest.mark.asyncio
 async def test_detects_global_id_flow(mock_page):
     """Global IDログインフォームを検出する"""
     from app.core.authenticator import Authenticator
 
-    mock_page.is_visible = AsyncMock(side_effect=[True, False, False])
+    _visible_only(mock_page, {'input[name="username"]'})
 
     auth = Authenticator(mock_page)
     flow = await auth._detect_login_flow()
@@ -48,7 +65,7 @@ async def test_detects_legacy_flow(mock_page):
     """旧ログインフォームを検出する"""
     from app.core.authenticator import Authenticator
 
-    mock_page.is_visible = AsyncMock(side_effect=[False, True, False])
+    _visible_only(mock_page, {'input[name="u"]'})
 
     auth = Authenticator(mock_page)
     flow = await auth._detect_login_flow()
@@ -62,9 +79,52 @@ async def test_returns_none_when_no_login_form(mock_page):
     """ログインフォームがない場合Noneを返す"""
     from app.core.authenticator import Authenticator
 
-    mock_page.is_visible = AsyncMock(return_value=False)
+    _visible_only(mock_page, set())
 
     auth = Authenticator(mock_page)
     flow = await auth._detect_login_flow()
 
     assert flow is None
+
+
+@pytest.mark.asyncio
+async def test_session_valid_when_not_redirected(mock_page):
+    """購入履歴がログインページへリダイレクトされなければセッション有効"""
+    from app.core.authenticator import Authenticator
+
+    response = MagicMock(ok=True, status=200, url="https://order.my.rakuten.co.jp/")
+    mock_page.context = MagicMock()
+    mock_page.context.request.get = AsyncMock(return_value=response)
+
+    auth = Authenticator(mock_page)
+    assert await auth.is_session_valid() is True
+
+
+@pytest.mark.asyncio
+async def test_session_invalid_when_redirected_to_login(mock_page):
+    """ログインページへリダイレクトされたらセッション無効"""
+    from app.core.authenticator import Authenticator
+
+    response = MagicMock(
+        ok=True, status=200, url="https://login.account.rakuten.com/sso/authorize"
+    )
+    mock_page.context = MagicMock()
+    mock_page.context.request.get = AsyncMock(return_value=response)
+
+    auth = Authenticator(mock_page)
+    assert await auth.is_session_valid() is False
+
+
+@pytest.mark.asyncio
+async def test_ensure_logged_in_skips_login_for_valid_session(mock_page):
+    """セッション有効時はログインを実行しない"""
+    from app.core.authenticator import Authenticator
+
+    auth = Authenticator(mock_page)
+    auth.is_session_valid = AsyncMock(return_value=True)
+    auth.login = AsyncMock()
+
+    assert await auth.ensure_logged_in() is False
+    auth.login.assert_not_called()
+    # 終了時のセッション保存対象
+    assert auth.logged_in is True
@@ -0,0 +1,59 @@
+"""
+DateShardのテスト
+"""
+
+from datetime import date
+from app.core.date_shards import DateShard, parse_order_date
+from app.models.order_entry import OrderEntry
+
+BASE_URL = "https://order.my.rakuten.co.jp/"
+
+
+def test_parse_order_date():
+    """注文番号から注文日を取得する"""
+    assert parse_order_date("222222-20250101-2222222222") == date(2025, 1, 1)
+    assert parse_order_date("invalid-order") is None
+
+
+def test_build_month_shards_newest_first():
+    """期間を新しい月から順に月単位で分割する"""
+    shards = DateShard.build("2023-11", "2024-01")
+
+    assert [shard.label for shard in shards] == ["2024-01", "2023-12", "2023-11"]
+    assert shards[0].end == date(2024, 1, 31)
+    assert shards[0].url(BASE_URL) == f"{BASE_URL}?year=2024&month=01"
+
+
+def test_build_without_from_uses_single_unfiltered_shard():
+    """開始年月がなければ分割せず、終了年月を上限にする"""
+    assert DateShard.build("", "")[0].url(BASE_URL) == BASE_URL
+
+    shards = DateShard.build("", "2024-02")
+    assert len(shards) == 1
+    assert shards[0].end == date(2024, 2, 29)
+
+
+def test_build_until_current_month_when_to_is_empty():
+    """終了年月がなければ当月までを対象にする"""
+    shards = DateShard.build("2024-11", "", today=date(2025, 1, 15))
+
+    assert [shard.label for shard in shards] == ["2025-01", "2024-12", "2024-11"]
+
+
+def test_filter_entries_enforces_range():
+    """期間外の注文を除外し、開始日より古い注文への到達を検出する"""
+    shard = DateShard.build("2024-01", "2024-01")[0]
+    entries = [
+        OrderEntry("shop-20240201-1"),
+        OrderEntry("shop-20240115-1"),
+        OrderEntry("unknown-order"),
+        OrderEntry("shop-20231231-1"),
+    ]
+
+    in_range, passed_start = shard.filter_entries(entries)
+
+    assert [e.order_id for e in in_range] == ["shop-20240115-1", "unknown-order"]
+    assert passed_start
+
+    _, passed_start = shard.filter_entries(entries[:2])
+    assert not passed_start
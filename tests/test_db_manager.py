@@ -14,7 +14,9 @@ def db():
     """テスト用DBを作成"""
     with tempfile.TemporaryDirectory() as tmpdir:
         db_path = os.path.join(tmpdir, "test.db")
-        yield DBManager(db_path)
+        db = DBManager(db_path)
+        yield db
+        db.close()
 
 
 def test_creates_table():
@@ -23,6 +25,7 @@ def test_creates_table():
         db_path = os.path.join(tmpdir, "test.db")
         db = DBManager(db_path)
         assert os.path.exists(db_path)
+        db.close()
 
 
 def test_updates_order_status(db):
@@ -47,12 +50,94 @@ def test_should_not_process_done_order(db):
     assert db.should_process("done_order") is False
 
 
+def _make_due(db, order_id):
+    """次回試行日時を過去にする"""
+    db.flush()
+    with db.conn:
+        db.conn.execute(
+            "UPDATE orders SET next_attempt_at = '2000-01-01 00:00:00' WHERE order_id = ?",
+            (order_id,),
+        )
+
+
 def test_should_process_retry_order(db):
-    """RETRY注文は処理対象"""
+    """次回試行日時を過ぎたRETRY注文は処理対象"""
     db.update_order("retry_order", OrderStatus.RETRY.value)
+    _make_due(db, "retry_order")
     assert db.should_process("retry_order") is True
 
 
+def test_retry_order_is_deferred_until_next_attempt(db):
+    """RETRY注文は次回試行日時までは処理対象外"""
+    db.update_order("retry_order", OrderStatus.RETRY.value, increment_retry=True)
+
+    assert db.classify_orders(["retry_order"])["retry_order"] == (
+        DBManager.DECISION_DEFER,
+        OrderStatus.RETRY.value,
+    )
+
+
+def test_retry_backoff_grows_exponentially_with_cap(db):
+    """次回試行日時は リトライ回数に応じて指数的に延び、上限で止まる"""
+    from datetime import datetime
+    from unittest.mock import patch
+
+    def delay_hours(order_id):
+        db.flush()
+        updated_at, next_attempt_at = db.conn.execute(
+            "SELECT updated_at, next_attempt_at FROM orders WHERE order_id = ?",
+            (order_id,),
+        ).fetchone()
+        fmt = "%Y-%m-%d %H:%M:%S"
+        delta = datetime.strptime(next_attempt_at, fmt) - datetime.strptime(updated_at, fmt)
+        return delta.total_seconds() / 3600
+
+    with patch("app.core.db_manager.random.uniform", return_value=1.0), patch(
+        "app.core.db_manager.Config.RETRY_BACKOFF_BASE_HOURS", 6
+    ), patch("app.core.db_manager.Config.RETRY_BACKOFF_MAX_HOURS", 20):
+        delays = []
+        for _ in range(3):
+            db.update_order("o1", OrderStatus.RETRY.value, increment_retry=True)
+            delays.append(delay_hours("o1"))
+
+        db.update_order("o1", OrderStatus.DONE.value)
+        db.flush()
+        cleared = db.conn.execute(
+            "SELECT next_attempt_at FROM orders WHERE order_id = 'o1'"
+        ).fetchone()[0]
+
+    assert delays == [6, 12, 20]
+    assert cleared is None
+
+
+def test_classify_orders_in_one_call(db):
+    """ページ内の注文をまとめて判定する"""
+    db.update_order("done", OrderStatus.DONE.value)
+    db.update_order("retry", OrderStatus.RETRY.value)
+
+    _make_due(db, "retry")
+
+    decisions = db.classify_orders(["new", "done", "retry"])
+
+    assert decisions["new"] == (DBManager.DECISION_PROCESS, None)
+    assert decisions["done"] == (DBManager.DECISION_SKIP, OrderStatus.DONE.value)
+    assert decisions["retry"] == (DBManager.DECISION_PROCESS, OrderStatus.RETRY.value)
+
+
+def test_classify_orders_escalates_max_retry(db):
+    """最大リトライ回数に到達したRETRY注文はERRORに切り替える"""
+    for order_id in ["r1", "r2"]:
+        for _ in range(DBManager.MAX_RETRY_COUNT):
+            db.update_order(order_id, OrderStatus.RETRY.value, increment_retry=True)
+
+    decisions = db.classify_orders(["r1", "r2"])
+
+    assert decisions["r1"][0] == DBManager.DECISION_ESCALATE
+    assert db.get_order_status("r1") == OrderStatus.ERROR.value
+    assert db.get_order_status("r2") == OrderStatus.ERROR.value
+    assert db.should_process("r1") is False
+
+
 def test_increments_retry_count(db):
     """リトライカウントを増加する"""
     db.update_order("order_1", OrderStatus.RETRY.value, increment_retry=True)
@@ -62,6 +147,325 @@ def test_increments_retry_count(db):
     assert db.get_retry_count("order_1") == 2
 
 
+def test_update_order_upserts_existing_row(db):
+    """既存注文はUPSERTで更新され、作成日時とダウンロード日時を保持する"""
+    db.update_order("o1", OrderStatus.DONE.value, "receipt.pdf", order_number=1)
+    db.flush()
+    created_at, downloaded_at = db.conn.execute(
+        "SELECT created_at, downloaded_at FROM orders WHERE order_id = 'o1'"
+    ).fetchone()
+
+    db.update_order("o1", OrderStatus.RETRY.value, increment_retry=True)
+    db.flush()
+
+    row = db.conn.execute(
+        "SELECT status, retry_count, created_at, downloaded_at, order_number FROM orders"
+    ).fetchall()
+    assert row == [(OrderStatus.RETRY.value, 1, created_at, downloaded_at, 1)]
+
+
+def test_update_order_sets_order_number_on_discovered_row(db):
+    """一覧で登録済みの注文にも表示順を記録する"""
+    from app.models.order_entry import OrderEntry
+
+    db.record_discovered_orders([OrderEntry("o1", detail_url="https://d/o1")])
+    db.update_order("o1", OrderStatus.RETRY.value, order_number=3)
+    db.flush()
+
+    assert db.conn.execute("SELECT order_number FROM orders").fetchall() == [(3,)]
+
+
+def test_uses_wal_journal_mode(db):
+    """WALモードで接続する"""
+    assert db.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_close_checkpoints_and_closes():
+    """closeでWALをチェックポイントしてコネクションを閉じる"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "test.db")
+        db = DBManager(db_path)
+        db.update_order("o1", OrderStatus.DONE.value)
+
+        db.close()
+        db.close()  # 二重closeでもエラーにならない
+
+        assert db.conn is None
+        wal_path = db_path + "-wal"
+        assert not os.path.exists(wal_path) or os.path.getsize(wal_path) == 0
+
+
+def test_reads_see_pending_writes():
+    """ライトビハインド中の未コミット分が読み取りに反映される"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DBManager(os.path.join(tmpdir, "test.db"), write_behind=True)
+        db._writer.flush_interval = 60  # 時間トリガーでは書き込まない
+
+        db.update_order("o1", OrderStatus.RETRY.value, increment_retry=True)
+        db.update_order("o1", OrderStatus.RETRY.value, increment_retry=True)
+
+        assert db.get_order_status("o1") == OrderStatus.RETRY.value
+        assert db.get_retry_count("o1") == 2
+        # 未コミットの RETRY は次回試行日時前として扱う
+        assert db.classify_orders(["o1"])["o1"][0] == DBManager.DECISION_DEFER
+
+        db.close()
+
+
+def test_reads_retry_when_a_commit_overlaps_the_select():
+    """SELECT の間にコミットが重なったら読み直す（ロックを持たずに整合した値を返す）"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DBManager(os.path.join(tmpdir, "test.db"), write_behind=True)
+        db._writer.flush_interval = 60
+        db.update_order("o1", OrderStatus.RETRY.value, increment_retry=True)
+        db.flush()
+        db.update_order("o1", OrderStatus.RETRY.value, increment_retry=True)
+
+        selects = []
+        original = db.conn
+
+        class OverlappingConnection:
+            def execute(self, *args):
+                selects.append(args)
+                if len(selects) == 1:
+                    # 1 回目の SELECT の最中に書き込みスレッドがコミットした状態
+                    db._writer._generation += 2
+                return original.execute(*args)
+
+        db.conn = OverlappingConnection()
+        try:
+            assert db.get_retry_count("o1") == 2
+        finally:
+            db.conn = original
+        assert len(selects) == 2
+
+        db.close()
+
+
+def test_pending_shop_results_and_watermarks_are_read_without_flush():
+    """ショップの結果・ウォーターマークは未コミットでも読み取りに反映される"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DBManager(os.path.join(tmpdir, "test.db"), write_behind=True)
+        db._writer.flush_interval = 60
+        db._writer.flush = None  # 読み取りで flush しない
+
+        for _ in range(2):
+            db.record_shop_result("111111", OrderStatus.NO_RECEIPT.value, definitive=True)
+        db.set_watermark("account_a", "shop-20240301-001")
+
+        assert db.get_no_receipt_shops(["111111"]) == {"111111"}
+        assert db.get_watermark("account_a") == "shop-20240301-001"
+
+        db.record_shop_result("111111", OrderStatus.DONE.value)
+        assert db.get_no_receipt_shops(["111111"]) == set()
+
+        del db._writer.flush
+        db.close()
+
+
+@pytest.mark.asyncio
+async def test_flush_async_commits_off_the_event_loop():
+    """flush_async は書き込みスレッドのコミットを待つ"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DBManager(os.path.join(tmpdir, "test.db"), write_behind=True)
+        db._writer.flush_interval = 60
+        db.update_order("o1", OrderStatus.DONE.value)
+
+        await db.flush_async()
+
+        assert db._writer.pending_writes(["o1"])[1] == {}
+        assert db.conn.execute("SELECT status FROM orders").fetchone() == ("DONE",)
+        db.close()
+
+
+def test_close_unregisters_exit_handler():
+    """close 後は終了時ハンドラから外れ、インスタンスを保持し続けない"""
+    import atexit
+    from unittest.mock import patch
+
+    with tempfile.TemporaryDirectory() as tmpdir, patch.object(
+        atexit, "unregister"
+    ) as unregister:
+        db = DBManager(os.path.join(tmpdir, "test.db"), write_behind=True)
+        writer = db._writer
+        db.close()
+
+    unregister.assert_called_once_with(writer.close)
+    atexit.unregister(writer.close)
+
+
+def test_close_flushes_pending_writes():
+    """closeで未コミットの書き込みを確定する"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "test.db")
+        db = DBManager(db_path, write_behind=True)
+        for i in range(120):
+            db.update_order(f"o{i}", OrderStatus.DONE.value)
+        db.close()
+
+        reopened = DBManager(db_path, write_behind=False)
+        assert reopened.get_summary() == {OrderStatus.DONE.value: 120}
+        reopened.close()
+
+
+def test_synchronous_mode_writes_immediately():
+    """ライトビハインド無効時は即時コミットする"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DBManager(os.path.join(tmpdir, "test.db"), write_behind=False)
+        db.update_order("o1", OrderStatus.DONE.value)
+
+        row = db.conn.execute("SELECT status FROM orders").fetchone()
+        assert row == (OrderStatus.DONE.value,)
+        db.close()
+
+
+def test_record_discovered_orders_keeps_status(db):
+    """検出した注文の遷移先を記録し、既存注文のステータスは変えない"""
+    from app.models.order_entry import OrderEntry
+
+    db.update_order("done-order", OrderStatus.DONE.value, "receipt.pdf")
+    db.record_discovered_orders(
+        [
+            OrderEntry("done-order", detail_url="https://d/done", list_url="https://l/1"),
+            OrderEntry("books-order", list_url="https://l/1", is_books=True),
+        ]
+    )
+    db.flush()
+
+    assert db.get_order_status("done-order") == OrderStatus.DONE.value
+    assert db.get_order_status("books-order") == OrderStatus.PENDING.value
+    rows = dict(
+        (row[0], row[1:])
+        for row in db.conn.execute(
+            "SELECT order_id, detail_url, is_books, list_url FROM orders"
+        )
+    )
+    assert rows["done-order"] == ("https://d/done", 0, "https://l/1")
+    assert rows["books-order"] == (None, 1, "https://l/1")
+
+
+def test_get_pending_entries_includes_locations(db):
+    """再処理対象を記録済みの遷移先付きで取得する"""
+    from app.models.order_entry import OrderEntry
+
+    db.record_discovered_orders(
+        [
+            OrderEntry("new-order", detail_url="https://d/new", list_url="https://l/2"),
+            OrderEntry("done-order", detail_url="https://d/done"),
+        ]
+    )
+    db.update_order("done-order", OrderStatus.DONE.value)
+
+    entries = db.get_pending_entries()
+
+    assert [e.order_id for e in entries] == ["new-order"]
+    assert entries[0].detail_url == "https://d/new"
+    assert entries[0].list_url == "https://l/2"
+    assert entries[0].is_books is False
+
+
+def test_no_receipt_shop_orders_are_classified_without_processing(db):
+    """NO_RECEIPT が続いたショップの注文は処理せずに NO_RECEIPT にする"""
+    for _ in range(2):
+        db.record_shop_result("111111", OrderStatus.NO_RECEIPT.value, definitive=True)
+    db.record_shop_result("222222", OrderStatus.NO_RECEIPT.value, definitive=True)
+    db.flush()
+
+    decisions = db.classify_orders(["111111-20240101-1", "222222-20240101-1"])
+
+    assert decisions["111111-20240101-1"] == (
+        DBManager.DECISION_SHOP_NO_RECEIPT,
+        OrderStatus.NO_RECEIPT.value,
+    )
+    assert decisions["222222-20240101-1"][0] == DBManager.DECISION_PROCESS
+    assert db.get_order_status("111111-20240101-1") == OrderStatus.NO_RECEIPT.value
+
+
+def test_shop_success_resets_no_receipt_streak(db):
+    """発行に成功したショップは非対応扱いを解除する"""
+    for status in ["NO_RECEIPT", "NO_RECEIPT", "DONE", "NO_RECEIPT", "RETRY"]:
+        db.record_shop_result("111111", status, definitive=True)
+    db.flush()
+
+    assert db.get_no_receipt_shops(["111111"]) == set()
+    row = db.conn.execute(
+        "SELECT no_receipt_streak, success_count, last_result FROM shop_capabilities"
+    ).fetchone()
+    assert row == (1, 1, "NO_RECEIPT")
+
+
+def test_stale_shop_capability_is_rechecked(db):
+    """最終確認から期間が過ぎたショップは再確認のため処理対象に戻す"""
+    for _ in range(3):
+        db.record_shop_result("111111", OrderStatus.NO_RECEIPT.value, definitive=True)
+    db.flush()
+    with db.conn:
+        db.conn.execute(
+            "UPDATE shop_capabilities SET last_checked_at = '2000-01-01 00:00:00'"
+        )
+
+    assert db.get_no_receipt_shops(["111111"]) == set()
+
+
+def test_non_definitive_no_receipt_does_not_count(db):
+    """「見つからない」だけの NO_RECEIPT はショップの連続回数に数えない"""
+    for _ in range(3):
+        db.record_shop_result("111111", OrderStatus.NO_RECEIPT.value)
+    db.flush()
+
+    assert db.get_no_receipt_shops(["111111"]) == set()
+    assert db.conn.execute("SELECT COUNT(*) FROM shop_capabilities").fetchone() == (0,)
+
+
+def test_shop_skipped_orders_are_requeued_when_shop_succeeds(db):
+    """ショップの結果から NO_RECEIPT にした注文は、発行成功時に処理対象へ戻す"""
+    for _ in range(2):
+        db.record_shop_result("111111", OrderStatus.NO_RECEIPT.value, definitive=True)
+    db.update_order("111111-20240101-0", OrderStatus.NO_RECEIPT.value)  # 実際に確認した注文
+    db.flush()
+    db.classify_orders(["111111-20240101-1"])
+    db.flush()
+    assert db.get_order_status("111111-20240101-1") == OrderStatus.NO_RECEIPT.value
+
+    db.record_shop_result("111111", OrderStatus.DONE.value)
+    db.flush()
+
+    assert db.get_order_status("111111-20240101-1") == OrderStatus.PENDING.value
+    assert db.get_order_status("111111-20240101-0") == OrderStatus.NO_RECEIPT.value
+    decision, _ = db.classify_orders(["111111-20240101-1"])["111111-20240101-1"]
+    assert decision == DBManager.DECISION_PROCESS
+
+
+def test_requeue_does_not_change_earlier_run_summary(db):
+    """処理対象に戻した注文は現在の実行で集計し、過去の実行の件数は変えない"""
+    db.start_run("r1")
+    db.update_order("777-20240101-0", OrderStatus.DONE.value)
+    db.update_order("777-20240101-1", OrderStatus.NO_RECEIPT.value, shop_skipped=True)
+    db.flush()
+
+    db.start_run("r2")
+    db.record_shop_result("777", OrderStatus.DONE.value)
+    db.flush()
+
+    assert db.get_summary(run_id="r1") == {
+        OrderStatus.DONE.value: 1,
+        OrderStatus.NO_RECEIPT.value: 1,
+    }
+    assert db.get_summary(run_id="r2") == {OrderStatus.PENDING.value: 1}
+
+
+def test_watermark_is_stored_per_account(db):
+    """巡回ウォーターマークをアカウント単位で上書き保存する"""
+    assert db.get_watermark("account_a") is None
+
+    db.set_watermark("account_a", "shop-20240101-001")
+    db.set_watermark("account_a", "shop-20240301-001")
+    db.set_watermark("account_b", "shop-20231201-001")
+
+    assert db.get_watermark("account_a") == "shop-20240301-001"
+    assert db.get_watermark("account_b") == "shop-20231201-001"
+
+
 def test_get_summary(db):
     """サマリーを取得する"""
     db.update_order("o1", OrderStatus.DONE.value)
@@ -73,6 +477,77 @@ def test_get_summary(db):
     assert summary.get(OrderStatus.NO_RECEIPT.value) == 1
 
 
+def test_run_summary_tracks_status_transitions(db):
+    """実行単位の件数テーブルがステータス遷移に追従する"""
+    db.update_order("old", OrderStatus.DONE.value)  # 実行開始前の更新は対象外
+
+    db.start_run("2025-01-01 00:00:00")
+    db.update_order("o1", OrderStatus.RETRY.value)
+    db.update_order("o1", OrderStatus.DONE.value)
+    db.update_order("o2", OrderStatus.NO_RECEIPT.value)
+    db.update_order("old", OrderStatus.RETRY.value)
+
+    assert db.get_summary(run_id="2025-01-01 00:00:00") == {
+        OrderStatus.DONE.value: 1,
+        OrderStatus.NO_RECEIPT.value: 1,
+        OrderStatus.RETRY.value: 1,
+    }
+
+
+def test_run_summary_counts_escalation(db):
+    """最大リトライ到達によるERROR切り替えも実行単位で集計する"""
+    for _ in range(DBManager.MAX_RETRY_COUNT):
+        db.update_order("r1", OrderStatus.RETRY.value, increment_retry=True)
+
+    db.start_run("run-2")
+    db.classify_orders(["r1"])
+
+    assert db.get_summary(run_id="run-2") == {OrderStatus.ERROR.value: 1}
+
+
+def test_reporting_queries_use_indexes(db):
+    """再処理対象・期間指定の抽出がインデックス検索になる"""
+    plan = " ".join(
+        str(row)
+        for row in db.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT order_id FROM orders "
+            "WHERE status IN ('RETRY', 'PENDING') AND retry_count < 3"
+        )
+    )
+    assert "idx_orders_status_retry" in plan
+
+    plan = " ".join(
+        str(row)
+        for row in db.conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM orders WHERE updated_at >= '2025-01-01'"
+        )
+    )
+    assert "idx_orders_updated_at" in plan
+
+
+def test_migrates_existing_database():
+    """既存DB（旧スキーマ）に不足カラムを追加する"""
+    import sqlite3
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, "test.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE orders (order_id TEXT PRIMARY KEY, order_number INTEGER,"
+            " status TEXT, error_message TEXT, retry_count INTEGER DEFAULT 0,"
+            " filename TEXT, downloaded_at TEXT, created_at TEXT, updated_at TEXT)"
+        )
+        conn.commit()
+        conn.close()
+
+        db = DBManager(db_path, write_behind=False)
+        db.start_run("run-1")
+        db.update_order("o1", OrderStatus.DONE.value)
+
+        assert db.get_summary(run_id="run-1") == {OrderStatus.DONE.value: 1}
+        db.close()
+
+
 def test_export_report(db):
     """レポートをエクスポートする"""
     with tempfile.TemporaryDirectory() as tmpdir:
@@ -0,0 +1,106 @@
+"""
+DownloadManagerのテスト
+"""
+
+import asyncio
+import pytest
+from unittest.mock import MagicMock, patch
+from app.utils.download_manager import DownloadManager
+
+
+@pytest.fixture
+def download_dir(tmp_path):
+    with patch("app.utils.download_manager.Config") as mock_config:
+        mock_config.DOWNLOAD_DIR = str(tmp_path)
+        mock_config.DOWNLOAD_WRITE_CONCURRENCY = 2
+        yield tmp_path
+
+
+def _download(page, suggested="receipt.pdf", delay=0, content=b"%PDF-1.4", log=None):
+    download = MagicMock()
+    download.page = page
+    download.suggested_filename = suggested
+
+    async def save_as(path):
+        if log is not None:
+            log.append("start")
+        await asyncio.sleep(delay)
+        with open(path, "wb") as f:
+            f.write(content)
+        if log is not None:
+            log.append("end")
+
+    download.save_as = save_as
+    return download
+
+
+@pytest.mark.asyncio
+async def test_download_is_named_after_active_order(download_dir):
+    """発行処理中のページのダウンロードは注文番号の名前で保存する"""
+    manager = DownloadManager()
+    page = MagicMock()
+
+    with DownloadManager.order(page, "order-1"):
+        manager.handle(_download(page))
+    assert DownloadManager.order_for(page) is None
+
+    await manager.close()
+
+    assert (download_dir / "receipt_order-1.pdf").read_bytes() == b"%PDF-1.4"
+    assert manager.metrics[0]["order_id"] == "order-1"
+    assert manager.metrics[0]["bytes"] == len(b"%PDF-1.4")
+    assert manager.metrics[0]["ok"] is True
+
+
+@pytest.mark.asyncio
+async def test_unrelated_downloads_do_not_collide(download_dir):
+    """注文に結び付かない同名のダウンロードは別名で保存する"""
+    manager = DownloadManager()
+    page = MagicMock()
+    (download_dir / "receipt.pdf").write_bytes(b"old")
+
+    manager.handle(_download(page, delay=0.01, content=b"a"))
+    manager.handle(_download(page, delay=0.01, content=b"b"))
+    await manager.close()
+
+    assert (download_dir / "receipt.pdf").read_bytes() == b"old"
+    assert sorted(p.name for p in download_dir.iterdir()) == [
+        "receipt.pdf",
+        "receipt_1.pdf",
+        "receipt_2.pdf",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_close_waits_for_pending_saves_with_write_cap(download_dir):
+    """close() は保存中のダウンロードを待ち、同時書き込み数は上限以下"""
+    manager = DownloadManager(max_concurrent_writes=1)
+    page = MagicMock()
+    log = []
+
+    for i in range(3):
+        manager.handle(_download(page, suggested=f"{i}.pdf", delay=0.01, log=log))
+    assert manager.pending == 3
+
+    await manager.close()
+
+    assert manager.pending == 0
+    assert log == ["start", "end"] * 3
+    assert len(list(download_dir.iterdir())) == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_save_is_recorded(download_dir):
+    """保存に失敗したダウンロードも集計に残す"""
+    manager = DownloadManager()
+    download = _download(MagicMock())
+
+    async def fail(path):
+        raise Exception("canceled")
+
+    download.save_as = fail
+    manager.handle(download)
+    await manager.close()
+
+    assert manager.metrics[0]["ok"] is False
+    assert manager.pending == 0
@@ -0,0 +1,70 @@
+"""
+IncrementalCrawlのテスト
+"""
+
+import os
+import tempfile
+import pytest
+from app.core.db_manager import DBManager
+from app.core.incremental_crawl import IncrementalCrawl
+
+DONE = (DBManager.DECISION_SKIP, "DONE")
+NEW = (DBManager.DECISION_PROCESS, None)
+
+
+@pytest.fixture
+def db():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DBManager(os.path.join(tmpdir, "test.db"))
+        yield db
+        db.close()
+
+
+def _page(decision, *order_ids):
+    return list(order_ids), {order_id: decision for order_id in order_ids}
+
+
+def test_stops_after_consecutive_settled_pages(db):
+    """処理済みページが指定数連続したら停止し、区間の最新注文を保存する"""
+    crawl = IncrementalCrawl(db, "account", stop_pages=2)
+
+    assert not crawl.record_page(*_page(NEW, "a-1", "a-2"))
+    assert not crawl.record_page(*_page(DONE, "a-3", "a-4"))
+    assert crawl.record_page(*_page(DONE, "a-5", "a-6"))
+
+    assert db.get_watermark("account") == "a-3"
+
+
+def test_unsettled_page_resets_streak(db):
+    """未処理の注文を含むページで連続カウントをリセットする"""
+    crawl = IncrementalCrawl(db, "account", stop_pages=2)
+
+    assert not crawl.record_page(*_page(DONE, "a-1"))
+    assert not crawl.record_page(*_page(NEW, "a-2"))
+    assert not crawl.record_page(*_page(DONE, "a-3"))
+    assert db.get_watermark("account") is None
+
+
+def test_stops_at_watermark_page(db):
+    """ウォーターマークを含む処理済みページで即座に停止する"""
+    db.set_watermark("account", "a-4")
+    crawl = IncrementalCrawl(db, "account", stop_pages=5)
+
+    assert not crawl.record_page(*_page(NEW, "b-1"))
+    assert crawl.record_page(*_page(DONE, "b-2", "a-4"))
+
+    assert db.get_watermark("account") == "b-2"
+
+
+def test_start_shard_resets_streak_and_keeps_newest_watermark(db):
+    """シャードごとに連続カウントをやり直し、ウォーターマークは最初の停止位置だけ保存する"""
+    crawl = IncrementalCrawl(db, "account", stop_pages=2)
+
+    assert not crawl.record_page(*_page(DONE, "b-1"))
+    assert crawl.record_page(*_page(DONE, "b-2"))
+
+    crawl.start_shard()
+    assert not crawl.record_page(*_page(DONE, "a-1"))
+    assert crawl.record_page(*_page(DONE, "a-2"))
+
+    assert db.get_watermark("account") == "b-1"
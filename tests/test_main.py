@@ -63,3 +63,63 @@ def test_cleanup_calls_db_close():
         app._cleanup()
 
         app.db_manager.close.assert_called_once()
+
+
+def test_parse_args_retry_only():
+    """--retry-only オプションを解析する"""
+    from app.main import parse_args
+
+    assert parse_args([]).retry_only is False
+    assert parse_args(["--retry-only"]).retry_only is True
+
+
+@pytest.mark.asyncio
+async def test_selector_report_skips_browser(capsys):
+    """--selector-report は統計を表示するだけでブラウザを起動しない"""
+    with patch("app.main.DBManager") as mock_db, patch(
+        "app.main.RakutenBotApp"
+    ) as mock_app:
+        mock_db.return_value.get_selector_stats.return_value = []
+
+        from app.main import main
+
+        await main(["--selector-report"])
+
+        mock_app.assert_not_called()
+        mock_db.return_value.close.assert_called_once()
+        assert "セレクタ統計" in capsys.readouterr().out
+
+
+@pytest.mark.asyncio
+async def test_retry_only_processes_pending_entries_without_crawling():
+    """再処理モードは DB の再処理対象だけをワーカーに渡す"""
+    with patch("app.main.Config") as mock_config, patch(
+        "app.main.BrowserManager"
+    ), patch("app.main.DBManager"), patch(
+        "app.main.ParallelOrderProcessor"
+    ) as mock_processor_cls:
+        mock_config.validate = MagicMock()
+        mock_config.PARALLEL_WORKERS = 1
+
+        from app.main import RakutenBotApp
+        from app.models.order_entry import OrderEntry
+
+        app = RakutenBotApp(retry_only=True)
+        app.db_manager.flush_async = AsyncMock()
+        located = OrderEntry("o1", detail_url="https://d/o1")
+        app.db_manager.get_pending_entries.return_value = [
+            located,
+            OrderEntry("o2"),
+            # Books は一覧ページから発行するため詳細URLだけでは開けない
+            OrderEntry("o3", detail_url="https://d/o3", is_books=True),
+        ]
+        processor = mock_processor_cls.return_value
+        processor.process_orders = AsyncMock()
+        page = MagicMock()
+
+        await app._run_retry_only(page)
+
+        app.db_manager.flush_async.assert_awaited_once()
+        mock_processor_cls.assert_called_once_with([page], app.db_manager)
+        processor.process_orders.assert_awaited_once_with([located])
+        processor.process_all.assert_not_called()
@@ -2,6 +2,7 @@
 OrderHandlerのテスト
 """
 
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, MagicMock
 from app.models.order_status import OrderStatus
@@ -50,6 +51,49 @@ async def test_standard_handler_returns_empty_for_invalid_id(mock_page):
     assert handler._parse_order_id_from_href(href) == ""
 
 
+@pytest.mark.asyncio
+async def test_extract_orders_single_evaluate(mock_page):
+    """一覧ページの注文を1回のevaluateで抽出し、重複除去とBooks判定を行う"""
+    from app.handlers import StandardOrderHandler
+
+    mock_page.url = "https://order.my.rakuten.co.jp/?page=1"
+    mock_page.evaluate = AsyncMock(
+        return_value={
+            "hrefs": [
+                "https://order.my.rakuten.co.jp/?order_number=285657-20251225-0036448401",
+                "https://order.my.rakuten.co.jp/detail/285657-20251225-0036448401",
+                "https://order.my.rakuten.co.jp/?order_number=213310-20251201-0001112223",
+                "https://order.my.rakuten.co.jp/?order_number=000031092",
+            ],
+            "booksIds": ["213310-20251201-0001112223", "order-list"],
+        }
+    )
+
+    handler = StandardOrderHandler(mock_page)
+    entries = await handler.extract_orders()
+
+    mock_page.evaluate.assert_called_once()
+    assert [e.order_id for e in entries] == [
+        "285657-20251225-0036448401",
+        "213310-20251201-0001112223",
+    ]
+    assert entries[0].is_books is False
+    assert entries[0].detail_url.endswith("order_number=285657-20251225-0036448401")
+    assert entries[1].is_books is True
+    assert entries[1].list_url == "https://order.my.rakuten.co.jp/?page=1"
+
+
+@pytest.mark.asyncio
+async def test_extract_order_ids_returns_empty_on_evaluate_error(mock_page):
+    """evaluate失敗時は空リストを返す"""
+    from app.handlers import BooksOrderHandler
+
+    mock_page.evaluate = AsyncMock(side_effect=Exception("Target closed"))
+
+    handler = BooksOrderHandler(mock_page)
+    assert await handler.extract_order_ids() == []
+
+
 @pytest.mark.asyncio
 async def test_standard_handler_returns_no_receipt_when_no_section(mock_page):
     """StandardHandler: 領収書セクションがない場合NO_RECEIPTを返す"""
@@ -94,87 +138,93 @@ async def test_books_handler_returns_no_receipt_when_no_link(mock_page):
 
 
 @pytest.mark.asyncio
-async def test_books_handler_issue_receipt_success(mock_page):
+async def test_books_handler_issue_receipt_success(mock_page, tmp_path):
     """BooksHandler: 領収書発行成功（新フロー）"""
-    import asyncio
+    from unittest.mock import patch
     from app.handlers import BooksOrderHandler
-    from app.models.order_status import OrderStatus
 
     handler = BooksOrderHandler(mock_page)
 
-    # 非同期戻り値用のヘルパー
-    async def async_return(value):
-        return value
+    # page.locator(...).first（wait_for / is_visible / click は awaitable）
+    element = AsyncMock()
+    element.is_visible = AsyncMock(return_value=True)
+    locator = MagicMock()
+    locator.first = element
+    mock_page.locator = MagicMock(return_value=locator)
+    mock_page.context.pages = [mock_page]
+
+    # 発行ボタンのクリックで開くポップアップ（PDF の URL）
+    response = MagicMock()
+    response.ok = True
+    response.body = AsyncMock(return_value=b"%PDF-1.4 receipt")
+    popup_page = AsyncMock()
+    popup_page.url = "https://example.com/receipt.pdf"
+    popup_page.request.get = AsyncMock(return_value=response)
 
-    # 1. 共通の要素モック
-    element_mock = MagicMock()
-    element_mock.is_visible = MagicMock(
-        side_effect=lambda *args, **kwargs: async_return(True)
-    )
-    element_mock.click = MagicMock(
-        side_effect=lambda *args, **kwargs: async_return(None)
-    )
+    popup_value = asyncio.get_running_loop().create_future()
+    popup_value.set_result(popup_page)
+    popup_info = MagicMock()
+    popup_info.value = popup_value
+    expect_popup = MagicMock()
+    expect_popup.__aenter__ = AsyncMock(return_value=popup_info)
+    expect_popup.__aexit__ = AsyncMock(return_value=None)
+    mock_page.expect_popup = MagicMock(return_value=expect_popup)
+
+    with patch("app.config.Config.DOWNLOAD_DIR", str(tmp_path)):
+        result = await handler.issue_receipt("222222-20250101-2222222222")
 
-    # page.locator(...).first
-    locator_mock = MagicMock()
-    locator_mock.first = element_mock
-    # mock_page.locator は AsyncMock なので、同期的に値を返す MagicMock に置き換える
-    mock_page.locator = MagicMock(return_value=locator_mock)
+    assert result.status == OrderStatus.DONE
+    assert result.filename == "receipt_222222-20250101-2222222222.pdf"
+    assert (tmp_path / result.filename).read_bytes() == b"%PDF-1.4 receipt"
+    element.click.assert_awaited()
+    popup_page.close.assert_awaited_once()
 
-    # expect_popup のモック
-    popup_page = MagicMock()
-    popup_page.url = "https://example.com/receipt.pdf"
-    popup_page.wait_for_load_state = MagicMock(
-        side_effect=lambda *args, **kwargs: async_return(None)
-    )
-    popup_page.close = MagicMock(side_effect=lambda *args, **kwargs: async_return(None))
 
-    # response
-    mock_response = MagicMock()
-    mock_response.ok = True
-    mock_response.body = MagicMock(
-        side_effect=lambda *args, **kwargs: async_return(b"%PDF-1.4...")
-    )
-    popup_page.request.get = MagicMock(
-        side_effect=lambda *args, **kwargs: async_return(mock_response)
-    )
+# ===== Deadline Tests =====
 
-    # wait_for_popup context manager - ここが重要
-    # valueプロパティが awaitable である必要がある
-    popup_info = MagicMock()
-    # async with ... as popup_info: await popup_info.value
-    # value を await すると page が返るようにする
-    future = asyncio.Future()
-    future.set_result(popup_page)
-    popup_info.value = future
-
-    mock_context = MagicMock()
-    mock_context.__aenter__ = MagicMock(
-        side_effect=lambda *args, **kwargs: async_return(popup_info)
-    )
-    mock_context.__aexit__ = MagicMock(
-        side_effect=lambda *args, **kwargs: async_return(None)
-    )
-    # mock_page.expect_popup も AsyncMock なので MagicMock に置き換える
-    mock_page.expect_popup = MagicMock(return_value=mock_context)
 
-    # wait_for_load_state
-    mock_page.wait_for_load_state = MagicMock(
-        side_effect=lambda *args, **kwargs: async_return(None)
-    )
+@pytest.mark.asyncio
+async def test_issue_with_deadline_returns_retry_with_stage():
+    """期限超過時は試行中に開いたページを閉じ、止まった段階を含む RETRY を返す"""
+    from app.handlers import BooksOrderHandler
 
-    # open のモック
-    from unittest.mock import mock_open, patch
+    page = MagicMock()
+    popup = MagicMock()
+    popup.is_closed.return_value = False
+    popup.close = AsyncMock()
+    page.context.pages = [page]
+    handler = BooksOrderHandler(page)
 
-    with patch("builtins.open", mock_open()), patch(
-        "os.path.join", return_value="receipt_222222-20250101-2222222222.pdf"
-    ), patch("app.config.Config.DOWNLOAD_DIR", "/tmp"):
+    async def stalled_issue(order_id):
+        handler.stage = "発行ボタン待機"
+        page.context.pages = [page, popup]
+        handler.page = popup
+        await asyncio.sleep(60)
 
-        # 実行
-        result = await handler.issue_receipt("222222-20250101-2222222222")
+    handler.issue_receipt = stalled_issue
+    result = await handler.issue_with_deadline("111111-20250101-1111111111", deadline=0.05)
+
+    assert result.status == OrderStatus.RETRY
+    assert "発行ボタン待機" in result.error_message
+    popup.close.assert_awaited_once()
+    assert handler.page is page
+
+
+@pytest.mark.asyncio
+async def test_issue_with_deadline_passes_through_result(mock_page):
+    """期限内に終われば issue_receipt の結果をそのまま返す"""
+    from app.handlers import StandardOrderHandler
+    from app.models.order_status import IssueResult
+
+    mock_page.context = MagicMock()
+    mock_page.context.pages = [mock_page]
+    handler = StandardOrderHandler(mock_page)
+    handler.issue_receipt = AsyncMock(return_value=IssueResult.success("receipt_x.pdf"))
+
+    result = await handler.issue_with_deadline("x", deadline=5)
 
     assert result.status == OrderStatus.DONE
-    assert "receipt_222222-20250101-2222222222.pdf" in result.filename
+    handler.issue_receipt.assert_awaited_once_with("x")
 
 
 # ===== Factory Tests =====
@@ -18,6 +18,7 @@ def mock_db():
     db = MagicMock()
     db.should_process.return_value = True
     db.get_order_status.return_value = None
+    db.classify_orders.side_effect = lambda ids: {i: ("process", None) for i in ids}
     return db
 
 
@@ -28,9 +29,7 @@ async def test_handles_no_orders(mock_page, mock_db):
 
     processor = OrderProcessor(mock_page, mock_db)
 
-    mock_locator = MagicMock()
-    mock_locator.count = AsyncMock(return_value=0)
-    mock_page.locator = MagicMock(return_value=mock_locator)
+    mock_page.evaluate = AsyncMock(return_value={"hrefs": [], "booksIds": []})
 
     processed, skipped, errors = await processor._process_current_page()
     assert processed == 0
@@ -76,3 +75,70 @@ async def test_go_to_next_page_no_button(mock_page, mock_db):
     mock_page.locator = MagicMock(return_value=mock_locator)
 
     assert await processor._go_to_next_page() is False
+
+
+@pytest.mark.asyncio
+async def test_retry_results_are_deferred_then_carried_over(mock_page, mock_db):
+    """RETRY はその場で待たずに後回しにし、解決しなければ次回に持ち越す"""
+    from app.core.order_processor import OrderProcessor
+    from app.models.order_entry import OrderEntry
+    from app.models.order_status import IssueResult
+
+    processor = OrderProcessor(mock_page, mock_db)
+    # ページ処理中に 1 回目の試行で RETRY になった状態
+    attempts = {"flaky": 1, "stuck": 1}
+
+    async def fake_process(entry):
+        attempts[entry.order_id] += 1
+        if entry.order_id == "flaky" and attempts["flaky"] == 2:
+            return IssueResult.success("receipt_flaky.pdf")
+        return IssueResult.retry("timeout")
+
+    processor._process_entry = fake_process
+    processor._deferred = [
+        (OrderEntry("flaky"), 1, IssueResult.retry("timeout")),
+        (OrderEntry("stuck"), 2, IssueResult.retry("timeout")),
+    ]
+
+    processed, skipped, errors = await processor._retry_deferred()
+
+    assert (processed, skipped, errors) == (1, 0, 1)
+    assert attempts == {"flaky": 2, "stuck": OrderProcessor.MAX_ORDER_RETRY}
+    calls = {c.args[0]: c for c in mock_db.update_order.call_args_list}
+    assert calls["flaky"].args[1] == "DONE"
+    assert calls["stuck"].args[1] == "RETRY"
+    assert calls["stuck"].kwargs["increment_retry"] is True
+
+
+@pytest.mark.asyncio
+async def test_retry_interrupted_by_stop_does_not_increment(mock_page, mock_db):
+    """終了要求で再試行しなかった注文は retry_count を加算せずに持ち越す"""
+    from app.core.order_processor import OrderProcessor
+    from app.models.order_entry import OrderEntry
+    from app.models.order_status import IssueResult
+
+    processor = OrderProcessor(mock_page, mock_db)
+    processor.should_stop = lambda: True
+    processor._process_entry = AsyncMock()
+    processor._deferred = [(OrderEntry("stuck"), 3, IssueResult.retry("timeout"))]
+
+    await processor._retry_deferred()
+
+    processor._process_entry.assert_not_called()
+    mock_db.update_order.assert_called_once()
+    call = mock_db.update_order.call_args
+    assert call.args[:2] == ("stuck", "RETRY")
+    assert call.kwargs["increment_retry"] is False
+    assert call.kwargs["order_number"] == 3
+
+
+def test_update_db_records_shop_result(mock_page, mock_db):
+    """発行結果をショップ単位でも記録する"""
+    from app.core.order_processor import OrderProcessor
+    from app.models.order_status import IssueResult
+
+    processor = OrderProcessor(mock_page, mock_db)
+
+    processor._update_db("285657-20251225-0036448401", IssueResult.no_receipt(), 1)
+
+    mock_db.record_shop_result.assert_called_once_with("285657", "NO_RECEIPT", False)
@@ -76,6 +76,103 @@ async def test_find_visible_element_not_found(mock_page):
     assert result is None
 
 
+def _delayed_locator(delay, visible=True):
+    """delay 秒後に可視になる（visible=False なら待機が失敗する）ロケーター"""
+    import asyncio
+
+    element = MagicMock()
+    state = {"visible": False}
+
+    async def wait_for(**kwargs):
+        await asyncio.sleep(delay)
+        if not visible:
+            raise Exception("Timeout")
+        state["visible"] = True
+
+    async def is_visible():
+        return state["visible"]
+
+    element.wait_for = wait_for
+    element.is_visible = is_visible
+    return MagicMock(first=element)
+
+
+@pytest.mark.asyncio
+async def test_find_first_visible_races_candidates(mock_page):
+    """find_first_visible: 全候補を同時に待機し、最初に出た要素とインデックスを返す"""
+    import time
+    from app.utils.page_utils import PageUtils
+
+    locators = {
+        "#slow": _delayed_locator(0.5),
+        "#missing": _delayed_locator(0.05, visible=False),
+        "#fast": _delayed_locator(0.05),
+    }
+    mock_page.locator = MagicMock(side_effect=locators.get)
+
+    started = time.monotonic()
+    element, index = await PageUtils.find_first_visible(
+        mock_page, ["#slow", "#missing", "#fast"], timeout=1000
+    )
+
+    assert index == 2
+    assert element is locators["#fast"].first
+    # 遅い候補の完了を待たない
+    assert time.monotonic() - started < 0.4
+
+
+@pytest.mark.asyncio
+async def test_race_visible_reports_only_checked_candidates(mock_page):
+    """_race_visible: 確認して可視でなかった候補だけを not_visible に入れる"""
+    from app.utils.page_utils import PageUtils
+
+    locators = {
+        "#slow": _delayed_locator(0.5),
+        "#missing": _delayed_locator(0.01, visible=False),
+        "#fast": _delayed_locator(0.05),
+        "#later": _delayed_locator(0.5),
+    }
+    mock_page.locator = MagicMock(side_effect=locators.get)
+
+    not_visible = []
+    _, index = await PageUtils._race_visible(
+        mock_page, ["#slow", "#missing", "#fast", "#later"], 1000, not_visible
+    )
+
+    assert index == 2
+    # 打ち切った #later（勝者より後ろ）は確認していないため含めない
+    assert sorted(not_visible) == [0, 1]
+
+
+@pytest.mark.asyncio
+async def test_find_first_visible_prefers_earlier_visible_candidate(mock_page):
+    """find_first_visible: 先頭側の候補も可視なら優先する"""
+    from app.utils.page_utils import PageUtils
+
+    first = MagicMock()
+    first.wait_for = AsyncMock()
+    first.is_visible = AsyncMock(return_value=True)
+    mock_page.locator = MagicMock(return_value=MagicMock(first=first))
+
+    element, index = await PageUtils.find_first_visible(mock_page, ["#a", "#b"])
+
+    assert index == 0
+    assert element is first
+
+
+@pytest.mark.asyncio
+async def test_find_first_visible_none(mock_page):
+    """find_first_visible: どれも見つからなければ (None, -1)"""
+    from app.utils.page_utils import PageUtils
+
+    mock_page.locator = MagicMock(
+        side_effect=lambda selector: _delayed_locator(0, visible=False)
+    )
+
+    assert await PageUtils.find_first_visible(mock_page, ["#a", "#b"]) == (None, -1)
+    assert await PageUtils.find_first_visible(mock_page, []) == (None, -1)
+
+
 @pytest.mark.asyncio
 async def test_safe_fill_success(mock_page):
     """safe_fill: 成功ケース"""
@@ -106,3 +203,30 @@ async def test_safe_fill_timeout(mock_page):
     result = await PageUtils.safe_fill(mock_page, "input#email", "test@example.com")
 
     assert result is False
+
+
+@pytest.mark.asyncio
+async def test_find_first_visible_records_call_site_stats(mock_page):
+    """find_first_visible: call_site 指定時は実績順に待機し、元のインデックスを返す"""
+    from app.utils.page_utils import PageUtils
+    from app.utils.selector_stats import SelectorStats
+
+    stats = SelectorStats()
+    stats.record("site", ["#a", "#b"], "#b", 10)
+    locators = {"#a": _delayed_locator(0, visible=False), "#b": _delayed_locator(0)}
+    mock_page.locator = MagicMock(side_effect=locators.get)
+
+    PageUtils.selector_stats = stats
+    try:
+        element, index = await PageUtils.find_first_visible(
+            mock_page, ["#a", "#b"], call_site="site"
+        )
+    finally:
+        PageUtils.selector_stats = None
+
+    assert index == 1
+    assert element is locators["#b"].first
+    # 実績のある #b を先に問い合わせる
+    assert mock_page.locator.call_args_list[0].args == ("#b",)
+    assert stats.order("site", ["#a", "#b"]) == ["#b", "#a"]
+    assert stats._stats["site"]["#b"]["hits"] == 2
@@ -0,0 +1,144 @@
+"""
+PaginationModelのテスト
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.core.pagination import PaginationModel
+
+LIST_URL = "https://order.my.rakuten.co.jp/purchase-history/order-list?year=2024&month=1"
+
+
+def _links(*numbers, param="page"):
+    return [
+        {"href": f"{LIST_URL}&{param}={n}", "text": str(n)} for n in numbers
+    ] + [{"href": "https://item.rakuten.co.jp/shop/2/", "text": "2"}]
+
+
+@pytest.fixture
+def mock_page():
+    page = MagicMock()
+    page.url = LIST_URL
+    page.goto = AsyncMock()
+    page.evaluate = AsyncMock(return_value=_links(1, 2, 3, 4))
+    locator = MagicMock()
+    locator.first.wait_for = AsyncMock()
+    page.locator = MagicMock(return_value=locator)
+    return page
+
+
+def test_detect_page_param_ignores_other_paths():
+    """一覧と同じパスのリンクだけからパラメータ名を推定する"""
+    links = _links(2, 3, param="p")
+
+    assert PaginationModel.detect_page_param(LIST_URL, links) == "p"
+    assert PaginationModel.detect_page_param(LIST_URL, links[-1:]) is None
+
+
+def test_url_for_replaces_page_param_and_keeps_filters():
+    """ページURLは日付フィルター等の既存パラメータを保持する"""
+    pagination = PaginationModel()
+    pagination.base_url = f"{LIST_URL}&page=1"
+    pagination.param = "page"
+
+    assert pagination.url_for(5) == f"{LIST_URL}&page=5"
+
+
+@pytest.mark.asyncio
+async def test_observe_learns_param_and_total(mock_page):
+    """1ページ目からパラメータ名と総ページ数を学習する"""
+    pagination = PaginationModel()
+
+    await pagination.observe(mock_page)
+
+    assert pagination.param == "page"
+    assert pagination.total_pages == 4
+    assert pagination.current_page == 1
+
+    # 学習済みかつ最終ページ手前なら再読み取りしない
+    await pagination.observe(mock_page)
+    assert mock_page.evaluate.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_goto_next_jumps_by_url_until_total(mock_page):
+    """学習後は goto で直接遷移し、総ページ数を超えたら終了する"""
+    pagination = PaginationModel()
+    await pagination.observe(mock_page)
+    pagination.current_page = 3
+
+    assert await pagination.goto_next(mock_page, "a.order")
+    mock_page.goto.assert_awaited_once_with(f"{LIST_URL}&page=4")
+    assert pagination.current_page == 4
+
+    assert not await pagination.goto_next(mock_page, "a.order")
+    assert mock_page.goto.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_observe_extends_total_on_last_known_page(mock_page):
+    """表示範囲の限られたページャーでも最終ページで総ページ数を更新する"""
+    pagination = PaginationModel()
+    await pagination.observe(mock_page)
+    pagination.current_page = 4
+    mock_page.evaluate.return_value = _links(3, 4, 5, 6, 7)
+
+    await pagination.observe(mock_page)
+
+    assert pagination.total_pages == 7
+
+
+@pytest.mark.asyncio
+async def test_goto_next_stops_on_empty_page(mock_page):
+    """遷移先に注文リンクがなければ終了する"""
+    pagination = PaginationModel()
+    pagination.base_url = LIST_URL
+    pagination.param = "page"
+    mock_page.locator.return_value.first.wait_for.side_effect = Exception("timeout")
+
+    assert not await pagination.goto_next(mock_page, "a.order")
+    assert pagination.current_page == 1
+
+
+@pytest.mark.asyncio
+async def test_goto_next_retries_navigation_error_within_total(mock_page):
+    """総ページ数の範囲内で遷移に失敗したら再試行し、それでも失敗なら None（ボタンで遷移）"""
+    pagination = PaginationModel()
+    await pagination.observe(mock_page)
+    mock_page.goto.side_effect = Exception("net::ERR_CONNECTION_RESET")
+
+    assert await pagination.goto_next(mock_page, "a.order") is None
+    # 2回試した後、現在のページに戻る
+    assert mock_page.goto.await_count == PaginationModel.ATTEMPTS + 1
+    assert pagination.current_page == 1
+
+
+@pytest.mark.asyncio
+async def test_goto_next_timeout_within_total_is_not_the_end(mock_page):
+    """総ページ数の範囲内で注文が表示されなくても最終ページとはしない"""
+    pagination = PaginationModel()
+    await pagination.observe(mock_page)
+    mock_page.locator.return_value.first.wait_for.side_effect = [
+        Exception("timeout"),
+        None,
+    ]
+
+    assert await pagination.goto_next(mock_page, "a.order") is True
+    assert pagination.current_page == 2
+
+    mock_page.locator.return_value.first.wait_for.side_effect = Exception("timeout")
+    assert await pagination.goto_next(mock_page, "a.order") is None
+    assert pagination.current_page == 2
+
+
+def test_moved_to_follows_button_navigation():
+    """ボタンで遷移したページ番号を URL から記録する"""
+    pagination = PaginationModel()
+    pagination.base_url = LIST_URL
+    pagination.param = "page"
+
+    pagination.moved_to(f"{LIST_URL}&page=3")
+    assert pagination.current_page == 3
+
+    pagination.moved_to(LIST_URL)
+    assert pagination.current_page == 4
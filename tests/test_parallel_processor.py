@@ -3,7 +3,7 @@ ParallelOrderProcessorのテスト
 """
 
 import pytest
-from unittest.mock import AsyncMock, MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 
 @pytest.fixture
@@ -11,6 +11,7 @@ def mock_db():
     db = MagicMock()
     db.should_process.return_value = True
     db.get_order_status.return_value = None
+    db.classify_orders.side_effect = lambda ids: {i: ("process", None) for i in ids}
     return db
 
 
@@ -21,6 +22,7 @@ def mock_pages():
     for _ in range(3):
         page = AsyncMock()
         page.url = "https://order.my.rakuten.co.jp/"
+        page.locator = MagicMock()
         pages.append(page)
     return pages
 
@@ -115,3 +117,253 @@ async def test_navigate_to_detail_not_found(mock_pages, mock_db):
     result = await processor._navigate_to_detail(mock_pages[0], "12345")
 
     assert result is False
+
+
+@pytest.mark.asyncio
+async def test_pipeline_distributes_orders_across_workers(mock_pages, mock_db):
+    """ディスカバリが投入した注文を全ワーカーで1回ずつ処理する"""
+    from app.core.parallel_processor import ParallelOrderProcessor
+    from app.models.order_entry import OrderEntry
+    from app.models.order_status import OrderStatus
+
+    entries = [OrderEntry(f"order-{i}", list_url="https://list/") for i in range(12)]
+    discovery_page = AsyncMock()
+    discovery_page.locator = MagicMock()
+
+    processor = ParallelOrderProcessor(mock_pages, mock_db, discovery_page=discovery_page)
+    processor._go_to_next_page = AsyncMock(return_value=False)
+
+    handled = []
+
+    async def fake_process(worker_id, page, entry):
+        handled.append((worker_id, entry.order_id))
+        return OrderStatus.DONE
+
+    processor._process_entry = fake_process
+
+    with patch(
+        "app.core.parallel_processor.StandardOrderHandler.extract_orders",
+        AsyncMock(return_value=entries),
+    ), patch("app.core.parallel_processor.asyncio.sleep", AsyncMock()):
+        await processor.process_all()
+
+    assert sorted(order_id for _, order_id in handled) == sorted(
+        e.order_id for e in entries
+    )
+    assert len({worker_id for worker_id, _ in handled}) > 1
+
+
+@pytest.mark.asyncio
+async def test_pipeline_skips_orders_classified_as_done(mock_pages, mock_db):
+    """DB判定でスキップした注文はキューに投入しない"""
+    from app.core.parallel_processor import ParallelOrderProcessor
+    from app.models.order_entry import OrderEntry
+
+    entries = [OrderEntry("done-order"), OrderEntry("new-order")]
+    mock_db.classify_orders.side_effect = lambda ids: {
+        "done-order": ("skip", "DONE"),
+        "new-order": ("process", None),
+    }
+
+    processor = ParallelOrderProcessor(mock_pages, mock_db)
+    processor._go_to_next_page = AsyncMock(return_value=False)
+    processor._process_entry = AsyncMock(return_value=None)
+
+    with patch(
+        "app.core.parallel_processor.StandardOrderHandler.extract_orders",
+        AsyncMock(return_value=entries),
+    ), patch("app.core.parallel_processor.asyncio.sleep", AsyncMock()):
+        await processor.process_all()
+
+    processor._process_entry.assert_called_once()
+    assert processor._process_entry.call_args.args[2].order_id == "new-order"
+
+
+@pytest.mark.asyncio
+async def test_discovery_walks_each_month_shard_from_its_own_url(mock_pages, mock_db):
+    """期間シャードごとに専用URLから巡回し、期間外の注文は投入しない"""
+    from app.config import Config
+    from app.core.date_shards import DateShard
+    from app.core.parallel_processor import ParallelOrderProcessor
+    from app.models.order_entry import OrderEntry
+
+    entries = [
+        OrderEntry("shop-20240215-001"),
+        OrderEntry("shop-20240110-001"),
+        OrderEntry("shop-20231230-001"),
+    ]
+    shards = DateShard.build("2024-01", "2024-02")
+    discovery_page = AsyncMock()
+    discovery_page.locator = MagicMock()
+
+    processor = ParallelOrderProcessor(mock_pages, mock_db, discovery_page=discovery_page)
+    processor._go_to_next_page = AsyncMock(return_value=True)
+    handled = []
+
+    async def fake_process(worker_id, page, entry):
+        handled.append(entry.order_id)
+        return None
+
+    processor._process_entry = fake_process
+
+    with patch(
+        "app.core.parallel_processor.StandardOrderHandler.extract_orders",
+        AsyncMock(return_value=entries),
+    ), patch(
+        "app.core.parallel_processor.DateShard.from_config", return_value=shards
+    ), patch("app.core.parallel_processor.asyncio.sleep", AsyncMock()):
+        await processor.process_all()
+
+    urls = [call.args[0] for call in discovery_page.goto.call_args_list]
+    assert urls == [
+        f"{Config.PURCHASE_HISTORY_URL}?year=2024&month=02",
+        f"{Config.PURCHASE_HISTORY_URL}?year=2024&month=01",
+    ]
+    # ページ末尾が開始日より古いため次ページへ進まない
+    processor._go_to_next_page.assert_not_called()
+    assert sorted(handled) == ["shop-20240110-001", "shop-20240215-001"]
+
+
+@pytest.mark.asyncio
+async def test_discovery_applies_incremental_stop_per_shard(mock_pages, mock_db):
+    """処理済み区間に到達してもそのシャードだけを打ち切り、古いシャードも巡回する"""
+    from app.config import Config
+    from app.core.date_shards import DateShard
+    from app.core.parallel_processor import ParallelOrderProcessor
+    from app.models.order_entry import OrderEntry
+
+    entries = [OrderEntry("shop-20240215-001"), OrderEntry("shop-20240110-001")]
+    shards = DateShard.build("2024-01", "2024-02")
+    discovery_page = AsyncMock()
+    discovery_page.locator = MagicMock()
+    incremental = MagicMock()
+    incremental.record_page.return_value = True
+
+    processor = ParallelOrderProcessor(mock_pages, mock_db, discovery_page=discovery_page)
+    processor._go_to_next_page = AsyncMock(return_value=True)
+    processor._process_entry = AsyncMock(return_value=None)
+
+    with patch(
+        "app.core.parallel_processor.StandardOrderHandler.extract_orders",
+        AsyncMock(return_value=entries),
+    ), patch(
+        "app.core.parallel_processor.DateShard.from_config", return_value=shards
+    ), patch(
+        "app.core.parallel_processor.IncrementalCrawl.from_config", return_value=incremental
+    ), patch("app.core.parallel_processor.asyncio.sleep", AsyncMock()):
+        await processor.process_all()
+
+    urls = [call.args[0] for call in discovery_page.goto.call_args_list]
+    assert urls == [
+        f"{Config.PURCHASE_HISTORY_URL}?year=2024&month=02",
+        f"{Config.PURCHASE_HISTORY_URL}?year=2024&month=01",
+    ]
+    assert incremental.start_shard.call_count == 2
+    processor._go_to_next_page.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_open_detail_goes_to_recorded_detail_url(mock_pages, mock_db):
+    """詳細URLがあれば一覧を経由せず直接遷移する"""
+    from app.core.parallel_processor import ParallelOrderProcessor
+    from app.handlers import StandardOrderHandler
+    from app.models.order_entry import OrderEntry
+
+    processor = ParallelOrderProcessor(mock_pages, mock_db)
+    page = mock_pages[0]
+    entry = OrderEntry(
+        "order-1",
+        detail_url="https://order.my.rakuten.co.jp/?order_number=order-1",
+        list_url="https://order.my.rakuten.co.jp/?page=2",
+    )
+
+    with patch(
+        "app.core.parallel_processor.PageReady.wait", new=AsyncMock(return_value=True)
+    ) as ready:
+        assert await processor._open_detail(page, entry)
+
+    page.goto.assert_awaited_once_with(entry.detail_url)
+    # 逐次処理と同じく領収書セクションの表示で完了とする
+    ready.assert_awaited_once_with(
+        page, "詳細ページ表示", StandardOrderHandler.RECEIPT_SECTION_SELECTORS
+    )
+
+
+@pytest.mark.asyncio
+async def test_process_orders_runs_given_entries_without_discovery(mock_pages, mock_db):
+    """指定した注文を一覧の巡回なしで全ワーカーに分配する"""
+    from app.core.parallel_processor import ParallelOrderProcessor
+    from app.models.order_entry import OrderEntry
+
+    entries = [OrderEntry(f"order-{i}", detail_url=f"https://d/{i}") for i in range(6)]
+    processor = ParallelOrderProcessor(mock_pages, mock_db)
+    processor._discovery_loop = AsyncMock()
+    handled = []
+
+    async def fake_process(worker_id, page, entry):
+        handled.append(entry.order_id)
+        return None
+
+    processor._process_entry = fake_process
+
+    await processor.process_orders(entries)
+
+    processor._discovery_loop.assert_not_called()
+    assert sorted(handled) == sorted(e.order_id for e in entries)
+
+
+@pytest.mark.asyncio
+async def test_retry_is_deferred_until_queue_drains(mock_pages, mock_db):
+    """RETRY の注文は後回しにし、他の注文を処理した後に再試行する"""
+    from app.core.parallel_processor import ParallelOrderProcessor
+    from app.models.order_entry import OrderEntry
+    from app.models.order_status import IssueResult, OrderStatus
+
+    entries = [OrderEntry("flaky"), OrderEntry("ok-1"), OrderEntry("ok-2")]
+    processor = ParallelOrderProcessor(mock_pages[:1], mock_db)
+    handled = []
+
+    async def fake_process(worker_id, page, entry):
+        handled.append(entry.order_id)
+        if entry.order_id == "flaky" and handled.count("flaky") == 1:
+            processor._deferred.append((entry, IssueResult.retry("timeout")))
+            return OrderStatus.RETRY
+        return OrderStatus.DONE
+
+    processor._process_entry = fake_process
+
+    await processor.process_orders(entries)
+
+    assert handled == ["flaky", "ok-1", "ok-2", "flaky"]
+    mock_db.update_order.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_retry_interrupted_by_stop_is_carried_without_increment(mock_pages, mock_db):
+    """終了要求で再試行しなかった注文は表示順付きで、retry_count を加算せずに持ち越す"""
+    from app.core.parallel_processor import ParallelOrderProcessor
+    from app.models.order_entry import OrderEntry
+    from app.models.order_status import IssueResult
+
+    processor = ParallelOrderProcessor(mock_pages[:1], mock_db)
+    processor._process_entry = AsyncMock()
+    stop = {"requested": False}
+    processor.should_stop = lambda: stop["requested"]
+
+    async def fake_run_entries(entries):
+        # ワーカーが取り出す前に終了要求
+        stop["requested"] = True
+        return []
+
+    processor._run_entries = fake_run_entries
+    processor._deferred = [
+        (OrderEntry("stuck", order_number=4), IssueResult.retry("timeout"))
+    ]
+
+    await processor._retry_deferred()
+
+    mock_db.update_order.assert_called_once()
+    call = mock_db.update_order.call_args
+    assert call.args[:2] == ("stuck", "RETRY")
+    assert call.kwargs["increment_retry"] is False
+    assert call.kwargs["order_number"] == 4
@@ -20,7 +20,7 @@ def mock_page():
 
 
 @pytest.mark.asyncio
-async def test_download_from_page_success(mock_page):
+async def test_download_from_page_success(mock_page, tmp_path):
     """ページからPDFダウンロード成功"""
     from app.utils.pdf_downloader import PdfDownloader
 
@@ -41,15 +41,36 @@ async def test_download_from_page_success(mock_page):
     downloader = PdfDownloader(mock_page)
 
     with patch("app.utils.pdf_downloader.Config") as mock_config:
-        mock_config.DOWNLOAD_DIR = "/tmp"
-
-        with patch("builtins.open", MagicMock()):
-            result = await downloader._download_from_page(new_page, "test-order-123")
+        mock_config.DOWNLOAD_DIR = str(tmp_path)
+        result = await downloader._download_from_page(new_page, "test-order-123")
 
     assert result == "receipt_test-order-123.pdf"
+    assert (tmp_path / result).read_bytes() == b"%PDF-1.4 test content"
+    assert [p.name for p in tmp_path.iterdir()] == [result]  # 一時ファイルは残らない
     new_page.close.assert_called_once()
 
 
+@pytest.mark.asyncio
+async def test_download_from_page_rejects_non_pdf(mock_page, tmp_path):
+    """PDF でない応答（エラーページ等）は保存しない"""
+    from app.utils.pdf_downloader import PdfDownloader
+
+    new_page = AsyncMock()
+    new_page.url = "https://example.com/receipt.pdf"
+    mock_response = AsyncMock()
+    mock_response.ok = True
+    mock_response.body = AsyncMock(return_value=b"<html>error</html>")
+    new_page.context = MagicMock()
+    new_page.context.request.get = AsyncMock(return_value=mock_response)
+
+    with patch("app.utils.pdf_downloader.Config") as mock_config:
+        mock_config.DOWNLOAD_DIR = str(tmp_path)
+        result = await PdfDownloader(mock_page)._download_from_page(new_page, "x")
+
+    assert result == ""
+    assert list(tmp_path.iterdir()) == []
+
+
 @pytest.mark.asyncio
 async def test_download_from_new_tab_no_new_tab(mock_page):
     """新しいタブが開かない場合"""
@@ -0,0 +1,142 @@
+"""
+Readinessのテスト
+"""
+
+import asyncio
+import time
+import pytest
+from unittest.mock import MagicMock, patch
+from app.utils.readiness import Readiness, ReadyCondition, PageReady
+
+
+@pytest.fixture(autouse=True)
+def reset_steps():
+    Readiness.reset()
+    yield
+    Readiness.reset()
+
+
+def _after(delay, fail=False):
+    """delay 秒後に成立（fail=True なら失敗）する条件"""
+
+    async def wait(timeout):
+        await asyncio.sleep(delay)
+        if fail:
+            raise Exception("Timeout")
+
+    return ReadyCondition(f"after-{delay}", wait)
+
+
+@pytest.mark.asyncio
+async def test_wait_resumes_when_first_condition_is_met():
+    """いずれかの条件が成立した時点で再開する"""
+    started = time.monotonic()
+    ready = await Readiness.wait("step", [_after(1.0), _after(0.01)], legacy_sleep=2)
+
+    assert ready is True
+    assert time.monotonic() - started < 0.5
+    summary = Readiness.summary()["step"]
+    assert summary["count"] == 1
+    assert summary["ready"] == 1
+    assert summary["legacy_ms"] == 2000
+    assert summary["actual_ms"] < 500
+
+
+@pytest.mark.asyncio
+async def test_wait_is_capped_by_legacy_sleep():
+    """条件が成立しなくても従来のスリープ時間で打ち切る"""
+    started = time.monotonic()
+    ready = await Readiness.wait("step", [_after(5)], legacy_sleep=0.1)
+
+    assert ready is False
+    assert time.monotonic() - started < 1
+    assert Readiness.summary()["step"]["ready"] == 0
+
+
+@pytest.mark.asyncio
+async def test_wait_returns_when_all_conditions_fail():
+    """全条件が失敗したら待たずに戻る"""
+    page = MagicMock()  # 待機メソッドが awaitable でないページ
+    started = time.monotonic()
+    ready = await Readiness.wait(
+        "step",
+        [_after(0, fail=True), ReadyCondition.selector(page, "#list")],
+        legacy_sleep=2,
+    )
+
+    assert ready is False
+    assert time.monotonic() - started < 0.5
+
+
+@pytest.mark.asyncio
+async def test_url_assigned_waits_for_non_blank_url():
+    """新しいタブの URL が about:blank から変わるのを wait_for_url の述語で待つ"""
+    page = MagicMock()
+
+    async def wait_for_url(predicate, timeout, wait_until):
+        assert not predicate("about:blank")
+        assert predicate("https://books.rakuten.co.jp/receipt")
+
+    page.wait_for_url = wait_for_url
+
+    assert await Readiness.wait("tab", [ReadyCondition.url_assigned(page)], 30)
+
+
+@pytest.mark.asyncio
+async def test_summary_accumulates_per_step():
+    """ステップごとに回数を集計する"""
+    await Readiness.wait("a", [_after(0)], legacy_sleep=1)
+    await Readiness.wait("a", [_after(0)], legacy_sleep=1)
+    await Readiness.wait("b", [_after(0)], legacy_sleep=3)
+
+    summary = Readiness.summary()
+    assert summary["a"]["count"] == 2
+    assert summary["a"]["legacy_ms"] == 2000
+    assert summary["b"]["legacy_ms"] == 3000
+
+
+def _page(selector_delay=None):
+    """networkidle にならない（常駐通信のある）ページ。selector_delay 秒後に要素が attached"""
+    page = MagicMock()
+
+    async def wait_for(**kwargs):
+        if selector_delay is None:
+            await asyncio.sleep(60)
+        await asyncio.sleep(selector_delay)
+
+    async def wait_for_load_state(state, timeout=None):
+        await asyncio.sleep(timeout / 1000)
+        raise Exception("Timeout")
+
+    page.locator.return_value.first.wait_for = wait_for
+    page.wait_for_load_state = wait_for_load_state
+    return page
+
+
+@pytest.mark.asyncio
+async def test_page_ready_resumes_on_predicate_without_networkidle():
+    """表示完了条件が成立すれば networkidle を待たない"""
+    page = _page(selector_delay=0.01)
+    started = time.monotonic()
+
+    with patch("app.utils.readiness.Config") as mock_config:
+        mock_config.NETWORKIDLE_FALLBACK_MS = 5000
+        ready = await PageReady.wait(page, "一覧", ["#list a"], settle=2)
+
+    assert ready is True
+    assert time.monotonic() - started < 0.5
+    page.locator.assert_called_with("#list a")
+
+
+@pytest.mark.asyncio
+async def test_page_ready_falls_back_to_capped_networkidle():
+    """条件が成立しなければ上限付きの networkidle（+ settle）で進む"""
+    page = _page()
+    started = time.monotonic()
+
+    with patch("app.utils.readiness.Config") as mock_config:
+        mock_config.NETWORKIDLE_FALLBACK_MS = 100
+        ready = await PageReady.wait(page, "一覧", ["#list a"], settle=0.05)
+
+    assert ready is False
+    assert 0.1 <= time.monotonic() - started < 1
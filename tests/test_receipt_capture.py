@@ -0,0 +1,114 @@
+"""
+ReceiptCaptureのテスト
+"""
+
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.utils.receipt_capture import ReceiptCapture
+
+
+class FakeEmitter:
+    """on / remove_listener / emit だけを持つイベント発行元"""
+
+    def __init__(self):
+        self.listeners = {}
+
+    def on(self, event, handler):
+        self.listeners.setdefault(event, []).append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners[event].remove(handler)
+
+    def emit(self, event, payload):
+        for handler in list(self.listeners.get(event, [])):
+            handler(payload)
+
+
+def _page():
+    page = FakeEmitter()
+    page.context = FakeEmitter()
+    page.is_closed = MagicMock(return_value=False)
+    page.close = AsyncMock()
+    return page
+
+
+@pytest.fixture
+def download_dir(tmp_path):
+    with patch("app.utils.receipt_capture.Config") as mock_config:
+        mock_config.DOWNLOAD_DIR = str(tmp_path)
+        yield tmp_path
+
+
+def _download():
+    download = MagicMock()
+
+    async def save_as(path):
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.4 download")
+
+    download.save_as = save_as
+    return download
+
+
+@pytest.mark.asyncio
+async def test_saves_download_under_order_id(download_dir):
+    """ダウンロードを注文番号のファイル名で保存し、保存後に成功とする"""
+    page = _page()
+
+    async with ReceiptCapture(page, "order-1") as capture:
+        assert ReceiptCapture.is_active(page)
+        page.emit("download", _download())
+        filename = await capture.wait(timeout=1000)
+
+    assert filename == "receipt_order-1.pdf"
+    assert (download_dir / filename).read_bytes() == b"%PDF-1.4 download"
+    assert not ReceiptCapture.is_active(page)
+    assert page.listeners["download"] == []
+
+
+@pytest.mark.asyncio
+async def test_saves_pdf_response_and_closes_opened_tab(download_dir):
+    """新しいタブの PDF レスポンスを保存し、タブを閉じる"""
+    page = _page()
+    tab = _page()
+    html = MagicMock(headers={"content-type": "text/html"})
+    pdf = MagicMock(headers={"content-type": "application/pdf"})
+    pdf.body = AsyncMock(return_value=b"%PDF-1.4 response")
+
+    async with ReceiptCapture(page, "order-2") as capture:
+        page.context.emit("page", tab)
+        page.context.emit("response", html)
+        page.context.emit("response", pdf)
+        filename = await capture.wait(timeout=1000)
+
+    assert filename == "receipt_order-2.pdf"
+    assert (download_dir / filename).read_bytes() == b"%PDF-1.4 response"
+    tab.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_download_when_response_body_unavailable(download_dir):
+    """本文の取れないレスポンスの後に届いたダウンロードで保存する"""
+    page = _page()
+    pdf = MagicMock(headers={"content-type": "application/pdf"})
+    pdf.body = AsyncMock(side_effect=Exception("Response body is unavailable"))
+
+    async with ReceiptCapture(page, "order-3") as capture:
+        page.context.emit("response", pdf)
+        page.emit("download", _download())
+        filename = await capture.wait(timeout=1000)
+
+    assert filename == "receipt_order-3.pdf"
+
+
+@pytest.mark.asyncio
+async def test_returns_empty_when_nothing_arrives(download_dir):
+    """PDF が届かなければ空文字列（ファイルは作らない）"""
+    page = _page()
+
+    async with ReceiptCapture(page, "order-4") as capture:
+        filename = await capture.wait(timeout=50)
+
+    assert filename == ""
+    assert not os.listdir(download_dir)
@@ -0,0 +1,48 @@
+"""
+ReceiptWriterのテスト
+"""
+
+import pytest
+from unittest.mock import MagicMock
+from app.utils.receipt_writer import ReceiptWriter
+
+
+@pytest.mark.asyncio
+async def test_write_bytes_replaces_atomically(tmp_path):
+    """一時ファイル経由で置き換え、一時ファイルは残らない"""
+    path = tmp_path / "receipt_1.pdf"
+    path.write_bytes(b"%PDF-old")
+
+    assert await ReceiptWriter.write_bytes(b"%PDF-1.7 new", str(path)) is True
+
+    assert path.read_bytes() == b"%PDF-1.7 new"
+    assert [p.name for p in tmp_path.iterdir()] == ["receipt_1.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_write_bytes_rejects_non_pdf(tmp_path):
+    """PDF ヘッダのない内容は保存せず、既存のファイルも残す"""
+    path = tmp_path / "receipt_1.pdf"
+    path.write_bytes(b"%PDF-old")
+
+    assert await ReceiptWriter.write_bytes(b"<html>error</html>", str(path)) is False
+
+    assert path.read_bytes() == b"%PDF-old"
+    assert [p.name for p in tmp_path.iterdir()] == ["receipt_1.pdf"]
+
+
+@pytest.mark.asyncio
+async def test_save_download_failure_leaves_no_partial_file(tmp_path):
+    """ダウンロードが途中で失敗しても保存先にも一時ファイルも残らない"""
+    download = MagicMock()
+
+    async def save_as(path):
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.4 trunc")
+        raise Exception("download canceled")
+
+    download.save_as = save_as
+
+    path = tmp_path / "receipt_2.pdf"
+    assert await ReceiptWriter.save_download(download, str(path)) is False
+    assert list(tmp_path.iterdir()) == []
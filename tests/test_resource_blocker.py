@@ -0,0 +1,107 @@
+"""
+ResourceBlockerのテスト
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.core.resource_blocker import ResourceBlocker
+
+
+@pytest.fixture
+def blocker():
+    return ResourceBlocker(
+        blocked_types=["image", "font"],
+        blocked_hosts=["doubleclick.net"],
+    )
+
+
+def test_blocks_configured_resource_types(blocker):
+    """指定したリソース種別を遮断する"""
+    assert blocker.should_block("image", "https://order.my.rakuten.co.jp/a.png")
+    assert blocker.should_block("font", "https://r10s.jp/font.woff2")
+    assert not blocker.should_block("script", "https://order.my.rakuten.co.jp/a.js")
+
+
+def test_blocks_denied_hosts_including_subdomains(blocker):
+    """拒否ホスト（サブドメイン含む）を遮断する"""
+    assert blocker.should_block("script", "https://ad.doubleclick.net/x.js")
+    assert blocker.should_block("document", "https://doubleclick.net/frame")
+
+
+def test_never_blocks_documents_from_other_hosts(blocker):
+    """ドキュメント（PDF・ポップアップ）は遮断しない"""
+    assert not blocker.should_block("document", "https://books.rakuten.co.jp/r.pdf")
+
+
+def test_allow_list_blocks_third_party_subresources():
+    """許可リスト指定時は第三者ホストのサブリソースを遮断する"""
+    blocker = ResourceBlocker(allowed_hosts=["rakuten.co.jp"])
+
+    assert not blocker.should_block("script", "https://order.my.rakuten.co.jp/a.js")
+    assert blocker.should_block("script", "https://cdn.example.com/a.js")
+    assert not blocker.should_block("document", "https://cdn.example.com/")
+
+
+def test_ignores_non_http_urls(blocker):
+    """data: URL などは対象外"""
+    assert not blocker.should_block("image", "data:image/png;base64,AAAA")
+
+
+@pytest.mark.asyncio
+async def test_handle_route_counts_blocked_requests(blocker):
+    """遮断件数と推定削減量を記録する"""
+    blocked = MagicMock(abort=AsyncMock(), continue_=AsyncMock())
+    blocked.request.resource_type = "image"
+    blocked.request.url = "https://order.my.rakuten.co.jp/a.png"
+
+    allowed = MagicMock(abort=AsyncMock(), continue_=AsyncMock())
+    allowed.request.resource_type = "document"
+    allowed.request.url = "https://order.my.rakuten.co.jp/"
+
+    for route in (blocked, allowed):
+        blocker._count_request(route.request)
+        await blocker.handle_route(route)
+
+    blocked.abort.assert_called_once()
+    allowed.continue_.assert_called_once()
+    assert blocker.total_requests == 2
+    assert blocker.blocked_requests == 1
+    assert blocker.estimated_bytes_saved == ResourceBlocker.ESTIMATED_BYTES["image"]
+    assert "推定" in blocker.summary()
+
+
+@pytest.mark.asyncio
+async def test_attach_routes_only_blockable_urls(blocker):
+    """全要求ではなく遮断対象になりうる URL だけをルーティングする（HTTPキャッシュを使うため）"""
+    context = MagicMock(route=AsyncMock())
+
+    await blocker.attach(context)
+
+    context.on.assert_called_once_with("request", blocker._count_request)
+    patterns = [call.args[0] for call in context.route.await_args_list]
+    assert "**/*" not in patterns
+
+    def routed(url):
+        return any(pattern.search(url) for pattern in patterns)
+
+    assert routed("https://ad.doubleclick.net/x.js")
+    assert routed("https://r10s.jp/img/a.PNG?v=1")
+    assert routed("https://r10s.jp/font.woff2")
+    assert not routed("https://order.my.rakuten.co.jp/")
+    assert not routed("https://order.my.rakuten.co.jp/a.js")
+    assert not routed("https://notdoubleclick.net/x.js")
+
+
+def test_allow_list_routes_other_hosts():
+    """許可リスト指定時は許可リスト外のホストだけをルーティングする"""
+    blocker = ResourceBlocker(allowed_hosts=["rakuten.co.jp"])
+    (pattern,) = blocker.route_patterns()
+
+    assert pattern.search("https://cdn.example.com/a.js")
+    assert not pattern.search("https://order.my.rakuten.co.jp/a.js")
+    assert not pattern.search("https://rakuten.co.jp:443/")
+
+
+def test_types_without_extensions_route_all_requests():
+    """URL で判別できない種別を遮断する場合は全要求を判定する"""
+    assert ResourceBlocker(blocked_types=["xhr"]).route_patterns() == ["**/*"]
@@ -0,0 +1,89 @@
+"""
+SelectorStatsのテスト
+"""
+
+import os
+import tempfile
+import pytest
+from app.core.db_manager import DBManager
+from app.utils.selector_stats import SelectorStats
+
+
+@pytest.fixture
+def db():
+    """テスト用DBを作成"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DBManager(os.path.join(tmpdir, "test.db"))
+        yield db
+        db.close()
+
+
+def test_order_keeps_original_order_without_stats():
+    """実績がなければ元の順序のまま"""
+    stats = SelectorStats()
+    assert stats.order("site", ["#a", "#b", "#c"]) == ["#a", "#b", "#c"]
+
+
+def test_order_moves_winning_selector_first():
+    """ヒット数の多いセレクタを先頭に並べ替える"""
+    stats = SelectorStats()
+    stats.record("site", ["#a", "#b", "#c"], "#c", 120)
+    stats.record("site", ["#a", "#b", "#c"], "#c", 80)
+    stats.record("site", ["#a", "#b", "#c"], "#b", 50)
+
+    assert stats.order("site", ["#a", "#b", "#c"]) == ["#c", "#b", "#a"]
+    # 別の呼び出し箇所には影響しない
+    assert stats.order("other", ["#a", "#b", "#c"]) == ["#a", "#b", "#c"]
+
+
+def test_save_accumulates_in_db(db):
+    """保存した増分は DB 上で加算され、次回の並び順に反映される"""
+    stats = SelectorStats(db)
+    stats.record("site", ["#a", "#b"], "#b", 100)
+    stats.save()
+    stats.record("site", ["#a", "#b"], None, 2000)
+    stats.save()
+
+    rows = {row["selector"]: row for row in db.get_selector_stats()}
+    assert rows["#b"]["hits"] == 1
+    assert rows["#b"]["misses"] == 1
+    assert rows["#b"]["total_ms"] == 100
+    assert rows["#a"]["hits"] == 0
+    # 1 回目は可視かどうか確認していないため、見つからなかった 2 回目だけを数える
+    assert rows["#a"]["misses"] == 1
+
+    assert SelectorStats(db).order("site", ["#a", "#b"]) == ["#b", "#a"]
+
+
+def test_visible_but_not_chosen_selector_is_not_a_miss(db):
+    """勝者以外でも、確認して可視でなかった候補だけをミスとして数える"""
+    stats = SelectorStats(db)
+    for _ in range(SelectorStats.DEAD_MIN_ATTEMPTS):
+        stats.record("site", ["#a", "#b", "#c"], "#b", 50, not_visible=["#a"])
+
+    stats.save()
+
+    rows = db.get_selector_stats()
+    misses = {row["selector"]: row["misses"] for row in rows}
+    assert misses["#a"] == SelectorStats.DEAD_MIN_ATTEMPTS
+    assert "#c" not in misses
+    assert [row["selector"] for row in SelectorStats.dead_selectors(rows)] == ["#a"]
+
+
+def test_report_lists_dead_selectors():
+    """ヒットなしで規定回数以上試したセレクタを不要として表示する"""
+    rows = [
+        {"call_site": "site", "selector": "#live", "hits": 30, "misses": 0,
+         "total_ms": 3000.0, "last_hit_at": None},
+        {"call_site": "site", "selector": "#dead", "hits": 0, "misses": 30,
+         "total_ms": 0.0, "last_hit_at": None},
+        {"call_site": "site", "selector": "#new", "hits": 0, "misses": 3,
+         "total_ms": 0.0, "last_hit_at": None},
+    ]
+
+    dead = SelectorStats.dead_selectors(rows, min_attempts=20)
+    assert [row["selector"] for row in dead] == ["#dead"]
+
+    report = SelectorStats.format_report(rows, min_attempts=20)
+    assert "不要なセレクタ（ヒットなし）: 1 件" in report
+    assert "[site] #dead" in report
@@ -0,0 +1,73 @@
+"""
+SessionStoreのテスト
+"""
+
+import hashlib
+import os
+import tempfile
+import pytest
+from unittest.mock import patch
+from app.core.session_store import SessionStore
+
+
+@pytest.fixture
+def session_dir():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+STATE = {"cookies": [{"name": "Rz", "value": "secret-cookie"}], "origins": []}
+
+
+def test_save_and_load_roundtrip(session_dir):
+    """保存した storage state を復元できる"""
+    store = SessionStore("account", "password", session_dir)
+    store.save(STATE)
+
+    assert store.load() == STATE
+
+
+def test_saved_file_is_encrypted(session_dir):
+    """保存ファイルに平文の Cookie が含まれない"""
+    store = SessionStore("account", "password", session_dir)
+    store.save(STATE)
+
+    with open(store.path, "rb") as f:
+        assert b"secret-cookie" not in f.read()
+
+
+def test_load_returns_none_when_missing(session_dir):
+    """ファイルがない場合はNone"""
+    store = SessionStore("account", "password", session_dir)
+    assert store.load() is None
+
+
+def test_load_with_wrong_secret_discards_file(session_dir):
+    """鍵が異なる場合はNoneを返しファイルを破棄する"""
+    SessionStore("account", "password", session_dir).save(STATE)
+
+    store = SessionStore("account", "changed", session_dir)
+    assert store.load() is None
+    assert not os.path.exists(store.path)
+
+
+def test_path_is_keyed_by_account(session_dir):
+    """アカウントごとに別ファイル"""
+    a = SessionStore("account_a", "password", session_dir)
+    b = SessionStore("account_b", "password", session_dir)
+    assert a.path != b.path
+
+
+def test_key_is_derived_once_per_salt(session_dir):
+    """同じソルトの鍵は使い回し、読込→保存で PBKDF2 を繰り返さない"""
+    SessionStore("account", "password", session_dir).save(STATE)
+    store = SessionStore("account", "password", session_dir)
+
+    with patch(
+        "app.core.session_store.hashlib.pbkdf2_hmac", wraps=hashlib.pbkdf2_hmac
+    ) as derive:
+        assert store.load() == STATE
+        store.save(STATE)
+        assert store.load() == STATE
+
+    assert derive.call_count == 1
@@ -0,0 +1,114 @@
+"""
+TimeoutRegistryのテスト
+"""
+
+import os
+import tempfile
+import pytest
+from unittest.mock import patch
+from app.core.db_manager import DBManager
+from app.utils.timeouts import TimeoutRegistry
+
+
+@pytest.fixture(autouse=True)
+def reset_registry():
+    TimeoutRegistry.reset()
+    with patch("app.utils.timeouts.Config") as mock_config:
+        mock_config.TIMEOUT_P99_MULTIPLIER = 2.0
+        mock_config.TIMEOUT_FLOOR_RATIO = 0.25
+        mock_config.TIMEOUT_CEILING_FACTOR = 2.0
+        yield
+    TimeoutRegistry.reset()
+
+
+def _record(step, values):
+    for value in values:
+        TimeoutRegistry.record(step, value)
+
+
+def test_get_returns_default_until_enough_samples():
+    """サンプル不足の間は従来の固定値を使う"""
+    _record("step", [100] * (TimeoutRegistry.MIN_SAMPLES - 1))
+    assert TimeoutRegistry.get("step", 60000) == 60000
+
+
+def test_get_uses_multiplied_p99():
+    """十分なサンプルがあれば p99 × 倍率をタイムアウトにする"""
+    _record("step", [1000] * 99 + [3000])
+    p50, p99 = TimeoutRegistry.percentiles("step")
+    assert p50 == 1000
+    assert p99 == 1000
+    assert TimeoutRegistry.get("step", 6000) == 2000
+
+    _record("step", [5000] * 5)
+    assert TimeoutRegistry.get("step", 6000) == 10000
+
+
+def test_get_is_clamped_by_floor_and_ceiling():
+    """既定値に対する比率の下限・上限で挟む"""
+    _record("fast", [10] * 30)
+    assert TimeoutRegistry.get("fast", 60000) == 15000
+    assert TimeoutRegistry.get("fast", 2000) == 500
+
+    _record("slow", [50000] * 30)
+    assert TimeoutRegistry.get("slow", 30000) == 60000
+
+
+def test_timeouts_are_censored_samples_that_raise_the_timeout():
+    """打ち切りは p99 に埋もれず、タイムアウトを既定値まで戻す"""
+    _record("step", [200] * 198)
+    assert TimeoutRegistry.get("step", 10000) == 2500  # 下限
+
+    TimeoutRegistry.record("step", 2500, censored=True)
+    assert TimeoutRegistry.get("step", 10000) == 5000
+    TimeoutRegistry.record("step", 5000, censored=True)
+    assert TimeoutRegistry.get("step", 10000) == 10000  # 打ち切りだけでは既定値を超えない
+    assert TimeoutRegistry.percentiles("step") == (200, 200)
+
+
+def test_non_adaptive_step_keeps_default():
+    """見つからないことが最終判定になる待機は学習値を使わない"""
+    _record("step", [50] * 200)
+    assert TimeoutRegistry.get("step", 60000, adaptive=False) == 60000
+    with TimeoutRegistry.step("step", 60000, adaptive=False) as timeout:
+        assert timeout == 60000
+
+
+def test_step_records_success_and_timeouts():
+    """完了時間は成功時、打ち切りはタイムアウトで失敗した場合のみ記録する"""
+    with TimeoutRegistry.step("step", 5000) as timeout:
+        assert timeout == 5000
+
+    # タイムアウトより早い失敗（要素の消失など）は記録しない
+    with pytest.raises(ValueError):
+        with TimeoutRegistry.step("step", 5000):
+            raise ValueError()
+
+    with patch("app.utils.timeouts.time.monotonic", side_effect=[0.0, 5.0]):
+        with pytest.raises(TimeoutError):
+            with TimeoutRegistry.step("step", 5000):
+                raise TimeoutError()
+
+    with TimeoutRegistry.step(None, 5000) as timeout:
+        assert timeout == 5000
+
+    samples = TimeoutRegistry._samples["step"]
+    assert [censored for _, censored in samples] == [False, True]
+    assert samples[1][0] == 5000
+    assert None not in TimeoutRegistry._samples
+
+
+def test_save_and_load_round_trip():
+    """保存したサンプルを次回の実行で読み込む"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db = DBManager(os.path.join(tmpdir, "test.db"))
+        TimeoutRegistry.load(db)
+        _record("step", [1500] * 25)
+        TimeoutRegistry.record("step", 1000, censored=True)
+        TimeoutRegistry.save()
+
+        TimeoutRegistry.reset()
+        TimeoutRegistry.load(db)
+        assert TimeoutRegistry.get("step", 60000) == 15000
+        assert TimeoutRegistry._samples["step"][-1] == (1000.0, True)
+        db.close()